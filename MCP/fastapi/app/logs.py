@@ -0,0 +1,68 @@
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from .metrics import LOG_DROPPED, LOG_RECORDS
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_PAYLOAD_CHARS = int(os.getenv("LOG_PAYLOAD_CHARS", "400"))
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        out = {"ts": round(record.created, 3), "level": record.levelname, "logger": record.name, "msg": record.getMessage()}
+        if record.exc_text:
+            out["exc"] = record.exc_text
+        return json.dumps(out, default=str, ensure_ascii=False)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Merges the message on the caller's thread and enqueues without blocking; encoding and the write happen on the listener"""
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+            LOG_RECORDS.labels(record.levelname).inc()
+        except queue.Full:
+            LOG_DROPPED.inc()
+
+
+def capped(text, limit: int = LOG_PAYLOAD_CHARS) -> str:
+    text = str(text)
+    return text if len(text) <= limit else f"{text[:limit]}... (+{len(text) - limit} chars)"
+
+
+def setup():
+    global _listener
+    root = logging.getLogger()
+    if _listener is not None or root.handlers:
+        return
+    out = logging.StreamHandler(sys.stdout)
+    out.setFormatter(JsonFormatter())
+    q = queue.Queue(LOG_QUEUE_SIZE)
+    root.addHandler(_QueueHandler(q))
+    root.setLevel(LOG_LEVEL)
+    for name in ("httpx", "httpcore"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    _listener = logging.handlers.QueueListener(q, out)
+    _listener.start()
+
+
+def shutdown():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,7 +1,8 @@
 import os
 import json
+import time
 import httpx
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Dict, Any
@@ -10,10 +11,32 @@ from .mcp import openapi_to_mcp
 from .providers import call_swagger_tool
 from .state import registry, rag_store
 from .openai_client import get_client
+from .metrics import timed, render, HTTP_REQUESTS, HTTP_SECONDS, INGEST_TOOLS, INGEST_DOCS_PER_SECOND, RAG_DOCUMENTS, TOOL_CALLS
+from . import logs
 
+logs.setup()
 app = FastAPI()
+app.add_event_handler("shutdown", logs.shutdown)
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = getattr(request.scope.get("route"), "path", None) or "unmatched"
+        HTTP_SECONDS.labels(request.method, route).observe(time.perf_counter() - t0)
+        HTTP_REQUESTS.labels(request.method, route, str(status)).inc()
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    body, content_type = render()
+    return Response(content=body, media_type=content_type)
+
 class IngestResponse(BaseModel):
     session_id: str
     tool_count: int
@@ -29,11 +52,13 @@ class ToolInfo(BaseModel):
 @app.post("/ingest", response_model=IngestResponse)
 async def ingest(req: IngestRequest):
     sid = "sess"
+    t0 = time.perf_counter()
     tools: List[Dict[str, Any]] = []
     docs: List[str] = []
     async with httpx.AsyncClient(timeout=30.0) as client:
         for spec_url in req.swagger_urls:
-            r = await client.get(spec_url)
+            with timed("spec_fetch"):
+                r = await client.get(spec_url)
             if r.status_code >= 400:
                 raise HTTPException(400, f"Failed to fetch {spec_url}")
             spec = r.json()
@@ -50,6 +75,9 @@ async def ingest(req: IngestRequest):
                 }, ensure_ascii=False)
                 docs.append(text)
     rag_store.add(docs)
+    INGEST_TOOLS.set(len(tools))
+    INGEST_DOCS_PER_SECOND.set(len(docs) / max(time.perf_counter() - t0, 1e-6))
+    RAG_DOCUMENTS.set(len(rag_store.texts))
     state = IngestState(tools=tools, vector_docs=docs, instructions=req.instructions)
     registry.set(sid, state.model_dump())
     from .tool_select import build_vocab
@@ -80,12 +108,14 @@ async def chat(req: ChatRequest):
     if not st:
         raise HTTPException(400, "No session. Call /ingest first.")
     topk = int(os.getenv("RAG_TOP_K", "5"))
-    ctx = rag_store.query(req.message, k=topk)
+    with timed("vector_query"):
+        ctx = rag_store.query(req.message, k=topk)
     context_blob = "\n".join([d for d,_ in ctx])
     from .tool_select import rank_tools
     tool_limit = int(os.getenv("TOP_TOOL_LIMIT", "8"))
     vocab = set(st.get("vocab", []))
-    selected = rank_tools(req.message, st["tools"], limit=tool_limit, vocab=vocab)
+    with timed("tool_select"):
+        selected = rank_tools(req.message, st["tools"], limit=tool_limit, vocab=vocab)
     tools = []
     tool_map = {}
     for t in selected:
@@ -102,7 +132,8 @@ async def chat(req: ChatRequest):
         messages.append(m)
     messages.append({"role":"user","content":req.message})
     registry.append_history(req.session_id, "user", req.message)
-    rsp = client.chat.completions.create(model="gpt-4o-mini", messages=messages, tools=tools, tool_choice="auto")
+    with timed("llm_generation"):
+        rsp = client.chat.completions.create(model="gpt-4o-mini", messages=messages, tools=tools, tool_choice="auto")
     out = rsp.choices[0].message
     if getattr(out, "tool_calls", None):
         call = out.tool_calls[0]
@@ -111,10 +142,13 @@ async def chat(req: ChatRequest):
         tool_def = tool_map.get(tname)
         if not tool_def:
             raise HTTPException(500, "Unknown tool")
-        result = call_swagger_tool(tool_def, targs)
+        with timed("tool_call"):
+            result = call_swagger_tool(tool_def, targs)
+        TOOL_CALLS.labels(f"{str(result.get('status_code', 0))[0]}xx").inc()
         messages.append({"role":"assistant","tool_calls":[{"id":call.id,"type":"function","function":{"name":tname,"arguments":json.dumps(targs)}}]})
         messages.append({"role":"tool","tool_call_id":call.id,"content":json.dumps(result, ensure_ascii=False)})
-        final = client.chat.completions.create(model="gpt-4o-mini", messages=messages)
+        with timed("llm_generation"):
+            final = client.chat.completions.create(model="gpt-4o-mini", messages=messages)
         answer = final.choices[0].message.content
         registry.append_history(req.session_id, "assistant", answer)
         return {"answer": answer, "tool_result": result, "tools_considered": [t["name"] for t in selected]}
@@ -0,0 +1,32 @@
+import time
+from contextlib import contextmanager
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+STAGE_SECONDS = Histogram("mcp_stage_seconds", "Latency of one stage: spec_fetch, vector_query, tool_select, llm_generation, tool_call", ["stage"], buckets=_BUCKETS)
+STAGE_ERRORS = Counter("mcp_stage_errors_total", "Stage calls that raised", ["stage"])
+TOOL_CALLS = Counter("mcp_tool_calls_total", "Upstream API calls made for a tool, by HTTP status class", ["status"])
+HTTP_SECONDS = Histogram("mcp_http_request_seconds", "Request latency by route template", ["method", "route"], buckets=_BUCKETS)
+HTTP_REQUESTS = Counter("mcp_http_requests_total", "Requests by route template and status", ["method", "route", "status"])
+INGEST_TOOLS = Gauge("mcp_ingest_tools", "Tools produced by the most recent /ingest")
+INGEST_DOCS_PER_SECOND = Gauge("mcp_ingest_documents_per_second", "Throughput of the most recent /ingest")
+RAG_DOCUMENTS = Gauge("mcp_rag_documents", "Documents in the in-memory tool index")
+LOG_RECORDS = Counter("mcp_log_records_total", "Log records emitted, by level", ["level"])
+LOG_DROPPED = Counter("mcp_log_dropped_total", "Log records dropped because the log queue was full")
+
+
+@contextmanager
+def timed(stage: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - t0)
+
+
+def render():
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -1,8 +1,13 @@
 import httpx
+import logging
 from typing import Any, Dict, Tuple
 from urllib.parse import urljoin, quote
 import re
 
+from .logs import capped
+
+logger = logging.getLogger(__name__)
+
 PATH_VAR = re.compile(r"\{([^}/]+)\}")
 
 def _expand_path(path: str, args: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
@@ -41,11 +46,10 @@ def call_swagger_tool(tool: Dict[str, Any], args: Dict[str, Any]) -> Dict[str, A
     params = _normalize_query({k: v for k, v in leftover.items() if k != "body"})
     body = leftover.get("body")
 
-    print("\n=== MCP TOOL CALL ===")
-    print(f"Method: {method}")
-    print(f"URL: {url}")
-    print(f"Params: {params}")
-    print(f"Body: {body}\n")
+    # Path only at INFO: URLs, query params and bodies can carry user data and run long.
+    logger.info("[TOOL] %s %s", method, path_tmpl)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[TOOL] url=%s params=%s body=%s", url, capped(params), capped(body))
 
     headers = {"accept": "application/json"}
     with httpx.Client(timeout=30.0) as client:
@@ -62,8 +66,9 @@ def call_swagger_tool(tool: Dict[str, Any], args: Dict[str, Any]) -> Dict[str, A
         else:
             r = client.get(url, params=params, headers=headers)
 
-    print(f"Response Status: {r.status_code}")
-    print(f"Response Text: {r.text[:400]}...\n")
+    logger.info("[TOOL] %s %s -> %d in %.0fms", method, path_tmpl, r.status_code, r.elapsed.total_seconds() * 1000)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[TOOL] response: %s", capped(r.text))
 
     return {"status_code": r.status_code, "data": _safe_json(r), "url": url}
 
@@ -0,0 +1,140 @@
+import hashlib
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+from .config import BLOB_DIR
+
+_CHUNK = 1024 * 1024
+
+
+class BlobWriter:
+    """Streams bytes into a temp file while hashing; commit() moves it under its SHA-256"""
+
+    def __init__(self, store: "BlobStore"):
+        self._store = store
+        self._hash = hashlib.sha256()
+        self.size = 0
+        fd, self._tmp = tempfile.mkstemp(dir=store.tmp_dir)
+        self._fh = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes):
+        if chunk:
+            self._hash.update(chunk)
+            self._fh.write(chunk)
+            self.size += len(chunk)
+
+    def commit(self):
+        """Returns (sha256, size, created); created is False when identical bytes were already stored"""
+        self._fh.close()
+        sha = self._hash.hexdigest()
+        return sha, self.size, self._store.commit_path(self._tmp, sha)
+
+    def abort(self):
+        if not self._fh.closed:
+            self._fh.close()
+        if os.path.exists(self._tmp):
+            os.unlink(self._tmp)
+
+
+class BlobStore:
+    """Content-addressed file store: bytes live on disk at <root>/ab/cd/<sha256>, deduplicated by hash"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.tmp_dir = os.path.join(root, "tmp")
+
+    def _ensure_dirs(self):
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def path(self, sha: str) -> str:
+        return os.path.join(self.root, sha[:2], sha[2:4], sha)
+
+    def exists(self, sha: str) -> bool:
+        return bool(sha) and os.path.exists(self.path(sha))
+
+    def size(self, sha: str) -> int:
+        return os.path.getsize(self.path(sha))
+
+    def commit_path(self, src: str, sha: str) -> bool:
+        """Move a fully written temp file into place; returns False (and drops src) if the blob already exists"""
+        dest = self.path(sha)
+        if os.path.exists(dest):
+            os.unlink(src)
+            return False
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.replace(src, dest)
+        return True
+
+    @staticmethod
+    def hash_file(path: str, chunk_size: int = _CHUNK) -> str:
+        h = hashlib.sha256()
+        with open(path, "rb") as fh:
+            for chunk in iter(lambda: fh.read(chunk_size), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def writer(self) -> BlobWriter:
+        self._ensure_dirs()
+        return BlobWriter(self)
+
+    def put_stream(self, stream, chunk_size: int = _CHUNK):
+        w = self.writer()
+        try:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                w.write(chunk)
+        except BaseException:
+            w.abort()
+            raise
+        return w.commit()
+
+    def put_bytes(self, data: bytes):
+        w = self.writer()
+        w.write(data)
+        return w.commit()
+
+    @contextmanager
+    def open_mmap(self, sha: str):
+        """Read-only memory map of a blob; zero-length blobs yield b"" since they cannot be mapped"""
+        with open(self.path(sha), "rb") as fh:
+            if os.fstat(fh.fileno()).st_size == 0:
+                yield b""
+                return
+            m = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                yield m
+            finally:
+                m.close()
+
+    def read(self, sha: str) -> bytes:
+        with self.open_mmap(sha) as m:
+            return bytes(m[:])
+
+    def iter_range(self, sha: str, start: int, end: int, chunk_size: int = _CHUNK):
+        """Yield bytes start..end (inclusive) as slices of the mapped file"""
+        with self.open_mmap(sha) as m:
+            pos = start
+            while pos <= end:
+                n = min(chunk_size, end - pos + 1)
+                yield bytes(m[pos:pos + n])
+                pos += n
+
+    def delete(self, sha: str):
+        try:
+            os.unlink(self.path(sha))
+        except FileNotFoundError:
+            pass
+
+    def iter_hashes(self):
+        for dirpath, _, names in os.walk(self.root):
+            if os.path.abspath(dirpath).startswith(os.path.abspath(self.tmp_dir)):
+                continue
+            for n in names:
+                if len(n) == 64:
+                    yield n
+
+
+blob_store = BlobStore(BLOB_DIR)
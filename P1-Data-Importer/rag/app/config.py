@@ -7,8 +7,131 @@ DB_USER = os.environ.get("DB_USER", "appuser")
 DB_PASSWORD = os.environ.get("DB_PASSWORD", "apppassword")
 
 OLLAMA_BASE = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
+# Several Ollama servers, comma-separated; requests go to the least busy healthy one.
+OLLAMA_BASE_URLS = [u.strip() for u in os.environ.get("OLLAMA_BASE_URLS", OLLAMA_BASE).split(",") if u.strip()]
+# Optional placement, e.g. "mxbai-embed-large=http://embed:11434;mistral=http://gpu1:11434|http://gpu2:11434"
+OLLAMA_MODEL_BACKENDS = {
+    k.strip(): [u.strip() for u in v.split("|") if u.strip()]
+    for k, _, v in (e.partition("=") for e in os.environ.get("OLLAMA_MODEL_BACKENDS", "").split(";") if "=" in e)
+}
+POOL_HEALTH_INTERVAL = float(os.environ.get("POOL_HEALTH_INTERVAL", "10"))
+POOL_EJECT_FAILURES = int(os.environ.get("POOL_EJECT_FAILURES", "3"))
+POOL_EJECT_SECONDS = int(os.environ.get("POOL_EJECT_SECONDS", "30"))
+
+# End-to-end deadline per inference stage in seconds (streamed generations included).
+OLLAMA_CONNECT_TIMEOUT = float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", "3"))
+STAGE_DEADLINES = {
+    "embed": float(os.environ.get("EMBED_DEADLINE", "15")),
+    "embed_batch": float(os.environ.get("EMBED_BATCH_DEADLINE", "120")),
+    "chat": float(os.environ.get("CHAT_DEADLINE", "180")),
+    "sql_plan": float(os.environ.get("SQL_PLAN_DEADLINE", "90")),
+    "sql_retry": float(os.environ.get("SQL_RETRY_DEADLINE", "60")),
+}
+# Embeds still unanswered at this latency percentile get a duplicate on another backend; large ingest batches are never hedged.
+HEDGE_PERCENTILE = float(os.environ.get("HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_MS = float(os.environ.get("HEDGE_MIN_MS", "50"))
+EMBED_HEDGE_MAX_TEXTS = int(os.environ.get("EMBED_HEDGE_MAX_TEXTS", "16"))
+BREAKER_FAILURES = int(os.environ.get("BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = int(os.environ.get("BREAKER_COOLDOWN", "30"))
+
+# Concurrent generations per model: per backend (match OLLAMA_NUM_PARALLEL) unless set per model, e.g. "mistral=4,llama3=1".
+LLM_CONCURRENCY_PER_BACKEND = int(os.environ.get("LLM_CONCURRENCY_PER_BACKEND", "2"))
+LLM_MODEL_CONCURRENCY = {
+    k.strip(): int(v) for k, _, v in (e.partition("=") for e in os.environ.get("LLM_MODEL_CONCURRENCY", "").split(",") if "=" in e)
+}
+# One deadline per /chat request (the client may send a shorter `timeout_s`); each stage gets
+# this share of what is left when it starts, generation gets the rest.
+CHAT_BUDGET_S = float(os.environ.get("CHAT_BUDGET_S", "230"))
+CHAT_BUDGET_MAX_S = float(os.environ.get("CHAT_BUDGET_MAX_S", "600"))
+BUDGET_SHARES = {"embed": 0.1, "sql_plan": 0.45, "sql_retry": 0.4, "chat": 1.0}
+LLM_QUEUE_MAX = int(os.environ.get("LLM_QUEUE_MAX", "32"))
+LLM_QUEUE_TIMEOUT = float(os.environ.get("LLM_QUEUE_TIMEOUT", "30"))
+# Chats without retrieval and at most this long jump ahead of RAG/SQL chats in the queue.
+SHORT_CHAT_CHARS = int(os.environ.get("SHORT_CHAT_CHARS", "500"))
 EMBED_MODEL = os.environ.get("OLLAMA_EMBED_MODEL", "mxbai-embed-large")
 DEFAULT_MODEL = os.environ.get("OLLAMA_LLM_MODEL", "mistral")
+# How long Ollama keeps a model (and the KV cache of the last prompt prefix) loaded after a request.
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+# Extra models to pull and load at startup besides the default LLM and embed model; these stay pinned.
+PRELOAD_MODELS = [m.strip() for m in os.environ.get("OLLAMA_PRELOAD_MODELS", "").split(",") if m.strip()]
+MODEL_PIN_KEEP_ALIVE = os.environ.get("MODEL_PIN_KEEP_ALIVE", "-1")
+
+# Generation budgets per route. One num_ctx for all routes by default: a different value makes Ollama reload the model.
+LLM_NUM_CTX = int(os.environ.get("LLM_NUM_CTX", "8192"))
+LLM_ROUTE_LIMITS = {
+    "chat": {"num_predict": int(os.environ.get("LLM_CHAT_NUM_PREDICT", "1024")), "num_ctx": int(os.environ.get("LLM_CHAT_NUM_CTX", LLM_NUM_CTX))},
+    "sql_plan": {"num_predict": int(os.environ.get("LLM_SQL_NUM_PREDICT", "768")), "num_ctx": int(os.environ.get("LLM_SQL_NUM_CTX", LLM_NUM_CTX))},
+    "sql_retry": {"num_predict": int(os.environ.get("LLM_SQL_RETRY_NUM_PREDICT", "512")), "num_ctx": int(os.environ.get("LLM_SQL_NUM_CTX", LLM_NUM_CTX))},
+}
 
 CHROMA_DIR = os.environ.get("CHROMA_DIR", "/chroma")
+BLOB_DIR = os.environ.get("BLOB_DIR", "/blobs")
 COLLECTION_NAME = os.environ.get("RAG_COLLECTION_NAME", "files_kb")
+
+# "single" keeps everything in one process; "writer" owns Chroma and ingestion and publishes a snapshot
+# of it; "reader" workers (scale with WEB_CONCURRENCY) search the memory-mapped snapshot and proxy writes.
+RAG_ROLE = os.environ.get("RAG_ROLE", "single")
+RAG_WRITER_URL = os.environ.get("RAG_WRITER_URL", "http://rag-writer:8001").rstrip("/")
+RAG_WORKERS = max(1, int(os.environ.get("WEB_CONCURRENCY", "1")))
+INDEX_SNAPSHOT_DIR = os.environ.get("INDEX_SNAPSHOT_DIR", "/index")
+# Writer: quiet period after the last ingest before publishing. Reader: how often to look for a new version.
+INDEX_PUBLISH_DELAY = float(os.environ.get("INDEX_PUBLISH_DELAY", "2"))
+INDEX_POLL_SECONDS = float(os.environ.get("INDEX_POLL_SECONDS", "2"))
+
+ROWS_COLLECTION_NAME = os.environ.get("RAG_ROWS_COLLECTION_NAME", "table_rows")
+ROW_INGEST_BATCH = int(os.environ.get("ROW_INGEST_BATCH", "500"))
+ROW_TEXT_MAX_CHARS = int(os.environ.get("ROW_TEXT_MAX_CHARS", "1000"))
+
+# Bookkeeping tables that live next to imported data but are never ingested or queried as data.
+INTERNAL_TABLES = {"files", "rag_row_watermarks", "import_schemas", "table_profiles", "sql_query_log", "index_advisor_actions"}
+
+CATALOG_SCAN_BATCH = int(os.environ.get("CATALOG_SCAN_BATCH", "20000"))
+
+# Columnar mirror of imported tables for generated SQL; "off" always queries MySQL.
+ANALYTIC_ENGINE = os.environ.get("ANALYTIC_ENGINE", "duckdb")
+ANALYTIC_DIR = os.environ.get("ANALYTIC_DIR", "/analytics")
+ANALYTIC_EXPORT_BATCH = int(os.environ.get("ANALYTIC_EXPORT_BATCH", "50000"))
+
+# Generated SQL: LIMIT added when missing, LIMIT ceiling, and the EXPLAIN rows-examined budget on MySQL.
+SQL_DEFAULT_LIMIT = int(os.environ.get("SQL_DEFAULT_LIMIT", "100"))
+SQL_MAX_LIMIT = int(os.environ.get("SQL_MAX_LIMIT", "1000"))
+SQL_MAX_EXAMINED_ROWS = int(os.environ.get("SQL_MAX_EXAMINED_ROWS", "5000000"))
+
+# Generated-query results, keyed by SQL and the data version of each table it reads.
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESULT_CACHE_VERSION_TTL = float(os.environ.get("RESULT_CACHE_VERSION_TTL", "5"))
+
+# Template-matched questions (counts, first/last N, simple filters, describe) skip SQL generation.
+FAST_PATH_ENABLED = os.environ.get("FAST_PATH_ENABLED", "1") == "1"
+
+# The index advisor only recommends unless this is set; applied indexes are recorded for the before/after report.
+INDEX_ADVISOR_APPLY = os.environ.get("INDEX_ADVISOR_APPLY", "0") == "1"
+INDEX_ADVISOR_MIN_QUERIES = int(os.environ.get("INDEX_ADVISOR_MIN_QUERIES", "3"))
+
+# Finished request traces kept in memory for /debug/traces, and the span cap per trace.
+TRACE_STORE_SIZE = int(os.environ.get("TRACE_STORE_SIZE", "500"))
+TRACE_MAX_SPANS = int(os.environ.get("TRACE_MAX_SPANS", "200"))
+
+# Per-request sampling profiles (X-Profile: 1 or ?profile=1) are only honoured when enabled.
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "0") == "1"
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_SECONDS = float(os.environ.get("PROFILE_MAX_SECONDS", "120"))
+PROFILE_STORE_SIZE = int(os.environ.get("PROFILE_STORE_SIZE", "20"))
+# Frames recorded per allocation when tracemalloc starts with the process; 0 leaves it off.
+TRACEMALLOC_FRAMES = int(os.environ.get("TRACEMALLOC_FRAMES", "0"))
+
+# Logs go through a bounded queue to one writer thread; payload previews (context, SQL, answers) are capped and sampled.
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+LOG_PAYLOAD_CHARS = int(os.environ.get("LOG_PAYLOAD_CHARS", "300"))
+LOG_PAYLOAD_SAMPLE = float(os.environ.get("LOG_PAYLOAD_SAMPLE", "0.05"))
+
+# Set (and emptied before start) when several worker processes serve /metrics together.
+METRICS_MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+# Connection cap of the shared async HTTP client used by the async chat/search path.
+AIO_MAX_CONNECTIONS = int(os.environ.get("AIO_MAX_CONNECTIONS", "200"))
+
+FILE_STREAM_CHUNK = int(os.environ.get("FILE_STREAM_CHUNK", str(256 * 1024)))
+FILE_CACHE_MAX_AGE = int(os.environ.get("FILE_CACHE_MAX_AGE", "3600"))
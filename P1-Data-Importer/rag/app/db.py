@@ -1,25 +1,103 @@
+import json
 from sqlalchemy import create_engine, text, inspect
+from sqlalchemy.exc import ProgrammingError
+from sqlalchemy.ext.asyncio import create_async_engine
 import pandas as pd
-from .config import DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD
+from .blobstore import blob_store
+from .config import DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD, INTERNAL_TABLES
 
 engine = create_engine(
     f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}?charset=utf8mb4",
     pool_pre_ping=True
 )
 
+_async_engine = None
+
+def async_engine():
+    """aiomysql engine for the async request path; created on first use so sync-only tools never need the driver"""
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}?charset=utf8mb4",
+            pool_pre_ping=True,
+            pool_recycle=3600
+        )
+    return _async_engine
+
+async def dispose_async_engine():
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+
+def ensure_files_table():
+    """Create the files table, or upgrade a pre-blob-store one (data LONGBLOB NOT NULL, no sha256)"""
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS files (id INT AUTO_INCREMENT PRIMARY KEY,filename VARCHAR(255) NOT NULL,content_type VARCHAR(128) NOT NULL,size_bytes BIGINT NOT NULL,sha256 CHAR(64) NULL,created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,INDEX ix_files_sha256 (sha256))"))
+        cols = {c["name"]: c for c in inspect(conn).get_columns("files")}
+        if "sha256" not in cols:
+            conn.execute(text("ALTER TABLE files ADD COLUMN sha256 CHAR(64) NULL AFTER size_bytes, ADD INDEX ix_files_sha256 (sha256)"))
+        if "data" in cols and not cols["data"].get("nullable", True):
+            conn.execute(text("ALTER TABLE files MODIFY data LONGBLOB NULL"))
+
+def insert_file_row(filename: str, content_type: str, size_bytes: int, sha256: str) -> int:
+    ensure_files_table()
+    with engine.begin() as conn:
+        res = conn.execute(text("INSERT INTO files (filename, content_type, size_bytes, sha256) VALUES (:f,:c,:s,:h)"), {"f": filename, "c": content_type or "", "s": size_bytes, "h": sha256})
+        return int(res.lastrowid)
+
 def list_files_meta():
     with engine.begin() as conn:
-        rows = conn.execute(text("SELECT id, filename, content_type, size_bytes, created_at FROM files ORDER BY id DESC")).mappings().all()
+        rows = conn.execute(text("SELECT id, filename, content_type, size_bytes, sha256, created_at FROM files ORDER BY id DESC")).mappings().all()
     return [dict(r) for r in rows]
 
+def file_meta(fid: int):
+    """Metadata only; bytes are read through the blob store by iter_file_range"""
+    with engine.begin() as conn:
+        r = conn.execute(text("SELECT id, filename, content_type, size_bytes, sha256, created_at FROM files WHERE id=:i"), {"i": fid}).mappings().first()
+    return dict(r) if r else None
+
+async def afile_meta(fid: int):
+    """file_meta() without blocking the event loop"""
+    async with async_engine().connect() as conn:
+        r = (await conn.execute(text("SELECT id, filename, content_type, size_bytes, sha256, created_at FROM files WHERE id=:i"), {"i": fid})).mappings().first()
+    return dict(r) if r else None
+
+def _iter_legacy_range(fid: int, start: int, end: int, chunk_size: int):
+    """Rows not yet moved by app.tools.migrate_blobs still carry their bytes in files.data"""
+    pos = start
+    while pos <= end:
+        n = min(chunk_size, end - pos + 1)
+        with engine.begin() as conn:
+            b = conn.execute(text("SELECT SUBSTRING(data, :p, :n) FROM files WHERE id=:i"), {"p": pos + 1, "n": n, "i": fid}).scalar()
+        if not b:
+            return
+        yield bytes(b)
+        pos += len(b)
+
+def iter_file_range(meta: dict, start: int, end: int, chunk_size: int):
+    """Yield bytes start..end (inclusive) of a stored file"""
+    if meta.get("sha256"):
+        return blob_store.iter_range(meta["sha256"], start, end, chunk_size)
+    return _iter_legacy_range(meta["id"], start, end, chunk_size)
+
 def file_blob(fid: int):
+    meta = file_meta(fid)
+    if not meta:
+        return None
+    return meta["filename"], meta["content_type"], read_file_bytes(meta)
+
+def read_file_bytes(meta: dict) -> bytes:
+    if meta.get("sha256"):
+        return blob_store.read(meta["sha256"])
     with engine.begin() as conn:
-        r = conn.execute(text("SELECT filename, content_type, data FROM files WHERE id=:i"), {"i": fid}).first()
-    return r
+        return conn.execute(text("SELECT data FROM files WHERE id=:i"), {"i": meta["id"]}).scalar() or b""
 
-def list_file_rows_full():
+def list_file_rows():
+    """File metadata for indexing; bytes are fetched per file so a full re-index never holds every document at once"""
     with engine.begin() as conn:
-        return conn.execute(text("SELECT id, filename, content_type, size_bytes, data FROM files ORDER BY id DESC")).fetchall()
+        rows = conn.execute(text("SELECT id, filename, content_type, size_bytes, sha256 FROM files ORDER BY id DESC")).mappings().all()
+    return [dict(r) for r in rows]
 
 def list_tables():
     """List all tables in the database"""
@@ -56,8 +134,182 @@ def execute_sql_query(query: str, params: dict = None):
         df = pd.read_sql(text(query), conn, params=params or {})
     return df
 
+def explain_query(query: str):
+    """EXPLAIN rows (id, table, type, ref, rows, filtered, ...) for a query; the SQL is sent verbatim"""
+    with engine.begin() as conn:
+        # No parameters, so pymysql does not %-format the SQL: LIKE '%x%' and DATE_FORMAT(d, '%Y-%m') stay literal.
+        res = conn.execution_options(no_parameters=True).exec_driver_sql(f"EXPLAIN {query}")
+        return [dict(r) for r in res.mappings().all()]
+
 def get_sample_data(table_name: str, limit: int = 3):
     """Get sample rows from a table"""
     with engine.begin() as conn:
         df = pd.read_sql(text(f"SELECT * FROM `{table_name}` LIMIT :lim"), conn, params={"lim": limit})
-    return df
\ No newline at end of file
+    return df
+
+def list_data_tables():
+    """List imported data tables, skipping internal bookkeeping tables"""
+    return [t for t in list_tables() if t not in INTERNAL_TABLES]
+
+def table_created_at(table_name: str):
+    """Creation time of a table; changes whenever the table is dropped and re-imported"""
+    with engine.begin() as conn:
+        return conn.execute(text("SELECT CREATE_TIME FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :t"), {"t": table_name}).scalar()
+
+def table_versions():
+    """Data version per table: the import time recorded by the importer, else CREATE_TIME"""
+    with engine.begin() as conn:
+        created = dict(conn.execute(text("SELECT TABLE_NAME, CREATE_TIME FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE()")).fetchall())
+        try:
+            imported = dict(conn.execute(text("SELECT table_name, imported_at FROM import_schemas")).fetchall())
+        except ProgrammingError:
+            imported = {}
+    return {t: str(imported.get(t) or c) for t, c in created.items()}
+
+def table_key_column(table_name: str):
+    """Single-column primary key usable for keyset pagination, or None"""
+    pk = inspect(engine).get_pk_constraint(table_name) or {}
+    cols = pk.get("constrained_columns") or []
+    return cols[0] if len(cols) == 1 else None
+
+def fetch_rows_after(table_name: str, key_column: str, last_key, limit: int):
+    """Keyset page: the next `limit` rows ordered by `key_column` strictly after `last_key`"""
+    where = f"WHERE `{key_column}` > :k " if last_key is not None else ""
+    with engine.begin() as conn:
+        res = conn.execute(text(f"SELECT * FROM `{table_name}` {where}ORDER BY `{key_column}` LIMIT :lim"), {"k": last_key, "lim": limit})
+        return list(res.keys()), res.fetchall()
+
+def fetch_rows_offset(table_name: str, offset: int, limit: int):
+    """Offset page for tables without a usable key (assumes the table is append-only)"""
+    with engine.begin() as conn:
+        res = conn.execute(text(f"SELECT * FROM `{table_name}` LIMIT :lim OFFSET :off"), {"lim": limit, "off": offset})
+        return list(res.keys()), res.fetchall()
+
+def iter_table_pages(table_name: str, key_column, last_key, offset: int, batch_size: int):
+    """Yield (columns, rows, last_key, offset) pages; keyset when a key exists, offset otherwise"""
+    while True:
+        if key_column:
+            cols, rows = fetch_rows_after(table_name, key_column, last_key, batch_size)
+        else:
+            cols, rows = fetch_rows_offset(table_name, offset, batch_size)
+        if not rows:
+            return
+        if key_column:
+            last_key = rows[-1][cols.index(key_column)]
+        offset += len(rows)
+        yield cols, rows, last_key, offset
+        if len(rows) < batch_size:
+            return
+
+def ensure_row_watermarks_table():
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS rag_row_watermarks (table_name VARCHAR(255) PRIMARY KEY,key_column VARCHAR(255) NULL,last_key VARCHAR(255) NULL,rows_ingested BIGINT NOT NULL DEFAULT 0,table_created_at DATETIME NULL,updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP)"))
+
+def get_row_watermark(table_name: str):
+    ensure_row_watermarks_table()
+    with engine.begin() as conn:
+        r = conn.execute(text("SELECT table_name, key_column, last_key, rows_ingested, table_created_at FROM rag_row_watermarks WHERE table_name=:t"), {"t": table_name}).mappings().first()
+    return dict(r) if r else None
+
+def set_row_watermark(table_name: str, key_column, last_key, rows_ingested: int, table_created_at):
+    ensure_row_watermarks_table()
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO rag_row_watermarks (table_name, key_column, last_key, rows_ingested, table_created_at) VALUES (:t,:c,:k,:n,:ca) "
+            "ON DUPLICATE KEY UPDATE key_column=VALUES(key_column), last_key=VALUES(last_key), rows_ingested=VALUES(rows_ingested), table_created_at=VALUES(table_created_at)"
+        ), {"t": table_name, "c": key_column, "k": last_key, "n": rows_ingested, "ca": table_created_at})
+
+def clear_row_watermarks(table_name: str = None):
+    ensure_row_watermarks_table()
+    with engine.begin() as conn:
+        if table_name:
+            conn.execute(text("DELETE FROM rag_row_watermarks WHERE table_name=:t"), {"t": table_name})
+        else:
+            conn.execute(text("DELETE FROM rag_row_watermarks"))
+
+def ensure_table_profiles_table():
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS table_profiles (table_name VARCHAR(255) PRIMARY KEY,key_column VARCHAR(255) NULL,last_key VARCHAR(255) NULL,row_count BIGINT NOT NULL DEFAULT 0,table_created_at DATETIME NULL,profile_json LONGTEXT NOT NULL,refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP)"))
+
+def get_table_profiles(tables=None):
+    """Stored catalog rows keyed by table name; profile_json is decoded into `profile`"""
+    ensure_table_profiles_table()
+    with engine.begin() as conn:
+        rows = conn.execute(text("SELECT table_name, key_column, last_key, row_count, table_created_at, profile_json, refreshed_at FROM table_profiles")).mappings().all()
+    out = {}
+    for r in rows:
+        if tables is None or r["table_name"] in tables:
+            d = dict(r)
+            d["profile"] = json.loads(d.pop("profile_json") or "{}")
+            out[d["table_name"]] = d
+    return out
+
+def save_table_profile(table_name: str, key_column, last_key, row_count: int, table_created_at, profile: dict):
+    ensure_table_profiles_table()
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO table_profiles (table_name, key_column, last_key, row_count, table_created_at, profile_json) VALUES (:t,:c,:k,:n,:ca,:p) "
+            "ON DUPLICATE KEY UPDATE key_column=VALUES(key_column), last_key=VALUES(last_key), row_count=VALUES(row_count), table_created_at=VALUES(table_created_at), profile_json=VALUES(profile_json)"
+        ), {"t": table_name, "c": key_column, "k": last_key, "n": row_count, "ca": table_created_at, "p": json.dumps(profile)})
+
+def clear_table_profiles(table_name: str = None):
+    ensure_table_profiles_table()
+    with engine.begin() as conn:
+        if table_name:
+            conn.execute(text("DELETE FROM table_profiles WHERE table_name=:t"), {"t": table_name})
+        else:
+            conn.execute(text("DELETE FROM table_profiles"))
+
+def ensure_query_log_table():
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS sql_query_log (id BIGINT AUTO_INCREMENT PRIMARY KEY,created_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),sql_text MEDIUMTEXT NOT NULL,tables_used VARCHAR(1024) NOT NULL DEFAULT '',engine VARCHAR(16) NULL,success TINYINT(1) NOT NULL,rejected TINYINT(1) NOT NULL DEFAULT 0,row_count INT NULL,latency_ms DOUBLE NULL,estimated_rows BIGINT NULL,error TEXT NULL,INDEX ix_sql_query_log_created_at (created_at))"))
+
+def log_query(sql_text: str, tables_used, engine_used, success: bool, rejected: bool, row_count, latency_ms, estimated_rows=None, error=None):
+    ensure_query_log_table()
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO sql_query_log (sql_text, tables_used, engine, success, rejected, row_count, latency_ms, estimated_rows, error) "
+            "VALUES (:q,:t,:e,:s,:r,:n,:l,:er,:err)"
+        ), {"q": sql_text, "t": ",".join(tables_used or [])[:1024], "e": engine_used, "s": int(bool(success)), "r": int(bool(rejected)),
+            "n": row_count, "l": latency_ms, "er": estimated_rows, "err": (error or None) and str(error)[:2000]})
+
+def fetch_query_log(since=None, limit: int = None):
+    """Logged generated queries, oldest first; `since` is a datetime lower bound"""
+    ensure_query_log_table()
+    where = "WHERE created_at >= :since " if since is not None else ""
+    order = "ORDER BY id DESC LIMIT :lim" if limit else "ORDER BY id"
+    with engine.begin() as conn:
+        rows = conn.execute(text(f"SELECT id, created_at, sql_text, tables_used, engine, success, rejected, row_count, latency_ms, estimated_rows, error FROM sql_query_log {where}{order}"), {"since": since, "lim": limit}).mappings().all()
+    out = [dict(r) for r in rows]
+    return out[::-1] if limit else out
+
+def table_indexes(table_name: str):
+    """Column lists of the primary key and every secondary index on a table"""
+    insp = inspect(engine)
+    pk = (insp.get_pk_constraint(table_name) or {}).get("constrained_columns") or []
+    return ([pk] if pk else []) + [ix["column_names"] for ix in insp.get_indexes(table_name)]
+
+def create_index(table_name: str, column: str, index_name: str):
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE `{table_name}` ADD INDEX `{index_name}` (`{column}`)"))
+
+def ensure_index_actions_table():
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS index_advisor_actions (id INT AUTO_INCREMENT PRIMARY KEY,table_name VARCHAR(255) NOT NULL,column_name VARCHAR(255) NOT NULL,index_name VARCHAR(64) NOT NULL,expected_benefit TEXT NULL,applied_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6))"))
+
+def record_index_action(table_name: str, column: str, index_name: str, expected_benefit: dict):
+    ensure_index_actions_table()
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO index_advisor_actions (table_name, column_name, index_name, expected_benefit) VALUES (:t,:c,:i,:b)"),
+                     {"t": table_name, "c": column, "i": index_name, "b": json.dumps(expected_benefit, default=str)})
+
+def list_index_actions():
+    ensure_index_actions_table()
+    with engine.begin() as conn:
+        rows = conn.execute(text("SELECT id, table_name, column_name, index_name, expected_benefit, applied_at FROM index_advisor_actions ORDER BY id")).mappings().all()
+    out = []
+    for r in rows:
+        d = dict(r)
+        d["expected_benefit"] = json.loads(d["expected_benefit"]) if d["expected_benefit"] else None
+        out.append(d)
+    return out
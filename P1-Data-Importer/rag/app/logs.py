@@ -0,0 +1,187 @@
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from .config import LOG_LEVEL, LOG_FORMAT, LOG_QUEUE_SIZE, LOG_PAYLOAD_CHARS, LOG_PAYLOAD_SAMPLE
+from .metrics import LOG_BYTES, LOG_DROPPED, LOG_RECORDS
+from . import tracing
+
+_TEXT_FORMAT = "%(asctime)s %(levelname)s trace=%(trace_id)s %(name)s: %(message)s"
+# Attributes every LogRecord has; anything else on a record came in through `extra=` and goes into the JSON.
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "trace_id", "taskName"}
+
+_traceback = logging.Formatter()
+_settings = {"payload_chars": LOG_PAYLOAD_CHARS, "sample": LOG_PAYLOAD_SAMPLE}
+_lock = threading.Lock()
+_stats = {"records": Counter(), "loggers": Counter(), "dropped": 0, "bytes": 0, "emit_ms": 0.0}
+_queue = None
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, trace_id, any `extra=` fields, exc"""
+
+    def format(self, record):
+        out = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "trace_id": getattr(record, "trace_id", "-"),
+        }
+        for k, v in vars(record).items():
+            if k not in _RECORD_FIELDS:
+                out[k] = v
+        if record.exc_text:
+            out["exc"] = record.exc_text
+        return json.dumps(out, default=str, ensure_ascii=False)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    What runs on the caller's thread: merge the message, enqueue, never block.
+    JSON encoding and the stdout write happen on the listener thread; when the
+    queue is full the record is dropped and counted instead of stalling a request.
+    """
+
+    def prepare(self, record):
+        # Merge the arguments now, while they still hold what was logged; the record is formatted later.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _traceback.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_DROPPED.inc()
+            with _lock:
+                _stats["dropped"] += 1
+
+    def emit(self, record):
+        t0 = time.perf_counter()
+        super().emit(record)
+        ms = (time.perf_counter() - t0) * 1000
+        tracing.count_log(ms)
+        LOG_RECORDS.labels(record.levelname).inc()
+        with _lock:
+            _stats["records"][record.levelname] += 1
+            _stats["loggers"][record.name] += 1
+            _stats["emit_ms"] += ms
+
+
+class _StdoutHandler(logging.StreamHandler):
+    def format(self, record):
+        line = super().format(record)
+        LOG_BYTES.inc(len(line) + 1)
+        with _lock:
+            _stats["bytes"] += len(line) + 1
+        return line
+
+
+class _Payload:
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value, limit: int):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self):
+        text = str(self.value)
+        if len(text) <= self.limit:
+            return text
+        return f"{text[:self.limit]}... (+{len(text) - self.limit} chars)"
+
+
+def payload(value, limit: int = None):
+    """A request payload (context, SQL, answer) for a log argument: str() only when the record is emitted, capped at LOG_PAYLOAD_CHARS"""
+    return _Payload(value, limit or _settings["payload_chars"])
+
+
+def verbose(logger: logging.Logger) -> bool:
+    """
+    Whether to log payload previews for this request: always when `logger` is at
+    DEBUG, otherwise for a LOG_PAYLOAD_SAMPLE share of requests. The decision hashes
+    the trace id, so a sampled request logs all of its payloads and the rest none.
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        return True
+    rate = _settings["sample"]
+    if rate <= 0 or not logger.isEnabledFor(logging.INFO):
+        return False
+    tid = tracing.trace_id()
+    if tid is None:
+        return random.random() < rate
+    return zlib.crc32(tid.encode()) % 10000 < rate * 10000
+
+
+def setup():
+    """Route the root and uvicorn loggers through one bounded queue drained by a single writer thread"""
+    global _queue, _listener
+    tracing.install_log_context()
+    root = logging.getLogger()
+    if _listener is not None or root.handlers:
+        # Already set up, or the embedding process (tests, a REPL) configured logging itself.
+        return
+    out = _StdoutHandler(sys.stdout)
+    out.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(_TEXT_FORMAT))
+    _queue = queue.Queue(LOG_QUEUE_SIZE)
+    handler = _QueueHandler(_queue)
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+    # httpx logs every Ollama call at INFO (httpcore every socket step at DEBUG); the pool and the traces already record them.
+    for name in ("httpx", "httpcore"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    # Access and server logs would otherwise write to stdout synchronously on the event loop.
+    for name in ("uvicorn", "uvicorn.access"):
+        lg = logging.getLogger(name)
+        if lg.handlers:
+            lg.handlers[:] = [handler]
+    _listener = logging.handlers.QueueListener(_queue, out)
+    _listener.start()
+
+
+def shutdown():
+    """Drain what is queued and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def configure(level: str = None, logger: str = "", sample: float = None, payload_chars: int = None):
+    if level is not None:
+        logging.getLogger(logger or None).setLevel(level.upper())
+    if sample is not None:
+        _settings["sample"] = min(max(sample, 0.0), 1.0)
+    if payload_chars is not None:
+        _settings["payload_chars"] = max(payload_chars, 16)
+
+
+def status(top: int = 15) -> dict:
+    with _lock:
+        records = dict(_stats["records"])
+        loggers = dict(_stats["loggers"].most_common(top))
+        dropped, written, emit_ms = _stats["dropped"], _stats["bytes"], _stats["emit_ms"]
+    total = sum(records.values())
+    return {
+        "format": LOG_FORMAT,
+        "level": logging.getLevelName(logging.getLogger().level),
+        "payload_sample": _settings["sample"],
+        "payload_chars": _settings["payload_chars"],
+        "queue": {"depth": _queue.qsize() if _queue else None, "capacity": LOG_QUEUE_SIZE, "running": _listener is not None},
+        "records": records,
+        "dropped": dropped,
+        "bytes_written": written,
+        "avg_emit_us": round(emit_ms * 1000 / total, 1) if total else None,
+        "top_loggers": loggers,
+    }
@@ -1,15 +1,121 @@
-from fastapi import FastAPI
+import logging
+import time
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from .routers.health import router as health_router
 from .routers.files import router as files_router
 from .routers.vdb import router as vdb_router
 from .routers.chat import router as chat_router
 from .routers.tables import router as tables_router
+from .routers.ingest import router as ingest_router
+from .routers.catalog import router as catalog_router
+from .routers.analytics import router as analytics_router
+from .routers.advisor import router as advisor_router
+from .routers.llm import router as llm_router
+from .routers.metrics import router as metrics_router
+from .routers.debug import router as debug_router
+from .config import RAG_ROLE, PROFILING_ENABLED, TRACEMALLOC_FRAMES
+from .db import dispose_async_engine, ensure_files_table
+from .metrics import HTTP_REQUESTS, HTTP_SECONDS
+from . import logs, profiling, tracing
+from .services import aio, models, ollama_pool, writer_proxy
+from .vector import index_changed
+
+logs.setup()
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Vector Files + Chat", version="1.0.0")
+
+# Scrapes, probes and the debug endpoints themselves would crowd real requests out of the trace store.
+_UNTRACED = ("/metrics", "/health", "/debug/")
+
+@app.on_event("startup")
+def preload_models():
+    if TRACEMALLOC_FRAMES:
+        profiling.start_tracemalloc(TRACEMALLOC_FRAMES)
+    ollama_pool.start_health_checks()
+    # Reader workers share the writer's Ollama servers; one process pulling and warming is enough.
+    if RAG_ROLE != "reader":
+        _upgrade_files_table()
+        models.start_warmup()
+    # Chroma may have changed while the writer was down: publish what is there now.
+    if RAG_ROLE == "writer":
+        index_changed()
+
+def _upgrade_files_table():
+    # /files reads sha256, which a pre-blob-store files table lacks until it is upgraded.
+    try:
+        ensure_files_table()
+    except Exception as e:
+        logger.warning("[FILES] files table upgrade failed; retried on the next upload: %s", e)
+
+@app.on_event("shutdown")
+async def close_async_clients():
+    await aio.close()
+    await dispose_async_engine()
+    logs.shutdown()
+
+if RAG_ROLE == "reader":
+    @app.middleware("http")
+    async def route_writes_to_writer(request: Request, call_next):
+        if writer_proxy.is_write(request.url.path):
+            return await writer_proxy.forward(request)
+        return await call_next(request)
+
+# Not even installed unless enabled, so requests pay nothing for it by default.
+if PROFILING_ENABLED:
+    @app.middleware("http")
+    async def profile_requests(request: Request, call_next):
+        p = profiling.begin(f"{request.method} {request.url.path}", request.query_params.get("idle") == "1") if profiling.wanted(request.headers, request.query_params) else None
+        if p is None:
+            return await call_next(request)
+        try:
+            response = await call_next(request)
+        finally:
+            profiling.finish(p)
+        response.headers["X-Profile-ID"] = p.id
+        return response
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    if request.url.path.startswith(_UNTRACED):
+        return await call_next(request)
+    trace, token = tracing.begin(request.headers.get("x-trace-id") or request.headers.get("x-request-id"), request.method, request.url.path)
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Trace-ID"] = trace.id
+        return response
+    finally:
+        tracing.finish(trace, token, status)
+
+# Added last so it is outermost and also times requests forwarded to the writer.
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # The route template, not the raw path, keeps label cardinality bounded (/files/{fid}/inline).
+        route = getattr(request.scope.get("route"), "path", None) or ("proxied" if RAG_ROLE == "reader" and writer_proxy.is_write(request.url.path) else "unmatched")
+        HTTP_SECONDS.labels(request.method, route).observe(time.perf_counter() - t0)
+        HTTP_REQUESTS.labels(request.method, route, str(status)).inc()
+
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"], allow_credentials=True)
 app.include_router(health_router)
 app.include_router(files_router)
 app.include_router(vdb_router)
 app.include_router(chat_router)
-app.include_router(tables_router)
\ No newline at end of file
+app.include_router(tables_router)
+app.include_router(ingest_router)
+app.include_router(catalog_router)
+app.include_router(analytics_router)
+app.include_router(advisor_router)
+app.include_router(llm_router)
+app.include_router(metrics_router)
+app.include_router(debug_router)
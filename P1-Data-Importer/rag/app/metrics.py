@@ -0,0 +1,64 @@
+import time
+from contextlib import contextmanager
+from fastapi import HTTPException
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from .config import METRICS_MULTIPROC_DIR
+from . import tracing
+
+# Seconds; generation stages run far longer than embeds and lookups, so the buckets span both.
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 240)
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds", "Latency of one pipeline stage: embed, embed_batch, vector_query, sql_generation, "
+    "sql_execution, llm_generation, llm_queue", ["stage"], buckets=_BUCKETS,
+)
+STAGE_ERRORS = Counter("rag_stage_errors_total", "Stage calls that raised (client errors such as 429 excluded)", ["stage"])
+CACHE_LOOKUPS = Counter("rag_cache_lookups_total", "Cache lookups by cache and result (hit, miss, cold)", ["cache", "result"])
+COALESCED = Counter("rag_coalesced_total", "Calls that shared an identical in-flight call instead of running", ["group"])
+HTTP_SECONDS = Histogram("rag_http_request_seconds", "Request latency by route template", ["method", "route"], buckets=_BUCKETS)
+HTTP_REQUESTS = Counter("rag_http_requests_total", "Requests by route template and status", ["method", "route", "status"])
+INGEST_DOCUMENTS = Counter("rag_ingest_documents_total", "Documents embedded and written to the vector store", ["source"])
+INGEST_RATE = Gauge("rag_ingest_documents_per_second", "Throughput of the most recent ingest run", ["source"], multiprocess_mode="mostrecent")
+INGEST_LAST = Gauge("rag_ingest_last_run_timestamp_seconds", "When the most recent ingest run finished", ["source"], multiprocess_mode="mostrecent")
+LOG_RECORDS = Counter("rag_log_records_total", "Log records emitted, by level", ["level"])
+LOG_BYTES = Counter("rag_log_bytes_total", "Bytes of log output written")
+LOG_DROPPED = Counter("rag_log_dropped_total", "Log records dropped because the log queue was full")
+
+
+@contextmanager
+def timed(stage: str):
+    """Observe the block's duration under `stage` (and trace it as a span); server-side failures also count as stage errors"""
+    t0 = time.perf_counter()
+    try:
+        with tracing.span(stage):
+            yield
+    except HTTPException as e:
+        if e.status_code >= 500:
+            STAGE_ERRORS.labels(stage).inc()
+        raise
+    except Exception:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - t0)
+
+
+def cache_lookup(cache: str, result: str):
+    CACHE_LOOKUPS.labels(cache, result).inc()
+
+
+def record_ingest(source: str, documents: int, seconds: float):
+    INGEST_DOCUMENTS.labels(source).inc(documents)
+    if seconds > 0:
+        INGEST_RATE.labels(source).set(documents / seconds)
+    INGEST_LAST.labels(source).set(time.time())
+
+
+def render():
+    """(body, content type) of the exposition; with several workers it merges every process's files"""
+    if METRICS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
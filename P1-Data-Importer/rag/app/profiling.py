@@ -0,0 +1,191 @@
+import gc
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter, OrderedDict
+from .config import PROFILING_ENABLED, PROFILE_INTERVAL_MS, PROFILE_MAX_SECONDS, PROFILE_STORE_SIZE
+
+# Leaf frames of threads that are parked rather than working for anyone.
+_IDLE = {("selectors.py", "select"), ("threading.py", "wait"), ("queue.py", "get"), ("threading.py", "_wait_for_tstate_lock")}
+# Periodic background loops that sleep between rounds; their samples are noise for a request profile.
+_BACKGROUND = {"ollama-health", "index-publisher"}
+
+_lock = threading.Lock()
+_active = None
+_profiles = OrderedDict()
+
+
+class Profile:
+    """
+    Wall-clock sampling profile: a background thread walks every other thread's
+    stack each PROFILE_INTERVAL_MS and counts the folded stacks. Nothing runs
+    in the profiled code itself, so the cost is the sampler thread alone.
+    """
+
+    def __init__(self, label: str, include_idle: bool):
+        self.id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.include_idle = include_idle
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = time.time()
+        self.seconds = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def _run(self):
+        me = threading.get_ident()
+        names = {}
+        interval = PROFILE_INTERVAL_MS / 1000
+        deadline = time.monotonic() + PROFILE_MAX_SECONDS
+        while not self._stop.wait(interval) and time.monotonic() < deadline:
+            if len(names) != threading.active_count():
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                leaf = (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name)
+                if not self.include_idle and (leaf in _IDLE or names.get(ident) in _BACKGROUND):
+                    continue
+                parts = []
+                while frame is not None:
+                    parts.append(f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_firstlineno})")
+                    frame = frame.f_back
+                parts.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(parts))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.seconds = round(time.time() - self.started_at, 3)
+
+    def folded(self) -> str:
+        """Brendan Gregg's folded format: flamegraph.pl, speedscope and inferno read it as-is"""
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "label": self.label,
+            "started_at": self.started_at,
+            "seconds": self.seconds,
+            "samples": self.samples,
+            "interval_ms": PROFILE_INTERVAL_MS,
+            "stacks": len(self.stacks),
+        }
+
+
+def wanted(headers, query) -> bool:
+    return PROFILING_ENABLED and (headers.get("x-profile") == "1" or query.get("profile") == "1")
+
+
+def begin(label: str, include_idle: bool = False):
+    """Start a profile unless one is already running (samples would mix); returns None when busy"""
+    global _active
+    with _lock:
+        if _active is not None:
+            return None
+        _active = Profile(label, include_idle)
+    _active.start()
+    return _active
+
+
+def finish(p: Profile):
+    global _active
+    p.stop()
+    with _lock:
+        _active = None
+        _profiles[p.id] = p
+        while len(_profiles) > PROFILE_STORE_SIZE:
+            _profiles.popitem(last=False)
+
+
+def get(profile_id: str):
+    with _lock:
+        return _profiles.get(profile_id)
+
+
+def recent() -> list:
+    with _lock:
+        return [p.summary() for p in reversed(_profiles.values())]
+
+
+# ---- memory ----
+
+def _rss_mb():
+    try:
+        with open("/proc/self/status") as fh:
+            return next(round(int(line.split()[1]) / 1024, 1) for line in fh if line.startswith("VmRSS:"))
+    except (OSError, StopIteration):
+        return None
+
+
+def start_tracemalloc(frames: int = 1):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def stop_tracemalloc():
+    tracemalloc.stop()
+
+
+def top_allocations(limit: int = 25, group_by: str = "lineno") -> dict:
+    """Largest live allocations by source line (or file/traceback) since tracemalloc was started"""
+    if not tracemalloc.is_tracing():
+        return {"tracing": False, "hint": "POST /debug/memory/tracemalloc/start, or set TRACEMALLOC_FRAMES, to record allocations"}
+    snap = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    current, peak = tracemalloc.get_traced_memory()
+    stats = snap.statistics(group_by)
+    return {
+        "tracing": True,
+        "traced_mb": round(current / 2**20, 1),
+        "peak_traced_mb": round(peak / 2**20, 1),
+        "top": [
+            {"where": " <- ".join(f"{f.filename}:{f.lineno}" for f in s.traceback), "kb": round(s.size / 1024, 1), "blocks": s.count}
+            for s in stats[:limit]
+        ],
+    }
+
+
+def object_counts(limit: int = 15) -> dict:
+    """
+    One pass over the gc-tracked objects: the most common types, DataFrames (cached
+    query results) and float lists (embedding vectors). ndarrays are not gc-tracked;
+    the vector snapshot reports its own mapped sizes. Takes a fraction of a second
+    on a large heap, so it only runs on request.
+    """
+    types = Counter()
+    frames = {"count": 0, "bytes": 0}
+    float_lists = {"count": 0, "floats": 0}
+    for o in gc.get_objects():
+        t = type(o)
+        types[t.__name__] += 1
+        if t.__name__ == "DataFrame":
+            frames["count"] += 1
+            try:
+                frames["bytes"] += int(o.memory_usage(index=True, deep=False).sum())
+            except Exception:
+                pass
+        elif t is list and len(o) >= 64 and type(o[0]) is float:
+            # Embedding vectors arrive from Ollama as lists of floats.
+            float_lists["count"] += 1
+            float_lists["floats"] += len(o)
+    return {
+        "dataframes": {"count": frames["count"], "mb": round(frames["bytes"] / 2**20, 1)},
+        "embedding_lists": {"count": float_lists["count"], "approx_mb": round(float_lists["floats"] * 32 / 2**20, 1)},
+        "top_types": dict(types.most_common(limit)),
+    }
+
+
+def process() -> dict:
+    return {"pid": os.getpid(), "rss_mb": _rss_mb(), "threads": threading.active_count(), "gc_counts": gc.get_count()}
@@ -0,0 +1,38 @@
+from fastapi import APIRouter, HTTPException
+from ..config import INDEX_ADVISOR_APPLY, INDEX_ADVISOR_MIN_QUERIES
+from ..db import fetch_query_log
+from ..services import index_advisor
+
+router = APIRouter(prefix="/advisor")
+
+@router.get("/queries")
+def recent_queries(limit: int = 100):
+    """Most recent generated queries with engine, outcome and latency"""
+    return {"queries": fetch_query_log(limit=max(1, min(limit, 1000)))}
+
+@router.get("/recommendations")
+def recommendations(days: int = 7, min_queries: int = INDEX_ADVISOR_MIN_QUERIES, limit: int = 10):
+    return {"apply_enabled": INDEX_ADVISOR_APPLY, "recommendations": index_advisor.recommend(days=days, min_queries=min_queries, limit=limit)}
+
+@router.post("/apply")
+def apply_indexes(payload: dict):
+    """Create indexes: `table` + `column`, or the `top` N current recommendations (needs INDEX_ADVISOR_APPLY=1)"""
+    if not INDEX_ADVISOR_APPLY:
+        raise HTTPException(status_code=403, detail="index advisor is in recommend-only mode (set INDEX_ADVISOR_APPLY=1)")
+    if payload.get("table") and payload.get("column"):
+        recs = [r for r in index_advisor.recommend(limit=100) if r["table"] == payload["table"] and r["column"] == payload["column"]]
+        targets = [(payload["table"], payload["column"], recs[0] if recs else None)]
+    else:
+        targets = [(r["table"], r["column"], r) for r in index_advisor.recommend(limit=int(payload.get("top") or 1))]
+    applied = []
+    for table, column, rec in targets:
+        try:
+            applied.append(index_advisor.apply(table, column, rec))
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+    return {"applied": applied}
+
+@router.get("/report")
+def latency_report(days: int = 30):
+    """Before/after latency of logged queries for every index the advisor created"""
+    return {"indexes": index_advisor.report(days=days)}
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, BackgroundTasks
+from ..services import analytics
+
+router = APIRouter(prefix="/analytics")
+
+@router.get("")
+def analytics_status():
+    """Analytic engine availability and the snapshot behind each table"""
+    return analytics.status()
+
+@router.post("/refresh")
+def refresh_snapshots(payload: dict, background: BackgroundTasks):
+    """Re-snapshot changed tables; `tables` is an optional comma-separated list, `force` rebuilds, `background` returns at once"""
+    raw = payload.get("tables") or ""
+    tables = [t.strip() for t in (raw.split(",") if isinstance(raw, str) else raw) if str(t).strip()] or None
+    force = bool(payload.get("force"))
+    if payload.get("background"):
+        background.add_task(analytics.refresh, tables, force)
+        return {"queued": tables or "all", "available": analytics.available()}
+    return analytics.refresh(tables, force=force)
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, HTTPException
+from ..services.catalog import refresh_tables, load_profiles
+from ..services.result_cache import invalidate
+
+router = APIRouter(prefix="/catalog")
+
+@router.get("")
+def list_catalog():
+    """Row counts and refresh times of every profiled table"""
+    profiles = load_profiles()
+    return {"tables": [{"table": p["table"], "row_count": p["row_count"], "columns": len(p["columns"]), "refreshed_at": p["refreshed_at"]} for p in profiles.values()]}
+
+@router.get("/{table_name}")
+def get_table_catalog(table_name: str):
+    p = load_profiles([table_name]).get(table_name)
+    if not p:
+        raise HTTPException(status_code=404, detail="table not profiled")
+    return p
+
+@router.post("/refresh")
+def refresh_catalog(payload: dict):
+    """Profile new rows of imported tables; `tables` is an optional comma-separated list, `full` rescans"""
+    raw = payload.get("tables") or ""
+    tables = [t.strip() for t in (raw.split(",") if isinstance(raw, str) else raw) if str(t).strip()]
+    # Called after every import, so cached query results for the table stop matching right away.
+    invalidate()
+    return refresh_tables(tables or None, full=bool(payload.get("full")))
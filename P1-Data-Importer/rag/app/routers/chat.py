@@ -1,8 +1,13 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from ..routers.vdb import vdb_search
-from ..services.llm import chat_once
-from ..config import DEFAULT_MODEL
+from ..services.llm import achat_once
+from ..config import DEFAULT_MODEL, FAST_PATH_ENABLED, SHORT_CHAT_CHARS
 from ..services.sql_context import retrieve_sql_context
+from ..services.fast_path import try_fast_path
+from ..services import budget, result_cache, scheduler
+from .. import logs
 import logging
 import time
 
@@ -11,7 +16,38 @@ logger = logging.getLogger(__name__)
 
 
 @router.post("/chat")
-def chat(payload: dict):
+async def chat(payload: dict, request: Request):
+    """
+    Runs the chat under one deadline budget (`timeout_s` from the client, capped);
+    a disconnected client or an exhausted budget stops the remaining stages,
+    including a generation already streaming from Ollama.
+    """
+    b = budget.Budget(budget.budget_seconds(payload.get("timeout_s")))
+    token = budget.current.set(b)
+    watcher = asyncio.create_task(budget.watch_disconnect(request, b))
+    budget.begin()
+    error = None
+    try:
+        return await _chat(payload)
+    except budget.Abandoned as e:
+        error = e
+        logger.info("[CHAT] Abandoned: %s", e)
+        raise HTTPException(status_code=499, detail=str(e))
+    except HTTPException as e:
+        error = e
+        raise
+    finally:
+        watcher.cancel()
+        budget.current.reset(token)
+        budget.finish(b, error)
+
+
+async def _chat(payload: dict):
+    """
+    The chat pipeline on the event loop: embeds, search and generation are awaited;
+    SQL planning (pandas, SQLAlchemy) and the fast path run in the threadpool, which
+    copies the context so they still see this request's budget and priority.
+    """
     msg = str(payload.get("message") or "")
     model = str(payload.get("model") or DEFAULT_MODEL)
     use_rag = payload.get("use_rag", False)
@@ -22,8 +58,15 @@ def chat(payload: dict):
     if not msg.strip():
         raise HTTPException(status_code=400, detail="message required")
     
-    logger.info(f"[CHAT] Starting chat request - Question: '{msg[:100]}...'")
-    logger.info(f"[CHAT] Config: use_rag={use_rag}, use_sql={use_sql}, model={model}, topk={topk}")
+    logger.info("[CHAT] Starting chat request - question of %d chars", len(msg))
+    logger.info("[CHAT] Config: use_rag=%s, use_sql=%s, model=%s, topk=%s", use_rag, use_sql, model, topk)
+    if logs.verbose(logger):
+        logger.info("[CHAT] Question: %s", logs.payload(msg))
+    
+    # Reject before retrieval when the model's queue is already full; short plain chats are served first
+    scheduler.scheduler(model).admit_check()
+    short = not use_rag and not use_sql and len(msg) <= SHORT_CHAT_CHARS
+    scheduler.priority.set(scheduler.HIGH if short else scheduler.NORMAL)
     
     t0 = time.time()
     debug_info = _initialize_debug_info(use_rag, use_sql, topk, model, msg, selected_tables)
@@ -33,33 +76,52 @@ def chat(payload: dict):
     
     # VDB retrieval
     if use_rag:
-        vdb_context, vdb_sources, vdb_debug = _retrieve_vdb_context(msg, topk)
+        with budget.stage("retrieval"):
+            vdb_context, vdb_sources, vdb_debug = await _retrieve_vdb_context(msg, topk)
         if vdb_context:
             context_sections.append(vdb_context)
         all_sources["files"] = vdb_sources
         debug_info.update(vdb_debug)
     
-    # SQL retrieval
+    # SQL retrieval: deterministic fast path first, LLM-planned queries otherwise
+    fast = None
     if use_sql:
-        sql_context, sql_sources, sql_debug = _retrieve_sql_context_wrapper(msg, model, selected_tables)
-        if sql_context:
-            context_sections.append(sql_context)
-        all_sources["sql"] = sql_sources
-        debug_info.update(sql_debug)
+        if FAST_PATH_ENABLED and payload.get("fast_path", True):
+            with budget.stage("fast_path"):
+                fast, fast_debug = await run_in_threadpool(_try_fast_path, msg, selected_tables)
+            debug_info.update(fast_debug)
+        if fast:
+            context_sections.append("Context from Database:\n" + fast["context"])
+            all_sources["sql"] = fast["sources"]
+        else:
+            debug_info["route"] = "llm_sql"
+            with budget.stage("sql"):
+                sql_context, sql_sources, sql_debug = await run_in_threadpool(_retrieve_sql_context_wrapper, msg, model, selected_tables)
+            if sql_context:
+                context_sections.append(sql_context)
+            all_sources["sql"] = sql_sources
+            debug_info.update(sql_debug)
     
-    print(context_sections)
     # Build final prompt
     augmented_prompt = _build_final_prompt(msg, context_sections)
     debug_info["augmented_prompt"] = augmented_prompt
     
-    # Get LLM response
-    answer, llm_debug = _get_llm_response(model, augmented_prompt)
-    debug_info.update(llm_debug)
+    # Get LLM response; a fast-path answer with no file context needs no model call
+    if fast and not use_rag:
+        answer = fast["answer"]
+        debug_info.update({"llm_response_ms": 0.0, "llm_skipped": True})
+    else:
+        with budget.stage("generation"):
+            answer, llm_debug = await _get_llm_response(model, augmented_prompt)
+        debug_info.update(llm_debug)
     
     # Calculate total time
     total_time = round((time.time() - t0) * 1000.0, 1)
     debug_info["total_latency_ms"] = total_time
-    logger.info(f"[CHAT] ✓ Total request completed in {total_time}ms")
+    b = budget.current.get()
+    if b is not None:
+        debug_info["budget"] = {"seconds": b.seconds, "remaining_s": round(b.remaining(), 1), "stages_ms": b.stages}
+    logger.info("[CHAT] ✓ Total request completed in %sms", total_time)
     
     return {
         "answer": answer,
@@ -80,27 +142,28 @@ def _initialize_debug_info(use_rag, use_sql, topk, model, msg, selected_tables):
     }
 
 
-def _retrieve_vdb_context(query: str, topk: int):
+async def _retrieve_vdb_context(query: str, topk: int):
     """
     Retrieve context from vector database
     
     Returns:
         tuple: (context_string, sources_list, debug_dict)
     """
-    logger.info(f"[VDB] Starting vector database search (top_k={topk})")
+    logger.info("[VDB] Starting vector database search (top_k=%s)", topk)
     
     try:
         t_start = time.time()
-        vdb_results = search_vector_db_internal(query, topk)
+        vdb_results = await search_vector_db_internal(query, topk)
         elapsed_ms = round((time.time() - t_start) * 1000.0, 1)
         
         sources = vdb_results.get("sources", [])
         num_chunks = len(sources)
         
-        logger.info(f"[VDB] ✓ Retrieved {num_chunks} chunks in {elapsed_ms}ms")
+        logger.info("[VDB] ✓ Retrieved %d chunks in %sms", num_chunks, elapsed_ms)
         
-        # Log each retrieved chunk
-        _log_vdb_chunks(sources)
+        # Per-chunk lines only for sampled requests
+        if logs.verbose(logger):
+            _log_vdb_chunks(sources)
         
         context = None
         if vdb_results.get("context"):
@@ -114,7 +177,7 @@ def _retrieve_vdb_context(query: str, topk: int):
         return context, sources, debug
         
     except Exception as e:
-        logger.error(f"[VDB] ✗ Error during VDB search: {str(e)}")
+        logger.error("[VDB] ✗ Error during VDB search: %s", e)
         return None, [], {"vdb_error": str(e)}
 
 
@@ -124,10 +187,33 @@ def _log_vdb_chunks(sources):
         filename = source.get("filename", "unknown")
         chunk_id = source.get("chunk", "?")
         score = source.get("score", 0)
-        text_preview = source.get("text", "")[:100]
         
-        logger.info(f"[VDB]   Chunk {idx}: {filename} (chunk={chunk_id}, score={score:.4f})")
-        logger.info(f"[VDB]   Preview: {text_preview}...")
+        logger.info("[VDB]   Chunk %d: %s (chunk=%s, score=%.4f)", idx, filename, chunk_id, score)
+        logger.info("[VDB]   Preview: %s", logs.payload(source.get("text", ""), 100))
+
+
+def _try_fast_path(query: str, selected_tables: list):
+    """
+    Template route for simple data questions
+
+    Returns:
+        tuple: (fast_path_result or None, debug_dict)
+    """
+    try:
+        fast = try_fast_path(query, selected_tables)
+    except Exception as e:
+        logger.error("[SQL] ✗ Fast path failed, using LLM planner: %s", e)
+        return None, {"fast_path_error": str(e)}
+    if not fast:
+        return None, {}
+    logger.info("[SQL] ✓ Fast path '%s' on %s in %sms", fast["intent"], fast["table"], fast["ms"])
+    return fast, {
+        "route": f"fast_path:{fast['intent']}",
+        "sql_search_ms": fast["ms"],
+        "sql_queries_executed": len(fast["queries_executed"]),
+        "sql_queries": fast["queries_executed"],
+        "sql_cache": result_cache.stats()
+    }
 
 
 def _retrieve_sql_context_wrapper(query: str, model: str, selected_tables: list):
@@ -137,7 +223,7 @@ def _retrieve_sql_context_wrapper(query: str, model: str, selected_tables: list)
     Returns:
         tuple: (context_string, sources_list, debug_dict)
     """
-    logger.info(f"[SQL] Starting SQL context retrieval (tables={selected_tables or 'all'})")
+    logger.info("[SQL] Starting SQL context retrieval (tables=%s)", selected_tables or "all")
     
     try:
         t_start = time.time()
@@ -145,11 +231,13 @@ def _retrieve_sql_context_wrapper(query: str, model: str, selected_tables: list)
         elapsed_ms = round((time.time() - t_start) * 1000.0, 1)
         
         num_queries = len(sql_results.get("queries_executed", []))
-        logger.info(f"[SQL] ✓ Executed {num_queries} queries in {elapsed_ms}ms")
-        logger.info(f"[SQL] Reasoning: {sql_results.get('reasoning', 'N/A')}")
+        logger.info("[SQL] ✓ Executed %d queries in %sms", num_queries, elapsed_ms)
         
-        # Log each executed query
-        _log_sql_queries(sql_results.get("queries_executed", []))
+        # Reasoning and SQL text for sampled requests; rejected and failed queries always
+        verbose = logs.verbose(logger)
+        _log_sql_queries(sql_results.get("queries_executed", []), verbose)
+        if verbose:
+            logger.info("[SQL] Reasoning: %s", logs.payload(sql_results.get("reasoning", "N/A")))
         
         context = None
         if sql_results.get("context"):
@@ -159,34 +247,42 @@ def _retrieve_sql_context_wrapper(query: str, model: str, selected_tables: list)
             "sql_search_ms": elapsed_ms,
             "sql_queries_executed": num_queries,
             "sql_reasoning": sql_results.get("reasoning", ""),
-            "sql_queries": sql_results.get("queries_executed", [])
+            "sql_queries": sql_results.get("queries_executed", []),
+            "sql_llm_calls": sql_results.get("llm_calls", []),
+            "sql_cache": result_cache.stats()
         }
         
         return context, sql_results.get("sources", []), debug
         
     except Exception as e:
-        logger.error(f"[SQL] ✗ Error during SQL retrieval: {str(e)}")
+        logger.error("[SQL] ✗ Error during SQL retrieval: %s", e)
         return None, [], {"sql_error": str(e)}
 
 
-def _log_sql_queries(queries_executed):
-    """Log details about executed SQL queries"""
+def _log_sql_queries(queries_executed, verbose: bool):
+    """Log details about executed SQL queries; successful ones only when `verbose`"""
     for idx, query_info in enumerate(queries_executed, 1):
         success = query_info.get("success", False)
         status = "✓" if success else "✗"
-        sql_query = query_info.get("sql", "")
+        sql_query = logs.payload(query_info.get("sql", ""), 200)
         explanation = query_info.get("explanation", "")
         
         if success:
+            if not verbose:
+                continue
             row_count = query_info.get("row_count", 0)
-            logger.info(f"[SQL]   {status} Query {idx}: {explanation}")
-            logger.info(f"[SQL]      SQL: {sql_query[:200]}...")
-            logger.info(f"[SQL]      Retrieved {row_count} rows")
+            logger.info("[SQL]   %s Query %d: %s", status, idx, explanation)
+            logger.info("[SQL]      SQL: %s", sql_query)
+            logger.info("[SQL]      Retrieved %s rows", row_count)
+        elif query_info.get("rejected"):
+            logger.warning("[SQL]   %s Query %d REJECTED: %s", status, idx, explanation)
+            logger.warning("[SQL]      SQL: %s", sql_query)
+            logger.warning("[SQL]      Verdict: %s", query_info.get("verdict"))
         else:
             error = query_info.get("error", "unknown")
-            logger.error(f"[SQL]   {status} Query {idx} FAILED: {explanation}")
-            logger.error(f"[SQL]      SQL: {sql_query[:200]}...")
-            logger.error(f"[SQL]      Error: {error}")
+            logger.error("[SQL]   %s Query %d FAILED: %s", status, idx, explanation)
+            logger.error("[SQL]      SQL: %s", sql_query)
+            logger.error("[SQL]      Error: %s", error)
 
 
 def _build_final_prompt(question: str, context_sections: list):
@@ -204,42 +300,46 @@ def _build_final_prompt(question: str, context_sections: list):
         context_block = "\n\n---\n\n".join(context_sections)
         augmented_prompt = f"Use the provided context to answer.\n\n{context_block}\n\nQuestion:\n{question}\n\nAnswer:"
         
-        logger.info(f"[PROMPT] Built augmented prompt with {len(context_sections)} context section(s)")
-        logger.info(f"[PROMPT] Total prompt length: {len(augmented_prompt)} characters")
+        logger.info("[PROMPT] Built augmented prompt with %d context section(s), %d characters", len(context_sections), len(augmented_prompt))
+        if logs.verbose(logger):
+            logger.info("[PROMPT] Context: %s", logs.payload(context_block))
         
         return augmented_prompt
     else:
-        logger.info(f"[PROMPT] No context retrieved, using original question")
+        logger.info("[PROMPT] No context retrieved, using original question")
         return question
 
 
-def _get_llm_response(model: str, prompt: str):
+async def _get_llm_response(model: str, prompt: str):
     """
     Get response from LLM
     
     Returns:
         tuple: (answer_string, debug_dict)
     """
-    logger.info(f"[LLM] Sending request to model: {model}")
+    logger.info("[LLM] Sending request to model: %s", model)
     
     t_start = time.time()
-    answer = chat_once(model, prompt)
+    timings = {}
+    answer = await achat_once(model, prompt, timings=timings)
     elapsed_ms = round((time.time() - t_start) * 1000.0, 1)
     
-    logger.info(f"[LLM] ✓ Generated response in {elapsed_ms}ms")
-    logger.info(f"[LLM] Response preview: {answer[:150]}...")
+    logger.info("[LLM] ✓ Generated response in %sms", elapsed_ms)
+    if logs.verbose(logger):
+        logger.info("[LLM] Response preview: %s", logs.payload(answer, 150))
     
     debug = {
-        "llm_response_ms": elapsed_ms
+        "llm_response_ms": elapsed_ms,
+        "llm_prefill": timings
     }
     
     return answer, debug
 
 
-def search_vector_db_internal(query: str, k: int = 2):
+async def search_vector_db_internal(query: str, k: int = 2):
     """Search the vector database using the internal /search endpoint"""
     payload = {"q": query, "k": k}
-    results = vdb_search(payload)
+    results = await vdb_search(payload)
     
     hits = results.get("results", [])
     
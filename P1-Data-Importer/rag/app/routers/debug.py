@@ -0,0 +1,76 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+from .. import logs, profiling, tracing
+from ..config import PROFILING_ENABLED
+from ..services import result_cache, singleflight
+from ..vector import memory_status
+
+router = APIRouter(prefix="/debug")
+
+@router.get("/traces")
+def traces(limit: int = 20, path: Optional[str] = None, min_ms: float = 0.0, spans: bool = True):
+    """Slowest recent requests in this process with their span trees; `path` filters on the request path"""
+    return {"traces": tracing.slowest(limit=limit, path=path, min_ms=min_ms, spans=spans)}
+
+@router.get("/traces/{trace_id}")
+def trace(trace_id: str):
+    t = tracing.get(trace_id)
+    if not t:
+        raise HTTPException(status_code=404, detail="trace not found (finished traces are kept in a bounded store)")
+    return t
+
+@router.get("/profiles")
+def profiles():
+    """Recent request profiles; capture one with `X-Profile: 1` or `?profile=1` while PROFILING_ENABLED=1"""
+    return {"enabled": PROFILING_ENABLED, "profiles": profiling.recent()}
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+def profile(profile_id: str):
+    """Folded stacks (`frame;frame;frame count` per line) for flamegraph.pl, speedscope or inferno"""
+    p = profiling.get(profile_id)
+    if not p:
+        raise HTTPException(status_code=404, detail="profile not found")
+    return p.folded()
+
+@router.get("/memory")
+def memory(top: int = 25, group_by: str = "lineno", objects: bool = True):
+    """RSS, tracemalloc's top allocators, and what the vector store, result cache, in-flight calls and heap hold"""
+    if group_by not in ("lineno", "filename", "traceback"):
+        raise HTTPException(status_code=400, detail="group_by must be lineno, filename or traceback")
+    out = {
+        "process": profiling.process(),
+        "tracemalloc": profiling.top_allocations(top, group_by),
+        "subsystems": {
+            "vector_store": memory_status(),
+            "result_cache": result_cache.stats(),
+            "inflight_calls": singleflight.inflight(),
+        },
+    }
+    if objects:
+        out["objects"] = profiling.object_counts()
+    return out
+
+@router.post("/memory/tracemalloc/start")
+def tracemalloc_start(frames: int = 1):
+    """Record allocations from now on; costs memory and CPU on every allocation until stopped"""
+    profiling.start_tracemalloc(max(1, min(frames, 50)))
+    return {"tracing": True}
+
+@router.post("/memory/tracemalloc/stop")
+def tracemalloc_stop():
+    profiling.stop_tracemalloc()
+    return {"tracing": False}
+
+@router.get("/logging")
+def logging_status(top: int = 15):
+    """Log volume by level and logger, bytes written, queue depth, drops, and the average hand-off cost per record"""
+    return logs.status(top)
+
+@router.post("/logging")
+def logging_configure(level: Optional[str] = None, logger: str = "", sample: Optional[float] = None, payload_chars: Optional[int] = None):
+    """Change a logger's level (root when `logger` is empty), the payload sample rate or the payload cap at runtime"""
+    if level is not None and level.upper() not in ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"):
+        raise HTTPException(status_code=400, detail="level must be DEBUG, INFO, WARNING, ERROR or CRITICAL")
+    logs.configure(level, logger, sample, payload_chars)
+    return logs.status()
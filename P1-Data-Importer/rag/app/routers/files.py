@@ -1,5 +1,14 @@
-from fastapi import APIRouter, HTTPException, Response
-from ..db import list_files_meta, file_blob
+from fastapi import APIRouter, BackgroundTasks, File, HTTPException, Request, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from ..blobstore import blob_store
+from ..config import FILE_STREAM_CHUNK, FILE_CACHE_MAX_AGE
+from ..db import list_files_meta, afile_meta, iter_file_range, insert_file_row
+from ..services.indexing import index_file, index_status, mark_queued
+from ..services.uploads import UploadError, create_session, session_info, open_append, finish, abort
+from ..services.ranges import (
+    RangeNotSatisfiable, parse_range, http_date, is_not_modified, if_range_allows, content_disposition,
+)
 
 router = APIRouter(prefix="/files")
 
@@ -7,10 +16,116 @@ router = APIRouter(prefix="/files")
 def files():
     return {"files": list_files_meta()}
 
-@router.get("/{fid}/inline")
-def file_inline(fid: int):
-    r = file_blob(fid)
-    if not r:
+@router.api_route("/{fid}/inline", methods=["GET", "HEAD"])
+async def file_inline(fid: int, request: Request):
+    meta = await afile_meta(fid)
+    if not meta:
         raise HTTPException(status_code=404, detail="not found")
-    fname, ctype, data = r
-    return Response(content=data, media_type=ctype or "application/octet-stream", headers={"Content-Disposition": f'inline; filename="{fname}"'})
+    size = int(meta["size_bytes"] or 0)
+    created = meta.get("created_at")
+    # Blob-store files are addressed by content hash; legacy rows are never modified in place,
+    # so id + size + creation time identifies their bytes.
+    etag = f'"{meta["sha256"]}"' if meta.get("sha256") else f'"f{fid}-{size}-{int(created.timestamp()) if created else 0}"'
+    last_modified = http_date(created)
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": f"private, max-age={FILE_CACHE_MAX_AGE}",
+        "Content-Disposition": content_disposition("inline", meta["filename"] or f"file-{fid}"),
+    }
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    if is_not_modified(request.headers, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    status = 200
+    start, end = 0, size - 1
+    if if_range_allows(request.headers, etag, last_modified):
+        try:
+            rng = parse_range(request.headers.get("range"), size)
+        except RangeNotSatisfiable:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+        if rng:
+            start, end = rng
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(max(0, end - start + 1))
+    media_type = meta["content_type"] or "application/octet-stream"
+    if request.method == "HEAD" or size == 0:
+        return Response(status_code=status, headers=headers, media_type=media_type)
+    # A sync iterator: Starlette reads each chunk in the threadpool, off the event loop
+    return StreamingResponse(iter_file_range(meta, start, end, FILE_STREAM_CHUNK), status_code=status, headers=headers, media_type=media_type)
+
+def _register(filename: str, content_type: str, sha: str, size: int, created: bool, index: bool, background_tasks: BackgroundTasks):
+    fid = insert_file_row(filename, content_type, size, sha)
+    if index:
+        mark_queued(fid)
+        background_tasks.add_task(index_file, fid)
+    return {"id": fid, "filename": filename, "sha256": sha, "size_bytes": size, "deduplicated": not created, "indexing": "queued" if index else "skipped"}
+
+def _upload_error(e: UploadError):
+    headers = {"Upload-Offset": str(e.offset)} if e.offset is not None else None
+    return HTTPException(status_code=e.status_code, detail=e.detail, headers=headers)
+
+@router.post("/upload")
+def upload_file(background_tasks: BackgroundTasks, file: UploadFile = File(...), index: bool = True):
+    """Single-request multipart upload, streamed into the blob store while hashing"""
+    sha, size, created = blob_store.put_stream(file.file)
+    return _register(file.filename or "upload", file.content_type or "", sha, size, created, index, background_tasks)
+
+@router.post("/uploads")
+def upload_start(payload: dict):
+    """Open a resumable upload; send bytes with PUT /files/uploads/{id} and an Upload-Offset header"""
+    fname = str(payload.get("filename") or "").strip()
+    if not fname:
+        raise HTTPException(status_code=400, detail="filename required")
+    size = int(payload["size"]) if payload.get("size") is not None else None
+    return create_session(fname, str(payload.get("content_type") or ""), size)
+
+@router.get("/uploads/{uid}")
+def upload_status(uid: str):
+    try:
+        return session_info(uid)
+    except UploadError as e:
+        raise _upload_error(e)
+
+@router.put("/uploads/{uid}")
+async def upload_chunk(uid: str, request: Request):
+    """The body is read on the event loop; disk writes and hashing run in the threadpool, FILE_STREAM_CHUNK at a time"""
+    try:
+        appender = await run_in_threadpool(open_append, uid, int(request.headers.get("upload-offset", "0")))
+    except UploadError as e:
+        raise _upload_error(e)
+    pending = bytearray()
+    try:
+        async for chunk in request.stream():
+            pending += chunk
+            if len(pending) >= FILE_STREAM_CHUNK:
+                await run_in_threadpool(appender.write, bytes(pending))
+                pending.clear()
+        if pending:
+            await run_in_threadpool(appender.write, bytes(pending))
+    finally:
+        await run_in_threadpool(appender.close)
+    return {"upload_id": uid, "offset": appender.offset}
+
+@router.post("/uploads/{uid}/complete")
+def upload_complete(uid: str, background_tasks: BackgroundTasks, index: bool = True):
+    try:
+        info = finish(uid)
+    except UploadError as e:
+        raise _upload_error(e)
+    return _register(info["filename"], info["content_type"], info["sha256"], info["size_bytes"], info["created"], index, background_tasks)
+
+@router.delete("/uploads/{uid}")
+def upload_abort(uid: str):
+    try:
+        abort(uid)
+    except UploadError as e:
+        raise _upload_error(e)
+    return {"aborted": True}
+
+@router.get("/{fid}/index_status")
+def file_index_status(fid: int):
+    return index_status(fid) or {"status": "unknown"}
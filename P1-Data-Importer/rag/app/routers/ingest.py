@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from typing import Optional
+from ..config import ROW_INGEST_BATCH
+from ..services.table_rows import ingest_tables
+
+router = APIRouter(prefix="/ingest")
+
+@router.post("/db")
+def ingest_db(payload: dict):
+    """Vectorize rows of imported tables; `tables` is an optional comma-separated list"""
+    raw = payload.get("tables") or ""
+    tables = [t.strip() for t in (raw.split(",") if isinstance(raw, str) else raw) if str(t).strip()]
+    batch_size = int(payload.get("batch_size") or ROW_INGEST_BATCH)
+    max_rows: Optional[int] = int(payload["max_rows"]) if payload.get("max_rows") else None
+    return ingest_tables(tables or None, batch_size=batch_size, max_rows=max_rows, reindex=bool(payload.get("reindex")))
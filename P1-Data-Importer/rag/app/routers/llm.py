@@ -0,0 +1,44 @@
+from fastapi import APIRouter
+from ..services import budget, models, ollama_pool, prefill, resilience, scheduler, singleflight
+
+router = APIRouter(prefix="/llm")
+
+@router.get("/prefill_stats")
+def prefill_stats():
+    """Prompt prefill time and evaluated tokens per model and route, split by prefix-cache hit, miss and cold start"""
+    return {"stats": prefill.stats()}
+
+@router.post("/prefill_stats/reset")
+def reset_prefill_stats():
+    prefill.reset()
+    return {"reset": True}
+
+@router.get("/models")
+def model_status():
+    """Pinned models with their pull/warmup state, what Ollama has loaded, and the per-route generation limits"""
+    return models.status()
+
+@router.get("/backends")
+def backend_status():
+    """Each Ollama backend's health, ejection, outstanding requests, latency and models"""
+    return ollama_pool.status()
+
+@router.get("/resilience")
+def resilience_status():
+    """Circuit breaker states, hedged embed counts and delays, and the per-stage deadlines"""
+    return resilience.status()
+
+@router.get("/queue")
+def queue_status():
+    """Per-model generation slots, queue depth, wait times and rejections"""
+    return scheduler.status()
+
+@router.get("/coalescing")
+def coalescing_status():
+    """Executions vs. requests that attached to an identical in-flight call, for searches, embeds and completions"""
+    return {"groups": singleflight.stats()}
+
+@router.get("/budget")
+def budget_status():
+    """Chat requests completed, expired or abandoned, and the compute spent on the ones nobody received"""
+    return budget.stats()
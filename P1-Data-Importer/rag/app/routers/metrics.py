@@ -0,0 +1,10 @@
+from fastapi import APIRouter, Response
+from ..metrics import render
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus exposition: stage latency histograms, cache/coalescing/error counters, ingest throughput"""
+    body, content_type = render()
+    return Response(content=body, media_type=content_type)
@@ -1,16 +1,24 @@
+import time
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from typing import Optional
-from ..db import list_file_rows_full
-from ..services.parse import parse_pdf, parse_docx
+from ..db import list_file_rows, clear_row_watermarks
+from ..metrics import record_ingest, timed
+from ..services.indexing import extract_text
 from ..services.chunks import chunk_text
-from ..services.embeddings import embed_texts, pull_embed_model
-from ..vector import get_collection, reset_collection
+from ..services.embeddings import embed_texts, aembed_query, pull_embed_model
+from ..services.singleflight import AsyncGroup
+from ..vector import get_collection, reset_collection, get_rows_collection, reset_rows_collection, index_changed, index_status
 
 router = APIRouter(prefix="/vdb")
+_searches = AsyncGroup("vdb_search")
 
 @router.post("/reset")
 def vdb_reset():
     reset_collection()
+    reset_rows_collection()
+    clear_row_watermarks()
+    index_changed()
     return {"reset": True}
 
 @router.post("/models/setup")
@@ -20,17 +28,14 @@ def vdb_models_setup():
 
 @router.post("/ingest_files")
 def vdb_ingest_files(reindex: Optional[bool] = False):
-    rows = list_file_rows_full()
+    t0 = time.time()
+    rows = list_file_rows()
     docs = []
     metas = []
     ids = []
-    for rid, fname, ctype, sizeb, data in rows:
-        n = str(fname or "").lower()
-        tx = ""
-        if n.endswith(".pdf") or (ctype or "").startswith("application/pdf"):
-            tx = parse_pdf(data)
-        elif n.endswith(".docx") or (ctype or "") == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-            tx = parse_docx(data)
+    for row in rows:
+        rid, fname = row["id"], row["filename"]
+        tx = extract_text(row)
         if not tx:
             continue
         chunks = chunk_text(tx)
@@ -43,17 +48,59 @@ def vdb_ingest_files(reindex: Optional[bool] = False):
     vecs = embed_texts(docs)
     coll = reset_collection() if reindex else get_collection()
     coll.upsert(embeddings=vecs, documents=docs, metadatas=metas, ids=ids)
+    index_changed()
+    record_ingest("files", len(docs), time.time() - t0)
     return {"ingested": len(docs)}
 
+@router.get("/index")
+def vdb_index():
+    """Serving role, and the snapshot version this process searches (reader) or last published (writer)"""
+    return index_status()
+
 @router.post("/search")
-def vdb_search(payload: dict):
+async def vdb_search(payload: dict):
+    q = str(payload.get("q") or "")
+    k = int(payload.get("k") or 5)
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="q required")
+    # Identical searches in flight at the same time share one embed + query
+    return (await _searches.do((q, k), lambda: _search(q, k)))[0]
+
+async def _search(q: str, k: int):
+    v = await aembed_query(q)
+    # The HNSW query and result shaping are CPU work: keep them off the event loop
+    return await run_in_threadpool(_query_files, v, k)
+
+def _query_files(v, k: int):
+    with timed("vector_query"):
+        res = get_collection().query(query_embeddings=[v], n_results=k, include=["documents", "metadatas", "distances"])
+    out = []
+    if res and res.get("documents"):
+        d = res["documents"][0]
+        m = res["metadatas"][0]
+        s = res["distances"][0] if res.get("distances") else [None] * len(d)
+        for i in range(len(d)):
+            out.append({"text": d[i], "meta": m[i], "score": s[i]})
+    return {"results": out}
+
+@router.post("/search_rows")
+def vdb_search_rows(payload: dict):
+    """Semantic lookup over vectorized table rows, optionally restricted to `tables`"""
     q = str(payload.get("q") or "")
     k = int(payload.get("k") or 5)
+    tables = payload.get("tables") or []
+    if isinstance(tables, str):
+        tables = [t.strip() for t in tables.split(",") if t.strip()]
     if not q.strip():
         raise HTTPException(status_code=400, detail="q required")
+    where = None
+    if len(tables) == 1:
+        where = {"table": tables[0]}
+    elif tables:
+        where = {"table": {"$in": tables}}
     v = embed_texts([q])[0]
-    coll = get_collection()
-    res = coll.query(query_embeddings=[v], n_results=k, include=["documents", "metadatas", "distances"])
+    with timed("vector_query"):
+        res = get_rows_collection().query(query_embeddings=[v], n_results=k, where=where, include=["documents", "metadatas", "distances"])
     out = []
     if res and res.get("documents"):
         d = res["documents"][0]
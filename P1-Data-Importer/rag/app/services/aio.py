@@ -0,0 +1,26 @@
+import httpx
+from ..config import AIO_MAX_CONNECTIONS
+
+_client = None
+
+
+def client() -> httpx.AsyncClient:
+    """Process-wide async HTTP client for Ollama; timeouts are set per request from the stage deadlines"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=None,
+            limits=httpx.Limits(max_connections=AIO_MAX_CONNECTIONS, max_keepalive_connections=AIO_MAX_CONNECTIONS),
+        )
+    return _client
+
+
+def timeout(connect: float, total: float) -> httpx.Timeout:
+    return httpx.Timeout(total, connect=connect)
+
+
+async def close():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
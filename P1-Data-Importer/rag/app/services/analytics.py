@@ -0,0 +1,210 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from typing import List, Optional
+from ..config import ANALYTIC_ENGINE, ANALYTIC_DIR, ANALYTIC_EXPORT_BATCH
+from ..db import list_data_tables, get_table_schema, table_key_column, table_versions, iter_table_pages, execute_sql_query
+from .result_cache import current_versions
+
+try:
+    import duckdb
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: without them every query goes to MySQL
+    duckdb = pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+_READ_ONLY = re.compile(r"^\s*(\(\s*)*(SELECT|WITH)\b", re.I)
+_DECIMAL = re.compile(r"(?:DECIMAL|NUMERIC)\((\d+),\s*(\d+)\)", re.I)
+_INTEGER = re.compile(r"^(TINYINT|SMALLINT|MEDIUMINT|INT|INTEGER|BIGINT|YEAR)\b", re.I)
+
+_MANIFEST = os.path.join(ANALYTIC_DIR, "manifest.json")
+_lock = threading.Lock()
+
+
+def available() -> bool:
+    return ANALYTIC_ENGINE == "duckdb" and duckdb is not None
+
+
+def _load_manifest() -> dict:
+    try:
+        with open(_MANIFEST) as fh:
+            return json.load(fh)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save_manifest(manifest: dict):
+    tmp = _MANIFEST + ".tmp"
+    with open(tmp, "w") as fh:
+        json.dump(manifest, fh)
+    os.replace(tmp, _MANIFEST)
+
+
+def _arrow_type(sql_type: str):
+    t = sql_type.upper()
+    m = _DECIMAL.search(t)
+    if m:
+        return pa.decimal128(int(m.group(1)), int(m.group(2)))
+    if _INTEGER.match(t):
+        return pa.uint64() if t.startswith("BIGINT") and "UNSIGNED" in t else pa.int64()
+    if t.startswith(("FLOAT", "DOUBLE", "REAL")):
+        return pa.float64()
+    if t.startswith(("DATETIME", "TIMESTAMP")):
+        return pa.timestamp("us")
+    if t.startswith("DATE"):
+        return pa.date32()
+    if "BLOB" in t or "BINARY" in t:
+        return pa.binary()
+    return pa.string()
+
+
+def _column_array(values, typ):
+    if typ == pa.string():
+        values = [v if v is None or isinstance(v, str) else str(v) for v in values]
+    return pa.array(values, type=typ)
+
+
+def snapshot_table(table: str, version: str) -> dict:
+    """Stream a MySQL table into a Parquet file with types derived from its column definitions"""
+    columns = get_table_schema(table)["columns"]
+    schema = pa.schema([(c["name"], _arrow_type(c["type"])) for c in columns])
+    safe = re.sub(r"[^A-Za-z0-9_]", "_", table)
+    path = os.path.join(ANALYTIC_DIR, f"{safe}.{uuid.uuid4().hex[:8]}.parquet")
+    tmp = path + ".tmp"
+    t0 = time.time()
+    rows = 0
+    try:
+        with pq.ParquetWriter(tmp, schema, compression="zstd") as writer:
+            for cols, page, _, rows in iter_table_pages(table, table_key_column(table), None, 0, ANALYTIC_EXPORT_BATCH):
+                data = list(zip(*page))
+                writer.write_table(pa.Table.from_arrays([_column_array(list(data[cols.index(f.name)]), f.type) for f in schema], schema=schema))
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+    return {"path": path, "version": version, "rows": rows, "seconds": round(time.time() - t0, 2), "built_at": time.time()}
+
+
+def refresh(tables: Optional[List[str]] = None, force: bool = False):
+    """Re-snapshot tables whose data version changed since their last snapshot"""
+    if not available():
+        return {"engine": "mysql", "tables": [], "detail": "analytic engine unavailable"}
+    os.makedirs(ANALYTIC_DIR, exist_ok=True)
+    with _lock:
+        manifest = _load_manifest()
+        versions = table_versions()
+        present = list_data_tables()
+        results = []
+        for t in [t for t in (tables or present) if t in present]:
+            old = manifest.get(t)
+            if old and not force and old["version"] == versions.get(t) and os.path.exists(old["path"]):
+                results.append({"table": t, "rows": old["rows"], "refreshed": False})
+                continue
+            try:
+                manifest[t] = snapshot_table(t, versions.get(t))
+            except Exception as e:
+                logger.error(f"[ANALYTICS] snapshot of {t} failed: {e}")
+                manifest.pop(t, None)
+                results.append({"table": t, "error": str(e), "refreshed": False})
+                continue
+            _save_manifest(manifest)
+            if old and old["path"] != manifest[t]["path"] and os.path.exists(old["path"]):
+                os.unlink(old["path"])
+            logger.info(f"[ANALYTICS] {t}: {manifest[t]['rows']} rows in {manifest[t]['seconds']}s")
+            results.append({"table": t, "rows": manifest[t]["rows"], "seconds": manifest[t]["seconds"], "refreshed": True})
+        for gone in [t for t in manifest if t not in present]:
+            entry = manifest.pop(gone)
+            if os.path.exists(entry["path"]):
+                os.unlink(entry["path"])
+        _save_manifest(manifest)
+    return {"engine": "duckdb", "tables": results}
+
+
+def status() -> dict:
+    manifest = _load_manifest()
+    return {"engine": ANALYTIC_ENGINE, "available": available(), "tables": {t: {k: e[k] for k in ("rows", "version", "built_at")} for t, e in manifest.items()}}
+
+
+def _current_snapshots() -> dict:
+    versions = current_versions()
+    return {t: e for t, e in _load_manifest().items() if e["version"] == versions.get(t) and os.path.exists(e["path"])}
+
+
+def to_duckdb_sql(sql: str) -> str:
+    """
+    MySQL quoting in DuckDB's dialect: backtick identifiers become double-quoted ones,
+    and double-quoted strings (which DuckDB would read as identifiers) become
+    single-quoted literals. Backslash escapes inside literals are resolved, since
+    DuckDB keeps a backslash as a plain character.
+    """
+    out, quote, i = [], None, 0
+    while i < len(sql):
+        ch = sql[i]
+        if quote is None:
+            if ch in "'\"`":
+                quote = ch
+                out.append('"' if ch == "`" else "'")
+            else:
+                out.append(ch)
+        elif quote == "`":
+            if ch == "`" and sql[i + 1:i + 2] == "`":
+                i += 1
+                out.append("`")
+            elif ch == "`":
+                quote = None
+                out.append('"')
+            else:
+                out.append('""' if ch == '"' else ch)
+        elif ch == "\\" and i + 1 < len(sql):
+            i += 1
+            out.append("''" if sql[i] == "'" else sql[i])
+        elif ch == quote and sql[i + 1:i + 2] == quote:
+            i += 1
+            out.append("''" if ch == "'" else ch)
+        elif ch == quote:
+            quote = None
+            out.append("'")
+        else:
+            out.append("''" if ch == "'" else ch)
+        i += 1
+    return "".join(out).rstrip().rstrip(";")
+
+
+def _run_duckdb(sql: str, snapshots: dict):
+    con = duckdb.connect(":memory:")
+    try:
+        # MySQL's default collations compare strings case-insensitively.
+        con.execute("PRAGMA default_collation='nocase'")
+        for t, e in snapshots.items():
+            ident = '"' + t.replace('"', '""') + '"'
+            path = "'" + e["path"].replace("'", "''") + "'"
+            con.execute(f"CREATE VIEW {ident} AS SELECT * FROM read_parquet({path})")
+        return con.execute(to_duckdb_sql(sql)).df()
+    finally:
+        con.close()
+
+
+def execute(sql: str, mysql_gate=None):
+    """
+    Run a generated read-only query, preferring the columnar snapshots
+
+    Returns (DataFrame, engine). Queries touching a table without a current
+    snapshot, or using MySQL-only syntax DuckDB rejects, run on MySQL instead,
+    after `mysql_gate(sql)` (which may raise to refuse them).
+    """
+    if available() and _READ_ONLY.match(sql):
+        snapshots = _current_snapshots()
+        if snapshots:
+            try:
+                return _run_duckdb(sql, snapshots), "duckdb"
+            except Exception as e:
+                logger.info(f"[ANALYTICS] falling back to MySQL: {e}")
+    if mysql_gate:
+        mysql_gate(sql)
+    return execute_sql_query(sql), "mysql"
@@ -0,0 +1,139 @@
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from fastapi import HTTPException
+from ..config import CHAT_BUDGET_S, CHAT_BUDGET_MAX_S, BUDGET_SHARES
+from .. import tracing
+
+_lock = threading.Lock()
+_stats = {
+    "requests": 0, "completed": 0, "expired": 0, "disconnected": 0,
+    "aborted_generations": 0, "wasted_generation_ms": 0.0, "wasted_tokens": 0, "wasted_stage_ms": 0.0,
+}
+
+
+class Abandoned(Exception):
+    """The request's client went away; work done for it so far is wasted"""
+
+
+class Expired(HTTPException):
+    """The request's own budget ran out (a 504); another request sharing its work is not bound by it"""
+
+    def __init__(self, detail: str):
+        super().__init__(status_code=504, detail=detail)
+
+
+class Budget:
+    """One request's end-to-end time budget, shared by every stage it runs"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.start = time.monotonic()
+        self.end = self.start + seconds
+        self.disconnected = threading.Event()
+        self.stages = {}
+
+    def remaining(self) -> float:
+        return max(0.0, self.end - time.monotonic())
+
+    def allot(self, stage: str) -> float:
+        """Seconds a stage starting now may use: its share of what is left, so later stages keep theirs"""
+        return self.remaining() * BUDGET_SHARES.get(stage, 1.0)
+
+    def check(self, stage: str = "", during: bool = False):
+        """`during` when the stage was already running as the budget ran out"""
+        if self.disconnected.is_set():
+            raise Abandoned(f"client disconnected{' during ' + stage if stage else ''}")
+        if self.remaining() <= 0:
+            when = " during " if during else " before "
+            raise Expired(f"request budget of {self.seconds:g}s exhausted{when + stage if stage else ''}")
+
+
+current = contextvars.ContextVar("request_budget", default=None)
+
+
+def budget_seconds(requested) -> float:
+    try:
+        seconds = float(requested) if requested else CHAT_BUDGET_S
+    except (TypeError, ValueError):
+        seconds = CHAT_BUDGET_S
+    return max(1.0, min(seconds, CHAT_BUDGET_MAX_S))
+
+
+def allot(stage: str, default: float) -> float:
+    """`default` capped by the current request's budget for the stage, if there is one"""
+    b = current.get()
+    return default if b is None else max(0.001, min(default, b.allot(stage)))
+
+
+def check(stage: str = "", during: bool = False):
+    b = current.get()
+    if b is not None:
+        b.check(stage, during)
+
+
+def cancelled() -> bool:
+    b = current.get()
+    return b is not None and (b.disconnected.is_set() or b.remaining() <= 0)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a request stage after checking the budget; stage times feed the wasted-compute counter"""
+    check(name)
+    t0 = time.monotonic()
+    try:
+        with tracing.span(name):
+            yield
+    finally:
+        b = current.get()
+        if b is not None:
+            b.stages[name] = round(b.stages.get(name, 0.0) + (time.monotonic() - t0) * 1000, 1)
+
+
+def record_aborted_generation(ms: float, tokens: int):
+    with _lock:
+        _stats["aborted_generations"] += 1
+        _stats["wasted_generation_ms"] += ms
+        _stats["wasted_tokens"] += tokens
+
+
+def begin():
+    with _lock:
+        _stats["requests"] += 1
+
+
+def finish(b: Budget, error: BaseException = None):
+    """Count how the request ended; everything an abandoned or expired request computed is wasted"""
+    with _lock:
+        if isinstance(error, Abandoned):
+            _stats["disconnected"] += 1
+        elif isinstance(error, HTTPException) and error.status_code == 504:
+            _stats["expired"] += 1
+        elif error is None:
+            _stats["completed"] += 1
+            return
+        else:
+            return
+        _stats["wasted_stage_ms"] += sum(b.stages.values())
+
+
+async def watch_disconnect(request, b: Budget, interval: float = 0.5):
+    """Poll the ASGI connection and flag the budget when the client goes away"""
+    while not b.disconnected.is_set():
+        if await request.is_disconnected():
+            b.disconnected.set()
+            return
+        await asyncio.sleep(interval)
+
+
+def stats() -> dict:
+    with _lock:
+        out = dict(_stats)
+    out["wasted_generation_ms"] = round(out["wasted_generation_ms"], 1)
+    out["wasted_stage_ms"] = round(out["wasted_stage_ms"], 1)
+    out["default_budget_s"] = CHAT_BUDGET_S
+    out["shares"] = BUDGET_SHARES
+    return out
@@ -0,0 +1,194 @@
+import logging
+import re
+import time
+from decimal import Decimal
+from typing import List, Optional
+import pandas as pd
+from ..config import CATALOG_SCAN_BATCH
+from ..db import (
+    list_data_tables, get_table_schema, table_created_at, table_key_column, iter_table_pages,
+    get_table_profiles, save_table_profile, clear_table_profiles,
+)
+from .sketches import HyperLogLog, merge_topk
+
+logger = logging.getLogger(__name__)
+
+_VALUE_MAX_CHARS = 64
+_LIST_VALUES_MAX_DISTINCT = 20
+_PROMPT_TOP_VALUES = 10
+_RANGED_TYPE = re.compile(r"INT|DEC|NUMERIC|FLOAT|DOUBLE|REAL|DATE|TIME|YEAR", re.I)
+
+
+def _json_value(v):
+    """JSON-safe, order-preserving form of a cell value (dates as ISO strings), or None"""
+    if v is None or isinstance(v, (bytes, bytearray)):
+        return None
+    if isinstance(v, float):
+        return v if v == v else None
+    if isinstance(v, (bool, int)):
+        return v
+    if isinstance(v, Decimal):
+        return float(v)
+    if hasattr(v, "isoformat"):
+        return v.isoformat()
+    return str(v)[:_VALUE_MAX_CHARS]
+
+
+def _extreme(a, b, pick):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    try:
+        return pick(a, b)
+    except TypeError:
+        return a
+
+
+def _new_column(col: dict) -> dict:
+    return {"name": col["name"], "type": col["type"], "nullable": col.get("nullable", True),
+            "nulls": 0, "min": None, "max": None, "hll": "", "topk": {}}
+
+
+def _fold_page(columns: List[dict], df: pd.DataFrame, key_column: Optional[str], sketches: dict):
+    for col in columns:
+        s = df[col["name"]]
+        present = s.dropna()
+        col["nulls"] += len(s) - len(present)
+        if present.empty:
+            continue
+        sketches[col["name"]].add_series(present)
+        values = [x for x in map(_json_value, present) if x is not None]
+        if values and _RANGED_TYPE.search(col["type"]):
+            try:
+                col["min"] = _extreme(col["min"], min(values), min)
+                col["max"] = _extreme(col["max"], max(values), max)
+            except TypeError:
+                pass
+        if col["name"] != key_column:
+            col["topk"] = merge_topk(col["topk"], present)
+
+
+def refresh_table(table: str, full: bool = False, batch_size: int = CATALOG_SCAN_BATCH):
+    """
+    Profile one table into the catalog: row count, null counts, min/max, distinct
+    estimates (HyperLogLog) and top values per column
+
+    Only rows after the stored key watermark are scanned and folded into the
+    existing sketches. A re-created table, a changed key or column set, or
+    `full=True` rebuilds the profile from scratch. Tables without a single-column
+    key resume by offset, which assumes they are append-only.
+    """
+    created = table_created_at(table)
+    key_column = table_key_column(table)
+    schema = get_table_schema(table)["columns"]
+    stored = None if full else get_table_profiles([table]).get(table)
+    if stored:
+        old_cols = stored["profile"].get("columns", [])
+        if (stored.get("table_created_at") != created or stored.get("key_column") != key_column
+                or [c["name"] for c in old_cols] != [c["name"] for c in schema]):
+            stored = None
+    if stored:
+        columns = old_cols
+        for col, fresh in zip(columns, schema):
+            col["type"], col["nullable"] = fresh["type"], fresh.get("nullable", True)
+        last_key, offset = stored.get("last_key"), int(stored.get("row_count") or 0)
+    else:
+        columns = [_new_column(c) for c in schema]
+        last_key, offset = None, 0
+    sketches = {c["name"]: HyperLogLog.from_b64(c["hll"]) for c in columns}
+
+    t0 = time.time()
+    scanned = 0
+    for cols, rows, last_key, offset in iter_table_pages(table, key_column, last_key, offset, batch_size):
+        # object dtype keeps ints with NULLs as ints, so hashes stay stable across pages
+        _fold_page(columns, pd.DataFrame([tuple(r) for r in rows], columns=cols, dtype=object), key_column, sketches)
+        scanned += len(rows)
+    for c in columns:
+        c["hll"] = sketches[c["name"]].to_b64()
+    save_table_profile(table, key_column, None if last_key is None else str(last_key), offset, created, {"columns": columns})
+    elapsed = time.time() - t0
+    logger.info(f"[CATALOG] {table}: scanned {scanned} rows in {round(elapsed, 2)}s (total {offset})")
+    return {"table": table, "rows_scanned": scanned, "row_count": offset, "incremental": bool(stored), "seconds": round(elapsed, 2)}
+
+
+def refresh_tables(tables: Optional[List[str]] = None, full: bool = False):
+    available = list_data_tables()
+    targets = [t for t in (tables or available) if t in available]
+    if tables is None:
+        # Drop profiles of tables that no longer exist.
+        for gone in set(get_table_profiles()) - set(available):
+            clear_table_profiles(gone)
+    return {"tables": [refresh_table(t, full=full) for t in targets]}
+
+
+def column_stats(col: dict, row_count: int) -> dict:
+    """Derived, human-readable statistics for one stored column profile"""
+    non_null = max(0, row_count - col["nulls"])
+    topk = col.get("topk") or {}
+    distinct = min(HyperLogLog.from_b64(col["hll"]).estimate(), non_null)
+    exact = bool(topk) and len(topk) < 100 and sum(topk.values()) == non_null
+    if exact:
+        distinct = len(topk)
+    top = sorted(topk.items(), key=lambda kv: kv[1], reverse=True)[:_PROMPT_TOP_VALUES]
+    return {
+        "name": col["name"],
+        "type": col["type"],
+        "nullable": col.get("nullable", True),
+        "null_frac": round(col["nulls"] / row_count, 4) if row_count else 0.0,
+        "min": col.get("min"),
+        "max": col.get("max"),
+        "distinct": distinct,
+        "distinct_exact": exact,
+        "top_values": [{"value": v, "count": n} for v, n in top],
+    }
+
+
+def describe(entry: dict) -> dict:
+    """Catalog entry (from get_table_profiles) without the raw sketches"""
+    n = int(entry.get("row_count") or 0)
+    return {
+        "table": entry["table_name"],
+        "row_count": n,
+        "key_column": entry.get("key_column"),
+        "refreshed_at": entry.get("refreshed_at"),
+        "columns": [column_stats(c, n) for c in entry["profile"].get("columns", [])],
+    }
+
+
+def load_profiles(tables: Optional[List[str]] = None) -> dict:
+    return {t: describe(e) for t, e in get_table_profiles(tables).items()}
+
+
+def _fmt(v) -> str:
+    if isinstance(v, float):
+        return f"{v:g}"
+    return str(v)
+
+
+def render_column(c: dict, row_count: int, key_column: Optional[str]) -> str:
+    """`name TYPE -- stats` line for the schema prompt"""
+    line = f"{c['name']} {c['type']}"
+    if not c["nullable"]:
+        line += " NOT NULL"
+    if row_count and c["null_frac"] >= 1:
+        return line + " -- always null"
+    notes = []
+    if c["name"] == key_column:
+        notes.append("primary key")
+    if c["null_frac"] >= 0.005:
+        notes.append(f"{c['null_frac']:.0%} null")
+    if c["min"] is not None and c["name"] != key_column:
+        notes.append(f"range {_fmt(c['min'])} .. {_fmt(c['max'])}")
+    if c["name"] != key_column and c["distinct"] <= _LIST_VALUES_MAX_DISTINCT and c["top_values"]:
+        values = ", ".join(repr(t["value"]) for t in c["top_values"])
+        more = "" if c["distinct"] <= len(c["top_values"]) else ", ..."
+        notes.append(f"{c['distinct']} distinct: {values}{more}")
+    elif c["name"] != key_column:
+        notes.append(f"{'' if c['distinct_exact'] else '~'}{c['distinct']:,} distinct")
+    return line + (" -- " + "; ".join(notes) if notes else "")
+
+
+def render_table(p: dict) -> str:
+    lines = [render_column(c, p["row_count"], p["key_column"]) for c in p["columns"]]
+    return f"TABLE {p['table']} ({p['row_count']:,} rows):\n  " + "\n  ".join(lines) + "\n\n"
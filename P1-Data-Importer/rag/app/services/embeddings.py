@@ -1,36 +1,64 @@
+import hashlib
 import requests
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 from typing import List
-from ..config import OLLAMA_BASE, EMBED_MODEL
+from ..config import EMBED_MODEL, EMBED_HEDGE_MAX_TEXTS
+from ..metrics import timed
+from . import models, ollama_pool, resilience
+from .singleflight import AsyncGroup, Group
+
+_embeds = Group("embed_texts")
+_aembeds = AsyncGroup("embed_texts")
 
 def pull_embed_model():
-    r = requests.post(f"{OLLAMA_BASE}/api/pull", json={"name": EMBED_MODEL}, stream=True, timeout=600)
-    if r.status_code not in (200, 201):
-        raise HTTPException(status_code=500, detail=r.text)
+    try:
+        models.pull(EMBED_MODEL)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-def _embed_once(endpoint: str, text: str):
-    return requests.post(f"{OLLAMA_BASE}{endpoint}", json={"model": EMBED_MODEL, "prompt": text}, timeout=120)
+def _post_embed(endpoint: str, payload: dict, n: int = 1):
+    """Small embeds are hedged across backends; all of them go through the embed model's circuit breaker"""
+    stage = "embed" if n <= EMBED_HEDGE_MAX_TEXTS else "embed_batch"
+    with timed(stage), resilience.circuit(f"embed:{EMBED_MODEL}") as outcome:
+        if stage == "embed":
+            r = resilience.hedged_post("embed", EMBED_MODEL, endpoint, payload)
+        else:
+            r = ollama_pool.post(EMBED_MODEL, endpoint, payload, timeout=resilience.timeout("embed_batch"))
+        if r.status_code >= 500:
+            outcome.fail()
+        return r
+
+def _embed_once(endpoint: str, text: str, n: int = 1):
+    """One text of an `n`-text request; ingestion-sized requests skip the hedge"""
+    return _post_embed(endpoint, {"model": EMBED_MODEL, "prompt": text, "keep_alive": models.keep_alive(EMBED_MODEL)}, n)
 
 def embed_texts(texts: List[str]) -> List[List[float]]:
+    """Embed texts one call each; identical concurrent requests share the work"""
+    key = hashlib.sha1("\x1f".join(texts).encode("utf-8")).hexdigest() + f":{len(texts)}"
+    return _embeds.do(key, lambda: _embed_texts(texts))[0]
+
+def _embed_texts(texts: List[str]) -> List[List[float]]:
+    n = len(texts)
     try:
-        t = _embed_once("/api/embeddings", "ping")
+        t = _embed_once("/api/embeddings", "ping", n)
         if t.status_code == 404:
-            t = _embed_once("/api/embed", "ping")
+            t = _embed_once("/api/embed", "ping", n)
         if t.status_code in (404, 400) and "not found" in t.text.lower():
             pull_embed_model()
     except requests.RequestException as e:
         raise HTTPException(status_code=500, detail=str(e))
     out = []
     for x in texts:
-        r = _embed_once("/api/embeddings", x)
+        r = _embed_once("/api/embeddings", x, n)
         if r.status_code == 404:
-            r = _embed_once("/api/embed", x)
+            r = _embed_once("/api/embed", x, n)
         if r.status_code >= 400:
             if "not found" in r.text.lower():
                 pull_embed_model()
-                r = _embed_once("/api/embeddings", x)
+                r = _embed_once("/api/embeddings", x, n)
                 if r.status_code == 404:
-                    r = _embed_once("/api/embed", x)
+                    r = _embed_once("/api/embed", x, n)
             if r.status_code >= 400:
                 raise HTTPException(status_code=500, detail=r.text)
         j = r.json()
@@ -39,3 +67,49 @@ def embed_texts(texts: List[str]) -> List[List[float]]:
             raise HTTPException(status_code=500, detail="embed payload missing vector")
         out.append(v)
     return out
+
+def embed_batch(texts: List[str]) -> List[List[float]]:
+    """Embed many texts in one round trip via /api/embed; falls back to per-text calls on older Ollama"""
+    if not texts:
+        return []
+    try:
+        r = _post_embed("/api/embed", {"model": EMBED_MODEL, "input": texts, "keep_alive": models.keep_alive(EMBED_MODEL)}, len(texts))
+    except requests.RequestException as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if r.status_code == 404 and "not found" in r.text.lower() and "model" in r.text.lower():
+        pull_embed_model()
+        r = _post_embed("/api/embed", {"model": EMBED_MODEL, "input": texts, "keep_alive": models.keep_alive(EMBED_MODEL)}, len(texts))
+    if r.status_code == 404:
+        return embed_texts(texts)
+    if r.status_code >= 400:
+        raise HTTPException(status_code=500, detail=r.text)
+    vecs = r.json().get("embeddings") or []
+    if len(vecs) != len(texts):
+        raise HTTPException(status_code=500, detail="embed payload size mismatch")
+    return vecs
+
+async def aembed_query(text: str) -> List[float]:
+    """One query embedding on the async path: hedged, breaker-guarded and coalesced like embed_texts"""
+    return (await _aembeds.do(text, lambda: _aembed_query(text)))[0]
+
+async def _aembed_query(text: str) -> List[float]:
+    payload = {"model": EMBED_MODEL, "input": [text], "keep_alive": models.keep_alive(EMBED_MODEL)}
+    try:
+        with timed("embed"), resilience.circuit(f"embed:{EMBED_MODEL}") as outcome:
+            r = await resilience.ahedged_post("embed", EMBED_MODEL, "/api/embed", payload)
+            if r.status_code >= 500:
+                outcome.fail()
+    except ollama_pool.TRANSPORT_ERRORS as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if r.status_code == 404 and "model" in r.text.lower():
+        models.pull_in_background(EMBED_MODEL)
+        raise HTTPException(status_code=503, detail=f"Model {EMBED_MODEL} is not available yet; it is being pulled", headers={"Retry-After": "30"})
+    if r.status_code == 404:
+        # Ollama without /api/embed: fall back to the per-text endpoint
+        return (await run_in_threadpool(embed_texts, [text]))[0]
+    if r.status_code >= 400:
+        raise HTTPException(status_code=500, detail=r.text)
+    vecs = r.json().get("embeddings") or []
+    if not vecs:
+        raise HTTPException(status_code=500, detail="embed payload missing vector")
+    return vecs[0]
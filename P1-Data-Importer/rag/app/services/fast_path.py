@@ -0,0 +1,206 @@
+import re
+import time
+from typing import Dict, List, Optional
+from ..config import SQL_MAX_LIMIT
+from ..db import list_data_tables, get_table_schema
+from .catalog import load_profiles, render_table
+from .sql_context import execute_guarded, log_executed_query
+from .sql_guard import QueryRejected
+
+# Whole-question templates; anything that does not match one goes to the LLM planner.
+_TABLE = r"(?:the )?(?:table )?(?P<t>[a-z0-9_ ]+?)(?: table)?"
+_DESCRIBE = re.compile(
+    r"^(?:describe|(?:show|list|what are)(?: me)?(?: the)? (?:columns|fields|schema|structure) (?:of|for|in)|"
+    r"what (?:columns|fields) (?:are in|does|do)|schema (?:of|for)|structure of) " + _TABLE + r"(?: have| contain)?$"
+)
+_COUNT = re.compile(
+    r"^(?:how many|count(?: the)?|count of|number of|total number of|what is the number of)"
+    r"(?: rows| records| entries| items)?(?: are| is)?(?: there)?(?: in| of| for)? " + _TABLE + r"(?: are there| do we have| exist)?$"
+)
+_ROWS = re.compile(
+    r"^(?:show|list|give|get|display|fetch|return)(?: me)?(?: all| the| all the)?"
+    r"(?: (?P<w>first|top|last|latest|newest|bottom|lowest|highest) (?P<n>\d{1,5})| (?P<n2>\d{1,5}))?"
+    r"(?: rows| records| entries)?(?: of| from| in)? " + _TABLE + r"(?: rows| records)?"
+    r"(?: (?:ordered|sorted) by (?:the )?(?P<o>[a-z0-9_ ]+))?$"
+)
+_FILTER = re.compile(r"^(?P<head>.+?) (?:where|with|whose) (?:the )?(?P<c>[a-z0-9_ ]+?) ?(?:is|=|==|equals|equal to) ?(?P<v>.+)$")
+_MULTI_CONDITION = re.compile(r"\b(and|or|not|like|in)\b|[<>!]")
+_NUMERIC_TYPE = re.compile(r"INT|DEC|NUMERIC|FLOAT|DOUBLE|REAL", re.I)
+_DEFAULT_ROWS = 10
+
+
+def _words(text: str) -> str:
+    return " " + re.sub(r"[^a-z0-9_]+", " ", text.lower()) + " "
+
+
+def _forms(name: str) -> set:
+    base = name.lower()
+    forms = {base, base.replace("_", " ")}
+    for f in list(forms):
+        forms.add(f[:-1] if f.endswith("s") else f + "s")
+    return {f for f in forms if f}
+
+
+def _match_name(text: str, names: List[str]) -> Optional[str]:
+    """Longest name (or its spaced/singular/plural form) appearing as whole words in text"""
+    padded = _words(text)
+    best = None
+    for n in names:
+        for f in _forms(n):
+            if f" {f} " in padded and (best is None or len(f) > best[1]):
+                best = (n, len(f))
+    return best[0] if best else None
+
+
+def _q(name: str) -> str:
+    return "`" + name.replace("`", "``") + "`"
+
+
+def _literal(value: str, sql_type: str) -> Optional[str]:
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+        value = value[1:-1].replace(value[0] * 2, value[0])
+    if not value or "\\" in value:
+        return None
+    if _NUMERIC_TYPE.search(sql_type):
+        try:
+            float(value)
+            return value
+        except ValueError:
+            return None
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _table(name: str, tables: List[str]) -> Optional[str]:
+    return next((t for t in tables if name.strip() in _forms(t)), None)
+
+
+def plan(question: str, tables: List[str], profiles: Dict, columns: Dict[str, List[Dict]]) -> Optional[Dict]:
+    """
+    Map a simple question onto deterministic SQL: row counts, first/last/top N rows,
+    an equality filter on a named column, or a table description. None means
+    the question needs the LLM planner.
+    """
+    original = re.sub(r"\s+", " ", question.strip().rstrip("?.! "))
+    q = original.lower()
+
+    m = _DESCRIBE.match(q)
+    if m:
+        table = _table(m.group("t"), tables)
+        return {"intent": "describe", "table": table, "sql": None} if table else None
+
+    where, described_filter, head = "", "", q
+    f = _FILTER.match(q)
+    if f:
+        head = f.group("head")
+        value = original[f.start("v"):f.end("v")]
+        if _MULTI_CONDITION.search(value.lower()):
+            return None
+    m = _COUNT.match(head)
+    intent = "count" if m else "rows"
+    m = m or _ROWS.match(head)
+    if not m:
+        return None
+    table = _table(m.group("t"), tables)
+    if not table:
+        return None
+    col_names = [c["name"] for c in columns[table]]
+    col_types = {c["name"]: c["type"] for c in columns[table]}
+    if f:
+        col = _match_name(f.group("c"), col_names)
+        lit = _literal(value, col_types[col]) if col else None
+        if lit is None:
+            return None
+        where = f" WHERE {_q(col)} = {lit}"
+        described_filter = f" where {col} = {lit}"
+
+    if intent == "count":
+        return {"intent": "count", "table": table, "filter": described_filter,
+                "sql": f"SELECT COUNT(*) AS row_count FROM {_q(table)}{where}"}
+
+    word, n = m.group("w"), m.group("n") or m.group("n2")
+    limit = min(int(n) if n else _DEFAULT_ROWS, SQL_MAX_LIMIT)
+    order = ""
+    if m.group("o"):
+        col = _match_name(m.group("o"), col_names)
+        if not col:
+            return None
+        order = f" ORDER BY {_q(col)} {'ASC' if word in ('bottom', 'lowest', 'first') else 'DESC'}"
+    elif word in ("last", "latest", "newest"):
+        key = (profiles.get(table) or {}).get("key_column")
+        if not key:
+            return None
+        order = f" ORDER BY {_q(key)} DESC"
+    elif word in ("top", "highest", "bottom", "lowest"):
+        # "top 5 customers" without a column to rank by is ambiguous.
+        return None
+    return {"intent": "rows", "table": table, "filter": described_filter,
+            "sql": f"SELECT * FROM {_q(table)}{where}{order} LIMIT {limit}"}
+
+
+def _fenced(text: str) -> str:
+    return "```\n" + text.rstrip() + "\n```"
+
+
+def try_fast_path(question: str, selected_tables: List[str] = None) -> Optional[Dict]:
+    """
+    Answer simple data questions without an SQL-generation call
+
+    Returns None when the question needs the LLM planner, otherwise a dict with
+    the intent, the context/sources/queries_executed shapes of retrieve_sql_context,
+    and a ready `answer` the chat can return as-is when no other context is used.
+    """
+    t0 = time.perf_counter()
+    tables = list_data_tables()
+    if selected_tables:
+        tables = [t for t in tables if t in selected_tables]
+    if not tables:
+        return None
+    profiles = load_profiles(tables)
+    columns = {t: profiles[t]["columns"] if t in profiles else get_table_schema(t)["columns"] for t in tables}
+    p = plan(question, tables, profiles, columns)
+    if not p:
+        return None
+    table = p["table"]
+
+    if p["intent"] == "describe":
+        if table in profiles:
+            text = render_table(profiles[table])
+        else:
+            text = f"TABLE {table}:\n  " + "\n  ".join(f"{c['name']} {c['type']}" for c in columns[table])
+        return {**p, "context": text, "answer": _fenced(text), "sources": [], "queries_executed": [],
+                "ms": round((time.perf_counter() - t0) * 1000, 1)}
+
+    try:
+        t_sql = time.perf_counter()
+        guarded, df, engine_used, cache_hit = execute_guarded(p["sql"])
+    except QueryRejected:
+        return None
+    entry = {
+        "sql": guarded,
+        "explanation": f"fast path: {p['intent']}",
+        "row_count": len(df),
+        "engine": engine_used,
+        "cache": "hit" if cache_hit else "miss",
+        "latency_ms": round((time.perf_counter() - t_sql) * 1000, 1),
+        "retry": False,
+        "success": True,
+    }
+    log_executed_query(entry)
+
+    if p["intent"] == "count":
+        n = int(df.iloc[0, 0]) if len(df) else 0
+        answer = f"`{table}` has {n:,} row{'s' if n != 1 else ''}{p['filter']}."
+    elif df.empty:
+        answer = f"No rows in `{table}`{p['filter']}."
+    else:
+        answer = f"{len(df)} row{'s' if len(df) != 1 else ''} from `{table}`{p['filter']}:\n\n" + _fenced(df.to_string(index=False))
+    context = f"QUERY 1: {entry['explanation']}\nSQL: {guarded}\nRESULTS ({len(df)} rows):\n" + df.to_csv(index=False)
+    return {
+        **p,
+        "context": context,
+        "answer": answer,
+        "sources": [{"query_index": 1, "tables_used": [table], "row_count": len(df), "explanation": entry["explanation"]}],
+        "queries_executed": [entry],
+        "ms": round((time.perf_counter() - t0) * 1000, 1),
+    }
@@ -0,0 +1,261 @@
+import hashlib
+import logging
+import re
+import statistics
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from ..config import INDEX_ADVISOR_APPLY, INDEX_ADVISOR_MIN_QUERIES
+from ..db import (
+    list_data_tables, get_table_schema, table_indexes, create_index, fetch_query_log,
+    record_index_action, list_index_actions,
+)
+from .catalog import load_profiles
+from .sql_guard import mask_sql
+
+logger = logging.getLogger(__name__)
+
+_TABLE_REF = re.compile(r"\b(?:FROM|JOIN)\s+`?(\w+)`?(?:\s+(?:AS\s+)?`?(\w+)`?)?", re.I)
+_FROM = re.compile(r"\bFROM\b", re.I)
+_FROM_END = re.compile(
+    r"(?:WHERE|GROUP|ORDER|HAVING|LIMIT|UNION|WINDOW|ON|USING|NATURAL|STRAIGHT_JOIN|(?:LEFT|RIGHT|INNER|CROSS|OUTER|FULL)?\s*JOIN)\b", re.I
+)
+_FROM_ITEM = re.compile(r"^\s*`?(\w+)`?(?:\s+(?:AS\s+)?`?(\w+)`?)?", re.I)
+_CLAUSE = re.compile(r"\b(SELECT|FROM|WHERE|ON|USING|GROUP\s+BY|ORDER\s+BY|HAVING|LIMIT|UNION|(?:LEFT|RIGHT|INNER|CROSS|OUTER)?\s*JOIN)\b", re.I)
+_COLREF = r"(?:`?(\w+)`?\s*\.\s*)?`?([A-Za-z_]\w*)`?"
+_PREDICATE_LEFT = re.compile(_COLREF + r"\s*(<=>|<=|>=|<>|!=|=|<|>|\bNOT\s+IN\b|\bIN\b|\bBETWEEN\b|\bIS\b)", re.I)
+_PREDICATE_RIGHT = re.compile(r"(?:=|<|>)\s*" + _COLREF + r"(?![\w`]|\s*\()", re.I)
+_SORT_ITEM = re.compile(r"^\s*" + _COLREF + r"(\s+(ASC|DESC))?\s*$", re.I)
+_NOT_ALIAS = {
+    "WHERE", "JOIN", "LEFT", "RIGHT", "INNER", "OUTER", "CROSS", "ON", "USING", "GROUP", "ORDER",
+    "LIMIT", "HAVING", "UNION", "NATURAL", "STRAIGHT_JOIN", "WINDOW",
+}
+_KEYWORDS = {"AND", "OR", "NOT", "NULL", "TRUE", "FALSE", "IS", "IN", "LIKE", "BETWEEN", "CASE", "WHEN", "THEN", "ELSE", "END", "INTERVAL"}
+_UNINDEXABLE = re.compile(r"TEXT|BLOB|JSON", re.I)
+# Share of rows a range predicate is assumed to keep when nothing better is known.
+_RANGE_SELECTIVITY = 0.1
+
+
+def _from_lists(masked: str):
+    """(table, alias) of every item in comma-separated FROM lists; a derived table's own FROM is found on its own"""
+    for m in _FROM.finditer(masked):
+        items, depth, start, i = [], 0, m.end(), m.end()
+        while i < len(masked):
+            ch = masked[i]
+            if ch == "(":
+                depth += 1
+            elif ch == ")":
+                if depth == 0:
+                    break
+                depth -= 1
+            elif depth == 0:
+                if ch == ",":
+                    items.append(masked[start:i])
+                    start = i + 1
+                elif ch.isalpha() and not (masked[i - 1].isalnum() or masked[i - 1] in "_`") and _FROM_END.match(masked, i):
+                    break
+            i += 1
+        items.append(masked[start:i])
+        for item in items:
+            ref = _FROM_ITEM.match(item)
+            if ref:
+                yield ref.group(1), ref.group(2)
+
+
+def _table_refs(masked: str):
+    yield from ((m.group(1), m.group(2)) for m in _TABLE_REF.finditer(masked))
+    yield from _from_lists(masked)
+
+
+def referenced_tables(sql: str) -> List[str]:
+    """Table names after FROM/JOIN, in FROM lists and in subqueries, in their original case"""
+    return list(dict.fromkeys(t for t, _ in _table_refs(mask_sql(sql, identifiers=False))))
+
+
+def _aliases(masked: str) -> Dict[str, str]:
+    out = {}
+    for table, alias in _table_refs(masked):
+        out[table.lower()] = table
+        if alias and alias.upper() not in _NOT_ALIAS:
+            out[alias.lower()] = table
+    return out
+
+
+def _segments(masked: str):
+    """(clause keyword, text) pieces of a statement, split at clause keywords"""
+    parts = _CLAUSE.split(masked)
+    # split() with one capturing group alternates text and the matched keyword
+    yield "SELECT", parts[0]
+    for i in range(1, len(parts) - 1, 2):
+        word = re.sub(r"\s+", " ", parts[i].strip().upper())
+        yield ("JOIN" if word.endswith("JOIN") else word), parts[i + 1]
+
+
+def column_uses(sql: str, columns_by_table: Dict[str, set]):
+    """
+    Yield (table, column, role) for columns the statement filters, joins,
+    groups or orders on; role is "eq", "range", "join", "group" or "order"
+    """
+    masked = mask_sql(sql, identifiers=False)
+    aliases = _aliases(masked)
+    in_query = [t for t in dict.fromkeys(aliases.values()) if t in columns_by_table]
+
+    def resolve(qualifier, column):
+        if column.upper() in _KEYWORDS:
+            return None
+        if qualifier:
+            table = aliases.get(qualifier.lower())
+            return (table, column) if table in columns_by_table and column in columns_by_table[table] else None
+        owners = [t for t in in_query if column in columns_by_table[t]]
+        return (owners[0], column) if len(owners) == 1 else None
+
+    seen = set()
+    for clause, text in _segments(masked):
+        found = []
+        if clause in ("WHERE", "ON", "HAVING"):
+            for m in _PREDICATE_LEFT.finditer(text):
+                op = m.group(3).upper()
+                role = "join" if clause == "ON" else "eq" if op in ("=", "<=>", "IN", "IS") else "range"
+                found.append((m.group(1), m.group(2), role))
+            for m in _PREDICATE_RIGHT.finditer(text):
+                found.append((m.group(1), m.group(2), "join" if clause == "ON" else "eq"))
+        elif clause == "USING":
+            found += [(None, c, "join") for c in re.findall(r"\w+", text)]
+        elif clause in ("GROUP BY", "ORDER BY"):
+            for item in text.split(","):
+                m = _SORT_ITEM.match(item)
+                if m:
+                    found.append((m.group(1), m.group(2), "group" if clause == "GROUP BY" else "order"))
+        for qualifier, column, role in found:
+            hit = resolve(qualifier, column)
+            if hit and (hit + (role,)) not in seen:
+                seen.add(hit + (role,))
+                yield hit[0], hit[1], role
+
+
+def index_name(table: str, col: str) -> str:
+    name = f"ix_{table}_{col}"
+    if len(name) <= 64:
+        return name
+    return name[:55] + "_" + hashlib.sha1(name.encode()).hexdigest()[:8]
+
+
+def _expected_rows(row_count: int, distinct: int, roles: set) -> int:
+    if roles & {"eq", "join"}:
+        return max(1, row_count // max(1, distinct))
+    if "range" in roles:
+        return max(1, int(row_count * _RANGE_SELECTIVITY))
+    return row_count
+
+
+def recommend(days: int = 7, min_queries: int = INDEX_ADVISOR_MIN_QUERIES, limit: int = 10) -> List[Dict]:
+    """
+    Rank unindexed columns that logged MySQL queries repeatedly filter, join, group
+    or order on, with the catalog-based estimate of rows examined per lookup
+    """
+    tables = list_data_tables()
+    columns = {t: get_table_schema(t)["columns"] for t in tables}
+    columns_by_table = {t: {c["name"] for c in cols} for t, cols in columns.items()}
+    types = {(t, c["name"]): c["type"] for t, cols in columns.items() for c in cols}
+    stats = defaultdict(lambda: {"queries": 0, "latency_ms": 0.0, "roles": set(), "last_id": None})
+    for q in fetch_query_log(since=datetime.now() - timedelta(days=days)):
+        # DuckDB- and cache-served queries never touch MySQL indexes; rejected ones are what an index would unblock.
+        if q["engine"] in ("duckdb", "cache"):
+            continue
+        for table, column, role in column_uses(q["sql_text"], columns_by_table):
+            s = stats[(table, column)]
+            s["roles"].add(role)
+            if s["last_id"] != q["id"]:
+                s["queries"] += 1
+                s["latency_ms"] += float(q["latency_ms"] or 0)
+                s["last_id"] = q["id"]
+
+    profiles = load_profiles(list({t for t, _ in stats}))
+    existing = {t: {tuple(ix[:1]) for ix in table_indexes(t)} for t in {t for t, _ in stats}}
+    out = []
+    for (table, column), s in stats.items():
+        if s["queries"] < min_queries or (column,) in existing[table] or _UNINDEXABLE.search(types[(table, column)]):
+            continue
+        prof = profiles.get(table)
+        col = next((c for c in prof["columns"] if c["name"] == column), None) if prof else None
+        row_count = prof["row_count"] if prof else None
+        distinct = col["distinct"] if col else None
+        if row_count and distinct is not None:
+            after = _expected_rows(row_count, distinct, s["roles"])
+            speedup = round(row_count / after, 1) if after else None
+            if s["roles"] <= {"eq", "join", "range"} and distinct <= 1:
+                continue
+        else:
+            after = speedup = None
+        benefit = s["latency_ms"] * (1 - 1 / speedup) if speedup else s["latency_ms"] * 0.5
+        out.append({
+            "table": table,
+            "column": column,
+            "roles": sorted(s["roles"]),
+            "queries": s["queries"],
+            "total_latency_ms": round(s["latency_ms"], 1),
+            "avg_latency_ms": round(s["latency_ms"] / s["queries"], 1),
+            "row_count": row_count,
+            "distinct": distinct,
+            "expected_rows_examined": {"before": row_count, "after": after},
+            "expected_speedup": speedup,
+            "expected_saving_ms": round(benefit, 1),
+            "index_name": index_name(table, column),
+            "ddl": f"ALTER TABLE `{table}` ADD INDEX `{index_name(table, column)}` (`{column}`)",
+        })
+    out.sort(key=lambda r: r["expected_saving_ms"], reverse=True)
+    return out[:limit]
+
+
+def apply(table: str, column: str, recommendation: Optional[Dict] = None) -> Dict:
+    """Create one recommended index; refused unless INDEX_ADVISOR_APPLY=1"""
+    if not INDEX_ADVISOR_APPLY:
+        raise PermissionError("index advisor is in recommend-only mode (set INDEX_ADVISOR_APPLY=1)")
+    if table not in list_data_tables() or column not in {c["name"] for c in get_table_schema(table)["columns"]}:
+        raise ValueError(f"unknown column {table}.{column}")
+    name = index_name(table, column)
+    create_index(table, column, name)
+    record_index_action(table, column, name, recommendation or {})
+    logger.info(f"[ADVISOR] created {name} on {table}({column})")
+    return {"table": table, "column": column, "index_name": name}
+
+
+def _latency_summary(values: List[float]) -> Dict:
+    if not values:
+        return {"queries": 0, "avg_ms": None, "p50_ms": None, "p95_ms": None}
+    values = sorted(values)
+    return {
+        "queries": len(values),
+        "avg_ms": round(statistics.fmean(values), 1),
+        "p50_ms": round(values[len(values) // 2], 1),
+        "p95_ms": round(values[min(len(values) - 1, int(len(values) * 0.95))], 1),
+    }
+
+
+def report(days: int = 30) -> List[Dict]:
+    """Logged latency of queries using each applied index's column, before vs after it was created"""
+    actions = list_index_actions()
+    if not actions:
+        return []
+    log = [q for q in fetch_query_log(since=datetime.now() - timedelta(days=days)) if q["success"] and q["engine"] not in ("duckdb", "cache")]
+    columns_by_table = {t: {c["name"] for c in get_table_schema(t)["columns"]} for t in {a["table_name"] for a in actions} if t in list_data_tables()}
+    out = []
+    for a in actions:
+        if a["table_name"] not in columns_by_table:
+            continue
+        before, after = [], []
+        for q in log:
+            if any(t == a["table_name"] and c == a["column_name"] for t, c, _ in column_uses(q["sql_text"], columns_by_table)):
+                (after if q["created_at"] >= a["applied_at"] else before).append(float(q["latency_ms"] or 0))
+        b, af = _latency_summary(before), _latency_summary(after)
+        out.append({
+            "table": a["table_name"],
+            "column": a["column_name"],
+            "index_name": a["index_name"],
+            "applied_at": a["applied_at"],
+            "expected": a["expected_benefit"],
+            "before": b,
+            "after": af,
+            "observed_speedup": round(b["avg_ms"] / af["avg_ms"], 1) if b["avg_ms"] and af["avg_ms"] else None,
+        })
+    return out
@@ -0,0 +1,76 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from ..blobstore import blob_store
+from ..db import file_meta, read_file_bytes
+from ..metrics import record_ingest
+from ..vector import get_collection, index_changed
+from .parse import parse_pdf, parse_docx
+from .chunks import chunk_text
+from .embeddings import embed_texts
+
+logger = logging.getLogger(__name__)
+
+_STATUS = OrderedDict()
+_STATUS_LOCK = threading.Lock()
+_STATUS_MAX = 1000
+
+
+def extract_text(row: dict) -> str:
+    """Parse a stored PDF/DOCX, reading blob-store files through a memory map"""
+    n = str(row["filename"] or "").lower()
+    ctype = row["content_type"] or ""
+    if n.endswith(".pdf") or ctype.startswith("application/pdf"):
+        parse = parse_pdf
+    elif n.endswith(".docx") or ctype == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
+        parse = parse_docx
+    else:
+        return ""
+    if row.get("sha256") and blob_store.exists(row["sha256"]):
+        with blob_store.open_mmap(row["sha256"]) as m:
+            return parse(m)
+    return parse(read_file_bytes(row))
+
+
+def _set_status(fid: int, status: str, **extra):
+    with _STATUS_LOCK:
+        _STATUS[fid] = {"status": status, **extra}
+        _STATUS.move_to_end(fid)
+        while len(_STATUS) > _STATUS_MAX:
+            _STATUS.popitem(last=False)
+
+
+def index_status(fid: int):
+    with _STATUS_LOCK:
+        return _STATUS.get(fid)
+
+
+def mark_queued(fid: int):
+    _set_status(fid, "queued")
+
+
+def index_file(fid: int):
+    """Parse, chunk, embed and upsert a single file, replacing any chunks it already had"""
+    _set_status(fid, "indexing")
+    t0 = time.time()
+    try:
+        meta = file_meta(fid)
+        tx = extract_text(meta) if meta else ""
+        coll = get_collection()
+        coll.delete(where={"file_id": fid})
+        chunks = chunk_text(tx) if tx else []
+        if chunks:
+            coll.upsert(
+                embeddings=embed_texts(chunks),
+                documents=chunks,
+                metadatas=[{"file_id": fid, "filename": meta["filename"], "chunk": i} for i in range(len(chunks))],
+                ids=[f"f{fid}-{i}" for i in range(len(chunks))],
+            )
+        record_ingest("upload", len(chunks), time.time() - t0)
+        _set_status(fid, "indexed", chunks=len(chunks))
+    except Exception as e:
+        logger.error(f"[INDEX] file {fid} failed: {e}")
+        _set_status(fid, "failed", error=str(e))
+    # Old chunks are deleted even when indexing fails, so publish either way.
+    index_changed()
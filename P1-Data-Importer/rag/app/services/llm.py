@@ -1,47 +1,190 @@
+import asyncio
 import json
+import time
+import httpx
 import requests
 from fastapi import HTTPException
-from ..config import OLLAMA_BASE
+from .. import tracing
+from ..metrics import STAGE_SECONDS, timed
+from . import aio, budget, models, ollama_pool, prefill, resilience, scheduler
+from .singleflight import AsyncGroup, Group
 
-def pull(model: str):
-    r = requests.post(f"{OLLAMA_BASE}/api/pull", json={"name": model}, stream=True, timeout=600)
-    if r.status_code not in (200, 201):
-        raise HTTPException(status_code=500, detail=r.text)
+_completions = Group("chat_once")
+_acompletions = AsyncGroup("chat_once")
 
-def try_generate(model: str, prompt: str):
-    response = requests.post(
-        f"{OLLAMA_BASE}/api/generate",
-        json={"model": model, "prompt": prompt, "stream": True},
-        timeout=300,
-        stream=True
-    )
-    
-    # Collect streamed response
-    full_response = ""
-    for line in response.iter_lines():
-        if line:
-            chunk = json.loads(line)
-            if "response" in chunk:
-                full_response += chunk["response"]
-            if chunk.get("done"):
-                break
+# Timing fields of the final /api/generate chunk (durations in nanoseconds)
+_METRICS = ("prompt_eval_count", "prompt_eval_duration", "eval_count", "eval_duration", "load_duration", "total_duration")
+# Histogram stage of each generation route
+_STAGES = {"chat": "llm_generation", "sql_plan": "sql_generation", "sql_retry": "sql_generation"}
+
+def try_generate(model: str, prompt: str, route: str = "chat"):
+    # The backend stays leased until the stream is drained so its outstanding count is honest.
+    limit = resilience.deadline(route)
+    t0 = time.monotonic()
+    tokens = 0
+    with ollama_pool.lease(model, budgeted=resilience.budget_bound(route, limit)) as backend:
+        try:
+            response = requests.post(
+                f"{backend.url}/api/generate",
+                json={"model": model, "prompt": prompt, "stream": True, "keep_alive": models.keep_alive(model), "options": models.options(route)},
+                timeout=(resilience.timeout(route)[0], limit),
+                stream=True
+            )
+            if response.status_code >= 400:
+                return response
+            
+            # Collect streamed response
+            full_response = ""
+            metrics = {}
+            for line in response.iter_lines():
+                if time.monotonic() - t0 > limit or budget.cancelled():
+                    # Closing the connection makes Ollama stop generating for this request.
+                    response.close()
+                    raise ollama_pool.DeadlineExceeded(f"{route} generation exceeded its {limit:.0f}s deadline")
+                tokens += 1
+                if tokens == 1:
+                    tracing.annotate(route=route, ttft_ms=round((time.monotonic() - t0) * 1000, 1))
+                if line:
+                    chunk = json.loads(line)
+                    if "response" in chunk:
+                        full_response += chunk["response"]
+                    if chunk.get("done"):
+                        metrics = {k: chunk[k] for k in _METRICS if k in chunk}
+                        tracing.annotate(tokens=metrics.get("eval_count"), prompt_tokens=metrics.get("prompt_eval_count"))
+                        break
+        except requests.Timeout as e:
+            budget.record_aborted_generation((time.monotonic() - t0) * 1000, tokens)
+            budget.check(route, during=True)
+            if resilience.budget_bound(route, limit):
+                # Stopped by this request's budget: a coalesced caller with more time left reruns the call.
+                raise budget.Expired(f"{route} generation stopped at the request's {limit:.1f}s deadline") from e
+            raise
     
     return type('obj', (object,), {
         'status_code': response.status_code,
-        'json': lambda: {"response": full_response}
+        'text': full_response,
+        'json': lambda: {"response": full_response, "metrics": metrics}
     })
 
-def try_chat(model: str, prompt: str):
-    return requests.post(f"{OLLAMA_BASE}/api/chat", json={"model": model, "messages":[{"role":"user","content": prompt}]}, timeout=180)
+def try_chat(model: str, prompt: str, route: str = "chat"):
+    return ollama_pool.post(model, "/api/chat", {"model": model, "messages":[{"role":"user","content": prompt}], "stream": False, "keep_alive": models.keep_alive(model), "options": models.options(route)}, timeout=resilience.timeout(route))
 
-def chat_once(model: str, prompt: str):
-    r = try_generate(model, prompt)
-    if r.status_code == 404:
-        pull(model)
-        r = try_generate(model, prompt)
+async def atry_chat(model: str, prompt: str, route: str = "chat"):
+    """try_chat() over the async client: (status, reply text or error body)"""
+    r = await ollama_pool.apost(model, "/api/chat", {"model": model, "messages":[{"role":"user","content": prompt}], "stream": False, "keep_alive": models.keep_alive(model), "options": models.options(route)}, timeout=resilience.atimeout(route))
+    if r.status_code >= 400:
+        return r.status_code, r.text
+    return r.status_code, r.json().get("message", {}).get("content") or ""
+
+def _model_missing(status: int, body: str) -> bool:
+    """models.is_missing() for a status and body read off a stream"""
+    return status == 404 and "model" in body.lower() and "not found" in body.lower()
+
+def chat_once(model: str, prompt: str, prefix_len: int = None, route: str = "chat", timings: dict = None):
+    """
+    One completion, bounded by the route's num_predict/num_ctx and deadline, run
+    when the model's scheduler admits it.
+    `prefix_len` marks how much of the prompt is shared with other calls (Ollama
+    reuses its KV cache for a repeated prefix while the model stays loaded); the
+    call's prefill metrics are recorded per route and copied into `timings`.
+    Identical concurrent calls (same model, route and prompt) share one generation.
+    """
+    (text, summary), shared = _completions.do((model, route, prompt), lambda: _generate(model, prompt, prefix_len, route))
+    if timings is not None:
+        timings.update(summary, coalesced=shared)
+    return text
+
+def _generate(model: str, prompt: str, prefix_len: int, route: str):
+    try:
+        with scheduler.slot(model) as queue_ms, timed(_STAGES.get(route, route)), resilience.circuit(f"generate:{model}") as outcome:
+            STAGE_SECONDS.labels("llm_queue").observe(queue_ms / 1000)
+            r = try_generate(model, prompt, route)
+            if r.status_code >= 500:
+                outcome.fail()
+    except requests.Timeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except requests.ConnectionError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if models.is_missing(r):
+        # Pulling takes minutes; start it and let the client retry instead of holding the request.
+        models.pull_in_background(model)
+        raise HTTPException(status_code=503, detail=f"Model {model} is not available yet; it is being pulled", headers={"Retry-After": "30"})
     if r.status_code == 404:
-        r = try_chat(model, prompt)
+        r = try_chat(model, prompt, route)
     if r.status_code >= 400:
         raise HTTPException(status_code=500, detail=r.text)
     j = r.json()
-    return j.get("response") or j.get("message", {}).get("content") or ""
+    summary = {"queue_wait_ms": queue_ms}
+    if "metrics" in j:
+        summary.update(prefill.record(model, route, prompt[:prefix_len] if prefix_len else "", j["metrics"]))
+    return j.get("response") or j.get("message", {}).get("content") or "", summary
+
+
+async def achat_once(model: str, prompt: str, prefix_len: int = None, route: str = "chat", timings: dict = None):
+    """chat_once() for the async request path: streams over httpx without holding a thread"""
+    (text, summary), shared = await _acompletions.do((model, route, prompt), lambda: _agenerate(model, prompt, prefix_len, route))
+    if timings is not None:
+        timings.update(summary, coalesced=shared)
+    return text
+
+async def _agenerate(model: str, prompt: str, prefix_len: int, route: str):
+    try:
+        async with scheduler.aslot(model) as queue_ms:
+            STAGE_SECONDS.labels("llm_queue").observe(queue_ms / 1000)
+            with timed(_STAGES.get(route, route)), resilience.circuit(f"generate:{model}") as outcome:
+                status, body, metrics = await _astream(model, prompt, route)
+                if status == 404 and not _model_missing(status, body):
+                    status, body = await atry_chat(model, prompt, route)
+                if status >= 500:
+                    outcome.fail()
+    except (requests.Timeout, httpx.TimeoutException) as e:
+        raise HTTPException(status_code=504, detail=str(e) or f"{route} generation timed out")
+    except httpx.TransportError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if _model_missing(status, body):
+        models.pull_in_background(model)
+        raise HTTPException(status_code=503, detail=f"Model {model} is not available yet; it is being pulled", headers={"Retry-After": "30"})
+    if status >= 400:
+        raise HTTPException(status_code=500, detail=body)
+    summary = {"queue_wait_ms": queue_ms}
+    if metrics:
+        summary.update(prefill.record(model, route, prompt[:prefix_len] if prefix_len else "", metrics))
+    return body, summary
+
+async def _astream(model: str, prompt: str, route: str):
+    """(status, text or error body, metrics) of one streamed /api/generate; leaving the stream early closes it"""
+    limit = resilience.deadline(route)
+    t0 = time.monotonic()
+    tokens = 0
+    with ollama_pool.lease(model, budgeted=resilience.budget_bound(route, limit)) as backend:
+        try:
+            async with aio.client().stream(
+                "POST",
+                f"{backend.url}/api/generate",
+                json={"model": model, "prompt": prompt, "stream": True, "keep_alive": models.keep_alive(model), "options": models.options(route)},
+                timeout=resilience.atimeout(route),
+            ) as response:
+                if response.status_code >= 400:
+                    return response.status_code, (await response.aread()).decode("utf-8", "replace"), {}
+                full_response = ""
+                async for line in response.aiter_lines():
+                    # Leaving the `async with` closes the connection, which stops the generation in Ollama.
+                    if time.monotonic() - t0 > limit or budget.cancelled():
+                        raise ollama_pool.DeadlineExceeded(f"{route} generation exceeded its {limit:.0f}s deadline")
+                    tokens += 1
+                    if tokens == 1:
+                        tracing.annotate(route=route, ttft_ms=round((time.monotonic() - t0) * 1000, 1))
+                    if line:
+                        chunk = json.loads(line)
+                        full_response += chunk.get("response", "")
+                        if chunk.get("done"):
+                            tracing.annotate(tokens=chunk.get("eval_count"), prompt_tokens=chunk.get("prompt_eval_count"))
+                            return response.status_code, full_response, {k: chunk[k] for k in _METRICS if k in chunk}
+                return response.status_code, full_response, {}
+        except (requests.Timeout, httpx.TimeoutException, asyncio.CancelledError) as e:
+            budget.record_aborted_generation((time.monotonic() - t0) * 1000, tokens)
+            budget.check(route, during=True)
+            if resilience.budget_bound(route, limit) and not isinstance(e, asyncio.CancelledError):
+                # Stopped by this request's budget: a coalesced caller with more time left reruns the call.
+                raise budget.Expired(f"{route} generation stopped at the request's {limit:.1f}s deadline") from e
+            raise
@@ -0,0 +1,159 @@
+import logging
+import threading
+import time
+import requests
+from . import ollama_pool
+from ..config import EMBED_MODEL, DEFAULT_MODEL, PRELOAD_MODELS, OLLAMA_KEEP_ALIVE, MODEL_PIN_KEEP_ALIVE, LLM_ROUTE_LIMITS
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_state = {}
+_pulling = {}
+
+
+def pinned() -> list:
+    """Models preloaded at startup and kept loaded indefinitely"""
+    return list(dict.fromkeys([DEFAULT_MODEL, EMBED_MODEL] + PRELOAD_MODELS))
+
+
+def keep_alive(model: str):
+    value = MODEL_PIN_KEEP_ALIVE if model in pinned() else OLLAMA_KEEP_ALIVE
+    # Ollama reads a string as a Go duration ("30m", "-1m"); a bare "-1" or "0" would be a 400, so send those as numbers.
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def options(route: str) -> dict:
+    """Ollama generation options (num_predict, num_ctx) for a route"""
+    return dict(LLM_ROUTE_LIMITS.get(route) or LLM_ROUTE_LIMITS["chat"])
+
+
+def _set(model: str, **fields):
+    with _lock:
+        _state.setdefault(model, {"status": "unknown"}).update(fields, updated_at=time.time())
+
+
+def is_missing(response) -> bool:
+    """Ollama's answer for a model that has not been pulled"""
+    text = response.text.lower()
+    return response.status_code == 404 and "model" in text and "not found" in text
+
+
+def pull(model: str):
+    """Pull a model onto every backend it is placed on, waiting for the download; concurrent callers share one pull"""
+    with _lock:
+        event = _pulling.get(model)
+        owner = event is None
+        if owner:
+            event = _pulling[model] = threading.Event()
+    if not owner:
+        event.wait()
+        if _state.get(model, {}).get("status") == "error":
+            raise RuntimeError(_state[model].get("error"))
+        return
+    _set(model, status="pulling")
+    try:
+        t0 = time.time()
+        for b in ollama_pool.placed(model):
+            if b.has(model) or not b.available():
+                continue
+            r = requests.post(f"{b.url}/api/pull", json={"name": model, "stream": False}, timeout=3600)
+            if r.status_code not in (200, 201):
+                raise RuntimeError(f"{b.url}: {r.text}")
+            ollama_pool.check(b)
+        _set(model, status="pulled", pull_seconds=round(time.time() - t0, 1), error=None)
+        logger.info(f"[MODELS] pulled {model} in {time.time() - t0:.1f}s")
+    except Exception as e:
+        _set(model, status="error", error=str(e))
+        raise
+    finally:
+        with _lock:
+            _pulling.pop(model, None)
+        event.set()
+
+
+def pull_in_background(model: str):
+    """Start pulling a missing model without blocking the request that found it missing"""
+    with _lock:
+        if model in _pulling:
+            return
+    threading.Thread(target=_pull_quietly, args=(model,), daemon=True).start()
+
+
+def _pull_quietly(model: str):
+    try:
+        pull(model)
+    except Exception as e:
+        logger.error(f"[MODELS] pull of {model} failed: {e}")
+
+
+def _load(url: str, model: str):
+    if model == EMBED_MODEL:
+        return requests.post(f"{url}/api/embed", json={"model": model, "input": "warmup", "keep_alive": keep_alive(model)}, timeout=600)
+    # An empty prompt loads the model without generating; num_ctx must match the routes or Ollama reloads.
+    return requests.post(f"{url}/api/generate", json={"model": model, "keep_alive": keep_alive(model), "options": {"num_ctx": options("chat")["num_ctx"]}}, timeout=600)
+
+
+def warm(model: str):
+    """Load a model into memory on each of its backends with an empty request and pin it with keep_alive"""
+    t0 = time.time()
+    for b in ollama_pool.placed(model):
+        if not b.available():
+            continue
+        r = _load(b.url, model)
+        if is_missing(r):
+            pull(model)
+            r = _load(b.url, model)
+        if r.status_code >= 400:
+            raise RuntimeError(f"{b.url}: {r.text}")
+    _set(model, status="ready", warm_seconds=round(time.time() - t0, 1), error=None)
+    logger.info(f"[MODELS] {model} loaded in {time.time() - t0:.1f}s")
+
+
+def warm_all():
+    for model in pinned():
+        try:
+            warm(model)
+        except Exception as e:
+            _set(model, status="error", error=str(e))
+            logger.error(f"[MODELS] warmup of {model} failed: {e}")
+
+
+def start_warmup():
+    """Pull and load the pinned models in the background so the API comes up immediately"""
+    for model in pinned():
+        _set(model, status="loading")
+    threading.Thread(target=warm_all, daemon=True).start()
+
+
+def loaded() -> list:
+    """Models each Ollama backend currently holds in memory (/api/ps)"""
+    out = []
+    for b in ollama_pool.backends():
+        if not b.available():
+            continue
+        r = requests.get(f"{b.url}/api/ps", timeout=5)
+        r.raise_for_status()
+        out += [
+            {"backend": b.url, "name": m.get("name"), "size_vram": m.get("size_vram"), "expires_at": m.get("expires_at")}
+            for m in r.json().get("models", [])
+        ]
+    return out
+
+
+def status() -> dict:
+    try:
+        resident = loaded()
+    except Exception as e:
+        resident = None
+        logger.info(f"[MODELS] /api/ps unavailable: {e}")
+    names = {m["name"] for m in resident or []}
+    with _lock:
+        models = {m: dict(_state.get(m, {"status": "unknown"})) for m in set(pinned()) | set(_state)}
+    for m, s in models.items():
+        s["pinned"] = m in pinned()
+        s["loaded"] = None if resident is None else (m in names or f"{m}:latest" in names)
+    return {"models": models, "loaded": resident, "route_limits": LLM_ROUTE_LIMITS}
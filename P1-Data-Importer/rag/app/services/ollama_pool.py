@@ -0,0 +1,232 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import List
+import httpx
+import requests
+from fastapi import HTTPException
+from .. import tracing
+from ..config import OLLAMA_BASE_URLS, OLLAMA_MODEL_BACKENDS, POOL_HEALTH_INTERVAL, POOL_EJECT_FAILURES, POOL_EJECT_SECONDS
+from . import aio
+
+logger = logging.getLogger(__name__)
+
+# Errors that say something about the backend (as opposed to the request)
+TRANSPORT_ERRORS = (requests.RequestException, httpx.TransportError)
+
+
+class DeadlineExceeded(requests.Timeout):
+    """A call stopped at a deadline the request set itself (its stage deadline or budget); says nothing about the backend"""
+
+_lock = threading.Lock()
+
+
+class Backend:
+    """One Ollama server with its in-flight count, health and latency history"""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.healthy = True
+        self.ejected_until = 0.0
+        self.models = set()
+        self.loaded = set()
+        self.latencies = deque(maxlen=200)
+        self.checked_at = None
+
+    def available(self) -> bool:
+        return self.healthy and time.time() >= self.ejected_until
+
+    def has(self, model: str) -> bool:
+        return model in self.models or f"{model}:latest" in self.models
+
+    def snapshot(self) -> dict:
+        lat = sorted(self.latencies)
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "ejected_for_s": max(0.0, round(self.ejected_until - time.time(), 1)),
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "latency_ms": {
+                "p50": round(lat[len(lat) // 2], 1) if lat else None,
+                "p95": round(lat[min(len(lat) - 1, int(len(lat) * 0.95))], 1) if lat else None,
+            },
+            "models": sorted(self.models),
+            "loaded": sorted(self.loaded),
+            "checked_at": self.checked_at,
+        }
+
+
+_backends = [Backend(u) for u in OLLAMA_BASE_URLS]
+_by_url = {b.url: b for b in _backends}
+
+
+def backends() -> List[Backend]:
+    return list(_backends)
+
+
+def placed(model: str) -> List[Backend]:
+    """Backends a model may run on: its OLLAMA_MODEL_BACKENDS entry, otherwise all of them"""
+    urls = OLLAMA_MODEL_BACKENDS.get(model) or OLLAMA_MODEL_BACKENDS.get(model.split(":")[0])
+    return [_by_url[u.rstrip("/")] for u in urls if u.rstrip("/") in _by_url] if urls else backends()
+
+
+def pick(model: str, exclude=()) -> Backend:
+    """
+    Least-outstanding-requests choice among available backends for the model,
+    preferring ones that already hold it in memory, then ones that have it pulled
+    """
+    with _lock:
+        pool = [b for b in placed(model) if b.available() and b not in exclude]
+        if not pool:
+            raise HTTPException(status_code=503, detail=f"No healthy Ollama backend for {model}", headers={"Retry-After": str(POOL_EJECT_SECONDS)})
+        lat = lambda b: sorted(b.latencies)[len(b.latencies) // 2] if b.latencies else 0.0
+        return min(pool, key=lambda b: (model not in b.loaded and not b.has(model), model not in b.loaded, b.outstanding, lat(b)))
+
+
+def _failed(b: Backend, error):
+    with _lock:
+        b.failures += 1
+        b.consecutive_failures += 1
+        if b.consecutive_failures >= POOL_EJECT_FAILURES and time.time() >= b.ejected_until:
+            b.ejected_until = time.time() + POOL_EJECT_SECONDS
+            logger.warning(f"[POOL] ejecting {b.url} for {POOL_EJECT_SECONDS}s after {b.consecutive_failures} failures: {error}")
+
+
+@contextmanager
+def lease(model: str, exclude=(), cancel=None, budgeted: bool = False):
+    """
+    Hold a backend for the whole request (including a streamed body) so its
+    outstanding count stays accurate; connection errors count toward ejection
+    unless the caller abandoned the request (`cancel` set). With `budgeted` the
+    read timeout is the client's shortened budget, so hitting it raises
+    DeadlineExceeded instead of counting against the backend.
+    """
+    b = pick(model, exclude)
+    with _lock:
+        b.outstanding += 1
+        b.requests += 1
+    t0 = time.perf_counter()
+    try:
+        with tracing.span("ollama", model=model, backend=b.url):
+            yield b
+    except DeadlineExceeded:
+        raise
+    except (requests.ReadTimeout, httpx.ReadTimeout) as e:
+        if budgeted:
+            raise DeadlineExceeded(f"stopped at the request's deadline: {str(e) or type(e).__name__}") from e
+        if cancel is None or not cancel.is_set():
+            _failed(b, e)
+        raise
+    except TRANSPORT_ERRORS as e:
+        if cancel is None or not cancel.is_set():
+            _failed(b, e)
+        raise
+    else:
+        with _lock:
+            if cancel is None or not cancel.is_set():
+                b.consecutive_failures = 0
+                b.latencies.append((time.perf_counter() - t0) * 1000)
+    finally:
+        with _lock:
+            b.outstanding -= 1
+
+
+class _ServerError(requests.RequestException):
+    def __init__(self, response):
+        super().__init__(f"{response.status_code} {response.text[:200]}")
+        self.response = response
+
+
+def post(model: str, path: str, payload: dict, timeout: float, **kwargs):
+    """POST to the best backend for `model`; a connection failure or 5xx is retried once on another backend"""
+    tried, error = [], None
+    for _ in range(2):
+        try:
+            with lease(model, exclude=tried) as b:
+                tried.append(b)
+                r = requests.post(f"{b.url}{path}", json=payload, timeout=timeout, **kwargs)
+                if r.status_code >= 500:
+                    raise _ServerError(r)
+                return r
+        except HTTPException:
+            # No other backend to try: report the first failure.
+            if error is None:
+                raise
+            break
+        except (_ServerError, requests.ConnectionError) as e:
+            error = e
+    if isinstance(error, _ServerError):
+        return error.response
+    raise error
+
+
+async def apost(model: str, path: str, payload: dict, timeout: float):
+    """Async post(): same backend choice, failure accounting and single retry, over the shared httpx client"""
+    tried, error = [], None
+    for _ in range(2):
+        try:
+            with lease(model, exclude=tried) as b:
+                tried.append(b)
+                r = await aio.client().post(f"{b.url}{path}", json=payload, timeout=timeout)
+                if r.status_code >= 500:
+                    raise _ServerError(r)
+                return r
+        except HTTPException:
+            if error is None:
+                raise
+            break
+        except (_ServerError, httpx.ConnectError) as e:
+            error = e
+    if isinstance(error, _ServerError):
+        return error.response
+    raise error
+
+
+def check(b: Backend):
+    """Refresh one backend's health plus the models it has pulled and loaded"""
+    try:
+        tags = requests.get(f"{b.url}/api/tags", timeout=5)
+        tags.raise_for_status()
+        ps = requests.get(f"{b.url}/api/ps", timeout=5)
+        loaded = {m.get("name") for m in ps.json().get("models", [])} if ps.ok else set()
+        with _lock:
+            if not b.healthy:
+                logger.info(f"[POOL] {b.url} is healthy again")
+            # Only the health flag: a node that answers /api/tags but fails generations
+            # stays ejected for POOL_EJECT_SECONDS, and only real requests reset its failure run.
+            b.healthy = True
+            b.models = {m.get("name") for m in tags.json().get("models", [])}
+            b.loaded = loaded | {n.split(":")[0] for n in loaded if n.endswith(":latest")}
+            b.checked_at = time.time()
+    except Exception as e:
+        with _lock:
+            if b.healthy:
+                logger.warning(f"[POOL] {b.url} failed its health check: {e}")
+            b.healthy = False
+            b.checked_at = time.time()
+
+
+def _health_loop():
+    while True:
+        for b in backends():
+            check(b)
+        time.sleep(POOL_HEALTH_INTERVAL)
+
+
+def start_health_checks():
+    for b in backends():
+        check(b)
+    threading.Thread(target=_health_loop, name="ollama-health", daemon=True).start()
+
+
+def status() -> dict:
+    with _lock:
+        return {"backends": [b.snapshot() for b in _backends], "placement": OLLAMA_MODEL_BACKENDS}
@@ -2,9 +2,16 @@ import io
 from pypdf import PdfReader
 from docx import Document
 
-def parse_pdf(raw: bytes) -> str:
+def _stream(raw):
+    """Accept raw bytes or any seekable file-like object (e.g. a blob-store mmap)"""
+    if isinstance(raw, (bytes, bytearray)):
+        return io.BytesIO(raw)
+    raw.seek(0)
+    return raw
+
+def parse_pdf(raw) -> str:
     try:
-        r = PdfReader(io.BytesIO(raw))
+        r = PdfReader(_stream(raw))
         if getattr(r, "is_encrypted", False):
             try:
                 r.decrypt("")
@@ -17,9 +24,9 @@ def parse_pdf(raw: bytes) -> str:
     except Exception:
         return ""
 
-def parse_docx(raw: bytes) -> str:
+def parse_docx(raw) -> str:
     try:
-        d = Document(io.BytesIO(raw))
+        d = Document(_stream(raw))
         return "\n".join([p.text for p in d.paragraphs]).strip()
     except Exception:
         return ""
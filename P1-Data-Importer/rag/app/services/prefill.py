@@ -0,0 +1,80 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from ..metrics import cache_lookup
+
+# Prefixes remembered for hit/miss classification; the oldest are forgotten first.
+_MAX_PREFIXES = 256
+# A prompt counts as a prefix-cache hit when Ollama evaluated less than this share of the tokens it needed cold.
+_HIT_RATIO = 0.5
+
+_lock = threading.Lock()
+_cold = OrderedDict()
+_stats = {}
+
+
+def prefix_key(model: str, prefix: str) -> str:
+    return model + ":" + hashlib.sha1(prefix.encode("utf-8")).hexdigest()[:16]
+
+
+def record(model: str, route: str, prefix: str, metrics: dict) -> dict:
+    """
+    Classify one generate call as "cold" (first time this prefix was seen),
+    "hit" (Ollama reused the cached prefix) or "miss", and add it to the
+    per-route totals. Returns the call's prefill summary.
+    """
+    evaluated = metrics.get("prompt_eval_count")
+    prefill_ms = round(metrics.get("prompt_eval_duration", 0) / 1e6, 1)
+    key = prefix_key(model, prefix) if prefix else None
+    with _lock:
+        if evaluated is None:
+            outcome = "unknown"
+        elif key is None:
+            outcome = "no_prefix"
+        elif key not in _cold:
+            outcome = "cold"
+            _cold[key] = evaluated
+            if len(_cold) > _MAX_PREFIXES:
+                _cold.popitem(last=False)
+        else:
+            _cold.move_to_end(key)
+            outcome = "hit" if evaluated < _cold[key] * _HIT_RATIO else "miss"
+        s = _stats.setdefault((model, route), {})
+        o = s.setdefault(outcome, {"calls": 0, "prefill_ms": 0.0, "prompt_tokens": 0})
+        o["calls"] += 1
+        o["prefill_ms"] += prefill_ms
+        o["prompt_tokens"] += evaluated or 0
+    if outcome in ("cold", "hit", "miss"):
+        cache_lookup("llm_prefix", outcome)
+    return {
+        "route": route,
+        "prefix": outcome,
+        "prefix_chars": len(prefix or ""),
+        "prompt_eval_count": evaluated,
+        "prefill_ms": prefill_ms,
+        "load_ms": round(metrics.get("load_duration", 0) / 1e6, 1),
+        "eval_count": metrics.get("eval_count"),
+        "generate_ms": round(metrics.get("eval_duration", 0) / 1e6, 1),
+    }
+
+
+def stats() -> list:
+    """Per model and route: calls, average prefill time and evaluated prompt tokens for each outcome"""
+    with _lock:
+        out = []
+        for (model, route), outcomes in sorted(_stats.items()):
+            row = {"model": model, "route": route}
+            for outcome, o in outcomes.items():
+                row[outcome] = {
+                    "calls": o["calls"],
+                    "avg_prefill_ms": round(o["prefill_ms"] / o["calls"], 1),
+                    "avg_prompt_tokens": round(o["prompt_tokens"] / o["calls"], 1),
+                }
+            out.append(row)
+        return out
+
+
+def reset():
+    with _lock:
+        _cold.clear()
+        _stats.clear()
@@ -0,0 +1,88 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single `bytes=` range into an inclusive (start, end) pair
+
+    Returns None when the whole entity should be served (no header, a unit other
+    than bytes, or a multi-range request, which we answer with a plain 200).
+    Raises RangeNotSatisfiable for ranges that fall outside the entity.
+    """
+    if not header or not header.strip().lower().startswith("bytes="):
+        return None
+    spec = header.split("=", 1)[1].strip()
+    if "," in spec:
+        return None
+    first, sep, last = spec.partition("-")
+    if not sep:
+        return None
+    try:
+        if first == "":
+            n = int(last)
+            if n <= 0:
+                raise RangeNotSatisfiable()
+            return max(0, size - n), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+def http_date(dt: Optional[datetime]) -> Optional[str]:
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return format_datetime(dt.astimezone(timezone.utc), usegmt=True)
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        dt = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def is_not_modified(headers, etag: str, last_modified: Optional[str]) -> bool:
+    """RFC 7232 evaluation order: If-None-Match wins over If-Modified-Since"""
+    inm = headers.get("if-none-match")
+    if inm:
+        return _etag_matches(inm, etag)
+    since = _parse_http_date(headers.get("if-modified-since"))
+    lm = _parse_http_date(last_modified)
+    return bool(since and lm and lm <= since)
+
+
+def if_range_allows(headers, etag: str, last_modified: Optional[str]) -> bool:
+    """A Range is honoured only if If-Range (when sent) still matches the current representation"""
+    ir = headers.get("if-range")
+    if not ir:
+        return True
+    if ir.strip().startswith(('"', "W/")):
+        return ir.strip() == etag
+    return bool(last_modified) and _parse_http_date(ir) == _parse_http_date(last_modified)
+
+
+def content_disposition(disposition: str, filename: str) -> str:
+    """ASCII fallback plus RFC 5987 filename* so non-latin names survive header encoding"""
+    ascii_name = filename.encode("ascii", "replace").decode("ascii").replace('"', "")
+    return f"{disposition}; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename)}"
@@ -0,0 +1,272 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import requests
+from fastapi import HTTPException
+from ..config import STAGE_DEADLINES, OLLAMA_CONNECT_TIMEOUT, HEDGE_PERCENTILE, HEDGE_MIN_MS, BREAKER_FAILURES, BREAKER_COOLDOWN
+from . import aio, budget, ollama_pool
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_breakers = {}
+_latency = {}
+_hedges = {}
+# Hedge delay until a stage has enough latency samples for a percentile
+_COLD_HEDGE_MS = 1000
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+
+
+def _configured(stage: str) -> float:
+    return STAGE_DEADLINES.get(stage) or STAGE_DEADLINES["chat"]
+
+
+def deadline(stage: str) -> float:
+    """Seconds a stage may take end to end, never more than the request's remaining budget allots it"""
+    return budget.allot(stage, _configured(stage))
+
+
+def budget_bound(stage: str, limit: float) -> bool:
+    """Whether `limit` came from the request's budget rather than the stage's configured deadline"""
+    return limit < _configured(stage)
+
+
+def timeout(stage: str):
+    """(connect, read) timeout for requests within a stage"""
+    return (OLLAMA_CONNECT_TIMEOUT, deadline(stage))
+
+
+class CircuitBreaker:
+    """Opens after BREAKER_FAILURES consecutive failures; after BREAKER_COOLDOWN one probe call may close it again"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = "closed"
+        self.consecutive = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.rejected = 0
+
+    def before(self):
+        with _lock:
+            if self.state == "closed":
+                return
+            wait = self.opened_at + BREAKER_COOLDOWN - time.time()
+            if wait <= 0 and not self.probing:
+                self.state, self.probing = "half_open", True
+                return
+            self.rejected += 1
+        raise HTTPException(status_code=503, detail=f"{self.name} is failing; circuit open", headers={"Retry-After": str(max(1, int(wait)))})
+
+    def record(self, ok: bool):
+        with _lock:
+            self.probing = False
+            if ok:
+                self.state, self.consecutive = "closed", 0
+                return
+            self.consecutive += 1
+            if self.state == "half_open" or self.consecutive >= BREAKER_FAILURES:
+                if self.state != "open":
+                    logger.warning(f"[BREAKER] {self.name} open after {self.consecutive} failures")
+                self.state, self.opened_at = "open", time.time()
+
+    def skip(self):
+        """The call ended without a verdict on the service (it hit the request's own deadline)"""
+        with _lock:
+            if self.probing:
+                self.state, self.probing = "open", False
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.consecutive, "rejected": self.rejected}
+
+
+def breaker(name: str) -> CircuitBreaker:
+    with _lock:
+        return _breakers.setdefault(name, CircuitBreaker(name))
+
+
+class _Outcome:
+    def __init__(self):
+        self.failed = False
+
+    def fail(self):
+        self.failed = True
+
+
+@contextmanager
+def circuit(name: str):
+    """
+    Fail fast while `name` is open; transport errors inside the block count as
+    failures, and so does calling .fail() on the yielded object (e.g. on a 5xx)
+    """
+    b = breaker(name)
+    b.before()
+    outcome = _Outcome()
+    try:
+        yield outcome
+    except ollama_pool.DeadlineExceeded:
+        # A client that asked for a short budget must not open the breaker for everyone.
+        b.skip()
+        raise
+    except ollama_pool.TRANSPORT_ERRORS + (HTTPException,) as e:
+        # 504 here is the request's own budget running out, not the model failing
+        b.record(isinstance(e, HTTPException) and (e.status_code < 500 or e.status_code == 504))
+        raise
+    except BaseException:
+        b.record(True)
+        raise
+    else:
+        b.record(not outcome.failed)
+
+
+def observe(stage: str, ms: float):
+    with _lock:
+        _latency.setdefault(stage, deque(maxlen=500)).append(ms)
+
+
+def hedge_delay(stage: str) -> float:
+    """Seconds to wait before hedging: the stage's HEDGE_PERCENTILE latency, never below HEDGE_MIN_MS"""
+    with _lock:
+        lat = sorted(_latency.get(stage, ()))
+    if len(lat) < 20:
+        return max(HEDGE_MIN_MS, _COLD_HEDGE_MS) / 1000
+    return max(HEDGE_MIN_MS, lat[min(len(lat) - 1, int(len(lat) * HEDGE_PERCENTILE / 100))]) / 1000
+
+
+def hedged_post(stage: str, model: str, path: str, payload: dict):
+    """
+    POST an idempotent request; if it has not answered within hedge_delay(stage)
+    and another backend can take it, send a duplicate there and return whichever
+    succeeds first. The loser is abandoned: its session is closed and its
+    outcome does not count against its backend.
+    """
+    results = queue.Queue()
+    cancels, sessions, used = [], [], []
+    t0 = time.perf_counter()
+
+    def attempt(i: int, exclude: list):
+        try:
+            t = timeout(stage)
+            with ollama_pool.lease(model, exclude=exclude, cancel=cancels[i], budgeted=budget_bound(stage, t[1])) as b:
+                used.append(b)
+                r = sessions[i].post(f"{b.url}{path}", json=payload, timeout=t)
+            results.put((i, r, None))
+        except Exception as e:
+            results.put((i, None, e))
+
+    def launch(exclude: list):
+        cancels.append(threading.Event())
+        sessions.append(requests.Session())
+        _executor.submit(attempt, len(cancels) - 1, exclude)
+
+    launch([])
+    pending, winner, fallback, error = 1, None, None, None
+    end = time.monotonic() + deadline(stage)
+    wait = min(hedge_delay(stage), end - time.monotonic())
+    try:
+        while pending and winner is None:
+            try:
+                i, r, e = results.get(timeout=max(0.0, min(wait, end - time.monotonic())))
+            except queue.Empty:
+                if time.monotonic() >= end:
+                    break
+                if len(cancels) == 1 and used and any(b.available() and b is not used[0] for b in ollama_pool.placed(model)):
+                    launch([used[0]])
+                    pending += 1
+                    with _lock:
+                        _hedges.setdefault(stage, {"sent": 0, "won": 0})["sent"] += 1
+                wait = end - time.monotonic()
+                continue
+            pending -= 1
+            if e is None and r.status_code < 500:
+                winner = (i, r)
+            elif e is None:
+                fallback = fallback or (i, r)
+            else:
+                error = error or e
+    finally:
+        for i, s in enumerate(sessions):
+            if winner is None or i != winner[0]:
+                cancels[i].set()
+            s.close()
+    # Both attempts failed: an HTTP error response says more than a transport error.
+    winner = winner or fallback
+    if winner is None:
+        budget.check(stage, during=True)
+        raise error or ollama_pool.DeadlineExceeded(f"{stage} exceeded its deadline")
+    if winner[0] > 0:
+        with _lock:
+            _hedges[stage]["won"] += 1
+    observe(stage, (time.perf_counter() - t0) * 1000)
+    return winner[1]
+
+
+def atimeout(stage: str):
+    """timeout() for the async client"""
+    return aio.timeout(OLLAMA_CONNECT_TIMEOUT, deadline(stage))
+
+
+async def ahedged_post(stage: str, model: str, path: str, payload: dict):
+    """
+    Async hedged_post(): the duplicate is an asyncio task, and the slower
+    attempt is really cancelled once the other one answers
+    """
+    t0 = time.perf_counter()
+    used = []
+
+    async def attempt(exclude: list):
+        t = atimeout(stage)
+        with ollama_pool.lease(model, exclude=exclude, budgeted=budget_bound(stage, t.read)) as b:
+            used.append(b)
+            return await aio.client().post(f"{b.url}{path}", json=payload, timeout=t)
+
+    limit = deadline(stage)
+    tasks = [asyncio.create_task(attempt([]))]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=min(hedge_delay(stage), limit))
+        if not done and used and any(b.available() and b is not used[0] for b in ollama_pool.placed(model)):
+            tasks.append(asyncio.create_task(attempt([used[0]])))
+            with _lock:
+                _hedges.setdefault(stage, {"sent": 0, "won": 0})["sent"] += 1
+        end = t0 + limit
+        pending, fallback, error = set(tasks), None, None
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=max(0.0, end - time.perf_counter()), return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                break
+            for t in done:
+                if t.exception() is not None:
+                    error = error or t.exception()
+                    continue
+                r = t.result()
+                if r.status_code < 500:
+                    if t is not tasks[0]:
+                        with _lock:
+                            _hedges[stage]["won"] += 1
+                    observe(stage, (time.perf_counter() - t0) * 1000)
+                    return r
+                fallback = fallback or r
+    finally:
+        for t in tasks:
+            t.cancel()
+    if fallback is not None:
+        return fallback
+    budget.check(stage, during=True)
+    raise error or ollama_pool.DeadlineExceeded(f"{stage} exceeded its deadline")
+
+
+def status() -> dict:
+    with _lock:
+        breakers = {n: b.snapshot() for n, b in _breakers.items()}
+        hedges = {s: dict(h) for s, h in _hedges.items()}
+    return {
+        "breakers": breakers,
+        "hedges": hedges,
+        "hedge_delay_ms": {s: round(hedge_delay(s) * 1000, 1) for s in list(_latency)},
+        "deadlines_s": STAGE_DEADLINES,
+    }
@@ -0,0 +1,117 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from ..config import RESULT_CACHE_MAX_BYTES, RESULT_CACHE_VERSION_TTL
+from ..db import table_versions
+from ..metrics import cache_lookup
+from .sql_guard import mask_sql
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+_bytes = 0
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "uncacheable": 0}
+_versions = {"at": 0.0, "value": {}}
+
+
+def current_versions() -> dict:
+    """table_versions(), re-read at most every RESULT_CACHE_VERSION_TTL seconds or after invalidate()"""
+    with _lock:
+        if time.time() - _versions["at"] < RESULT_CACHE_VERSION_TTL:
+            return _versions["value"]
+    value = table_versions()
+    with _lock:
+        _versions.update(at=time.time(), value=value)
+    return value
+
+
+def invalidate():
+    """Forget cached table versions so the next lookup sees a fresh import immediately"""
+    with _lock:
+        _versions["at"] = 0.0
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace outside string literals and drop a trailing semicolon"""
+    out, quote, prev_space = [], None, False
+    for ch in sql.strip().rstrip(";"):
+        if quote:
+            quote = None if ch == quote else quote
+        elif ch in "'\"":
+            quote = ch
+        elif ch.isspace():
+            if not prev_space:
+                out.append(" ")
+            prev_space = True
+            continue
+        out.append(ch)
+        prev_space = False
+    return "".join(out).strip()
+
+
+def _size(df) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def _evict_to(limit: int):
+    global _bytes
+    while _entries and _bytes > limit:
+        _, (_, _, size) = _entries.popitem(last=False)
+        _bytes -= size
+        _stats["evictions"] += 1
+
+
+def cached_execute(sql: str, tables, run):
+    """
+    Return (df, engine, hit) for `sql`, calling `run(sql) -> (df, engine)` on a miss
+
+    The key is the normalized SQL plus the current version of every referenced
+    table, so a re-import makes old entries unreachable; LRU eviction keeps the
+    total below RESULT_CACHE_MAX_BYTES. Cached DataFrames are shared: treat them as read-only.
+    """
+    global _bytes
+    versions = current_versions()
+    # Every known table named anywhere in the statement joins the key too: one the parser missed
+    # would otherwise keep serving rows from before its re-import.
+    words = set(re.findall(r"\w+", mask_sql(sql, identifiers=False).lower()))
+    tables = set(tables) | {t for t in versions if t.lower() in words}
+    key = (normalize_sql(sql), tuple(sorted((t, versions.get(t)) for t in tables)))
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+            _stats["hits"] += 1
+            cache_lookup("sql_result", "hit")
+            return entry[0], entry[1], True
+        _stats["misses"] += 1
+    cache_lookup("sql_result", "miss")
+    df, engine = run(sql)
+    size = _size(df)
+    with _lock:
+        # One result may not crowd out most of the cache.
+        if size > RESULT_CACHE_MAX_BYTES // 4:
+            _stats["uncacheable"] += 1
+        elif key not in _entries:
+            _entries[key] = (df, engine, size)
+            _bytes += size
+            _evict_to(RESULT_CACHE_MAX_BYTES)
+    return df, engine, False
+
+
+def stats() -> dict:
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {
+            **_stats,
+            "hit_rate": round(_stats["hits"] / lookups, 3) if lookups else None,
+            "entries": len(_entries),
+            "bytes": _bytes,
+            "max_bytes": RESULT_CACHE_MAX_BYTES,
+        }
+
+
+def clear():
+    global _bytes
+    with _lock:
+        _entries.clear()
+        _bytes = 0
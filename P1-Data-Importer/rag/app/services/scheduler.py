@@ -0,0 +1,196 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from fastapi import HTTPException
+from ..config import LLM_CONCURRENCY_PER_BACKEND, LLM_MODEL_CONCURRENCY, LLM_QUEUE_MAX, LLM_QUEUE_TIMEOUT, RAG_WORKERS
+from . import budget, ollama_pool
+
+HIGH, NORMAL = 0, 1
+
+# Set by the route for everything one request generates; lower runs first.
+priority = contextvars.ContextVar("generation_priority", default=NORMAL)
+
+_lock = threading.Lock()
+_schedulers = {}
+_seq = itertools.count()
+# How often an async waiter re-checks the queue head
+_POLL_S = 0.02
+
+
+class ModelScheduler:
+    """Admits at most `cap` concurrent generations for one model; the rest wait in a bounded priority queue"""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.cond = threading.Condition()
+        self.running = 0
+        self.waiting = []
+        self.served = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.waits = deque(maxlen=500)
+        self.service = deque(maxlen=100)
+
+    def cap(self) -> int:
+        total = LLM_MODEL_CONCURRENCY.get(self.model) or LLM_CONCURRENCY_PER_BACKEND * max(1, len(ollama_pool.placed(self.model)))
+        # Caps are for the whole service: each of several worker processes admits its share.
+        return max(1, math.ceil(total / RAG_WORKERS))
+
+    def retry_after(self) -> int:
+        avg = sum(self.service) / len(self.service) if self.service else 10.0
+        return max(1, math.ceil((len(self.waiting) + 1) * avg / self.cap()))
+
+    def _reject(self, detail: str):
+        raise HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(self.retry_after())})
+
+    def admit_check(self):
+        """Fail fast when the queue is already full, before a request spends time on retrieval"""
+        with self.cond:
+            if len(self.waiting) >= LLM_QUEUE_MAX:
+                self.rejected += 1
+                self._reject(f"{self.model} is overloaded; queue full")
+
+    def acquire(self, prio: int) -> float:
+        """Block until a slot is free; returns the wait in ms"""
+        t0 = time.monotonic()
+        with self.cond:
+            if self.running < self.cap() and not self.waiting:
+                self.running += 1
+                self.waits.append(0.0)
+                return 0.0
+            if len(self.waiting) >= LLM_QUEUE_MAX:
+                self.rejected += 1
+                self._reject(f"{self.model} is overloaded; queue full")
+            ticket = (prio, next(_seq))
+            heapq.heappush(self.waiting, ticket)
+            end = t0 + LLM_QUEUE_TIMEOUT
+            while not (self.waiting[0] == ticket and self.running < self.cap()):
+                left = end - time.monotonic()
+                if left <= 0 or budget.cancelled():
+                    self.waiting.remove(ticket)
+                    heapq.heapify(self.waiting)
+                    self.cond.notify_all()
+                    # A request whose client left or whose budget ran out stops waiting for a slot.
+                    budget.check(f"{self.model} generation")
+                    self.timed_out += 1
+                    self._reject(f"{self.model} is overloaded; waited {LLM_QUEUE_TIMEOUT}s")
+                self.cond.wait(min(left, 0.5))
+            heapq.heappop(self.waiting)
+            self.running += 1
+            waited = (time.monotonic() - t0) * 1000
+            self.waits.append(waited)
+            # The next ticket may also fit if several slots are free.
+            self.cond.notify_all()
+            return waited
+
+    async def acquire_async(self, prio: int) -> float:
+        """acquire() for event-loop callers: same queue and priorities, but polls instead of blocking the loop"""
+        t0 = time.monotonic()
+        with self.cond:
+            if self.running < self.cap() and not self.waiting:
+                self.running += 1
+                self.waits.append(0.0)
+                return 0.0
+            if len(self.waiting) >= LLM_QUEUE_MAX:
+                self.rejected += 1
+                self._reject(f"{self.model} is overloaded; queue full")
+            ticket = (prio, next(_seq))
+            heapq.heappush(self.waiting, ticket)
+        end = t0 + LLM_QUEUE_TIMEOUT
+        try:
+            while True:
+                with self.cond:
+                    if self.waiting[0] == ticket and self.running < self.cap():
+                        heapq.heappop(self.waiting)
+                        self.running += 1
+                        waited = (time.monotonic() - t0) * 1000
+                        self.waits.append(waited)
+                        self.cond.notify_all()
+                        return waited
+                if time.monotonic() >= end or budget.cancelled():
+                    break
+                await asyncio.sleep(_POLL_S)
+        except BaseException:
+            self._drop(ticket)
+            raise
+        self._drop(ticket)
+        budget.check(f"{self.model} generation")
+        with self.cond:
+            self.timed_out += 1
+        self._reject(f"{self.model} is overloaded; waited {LLM_QUEUE_TIMEOUT}s")
+
+    def _drop(self, ticket):
+        with self.cond:
+            if ticket in self.waiting:
+                self.waiting.remove(ticket)
+                heapq.heapify(self.waiting)
+                self.cond.notify_all()
+
+    def release(self, seconds: float):
+        with self.cond:
+            self.running -= 1
+            self.served += 1
+            self.service.append(seconds)
+            self.cond.notify_all()
+
+    def snapshot(self) -> dict:
+        with self.cond:
+            waits = sorted(self.waits)
+            return {
+                "cap": self.cap(),
+                "running": self.running,
+                "queued": len(self.waiting),
+                "queued_high_priority": sum(1 for p, _ in self.waiting if p == HIGH),
+                "served": self.served,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "wait_ms": {
+                    "p50": round(waits[len(waits) // 2], 1) if waits else None,
+                    "p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 1) if waits else None,
+                },
+                "avg_service_s": round(sum(self.service) / len(self.service), 2) if self.service else None,
+            }
+
+
+def scheduler(model: str) -> ModelScheduler:
+    with _lock:
+        return _schedulers.setdefault(model, ModelScheduler(model))
+
+
+@contextmanager
+def slot(model: str):
+    """
+    Hold one of the model's generation slots, yielding the queue wait in ms;
+    raises 429 with Retry-After when the queue is full or the wait too long
+    """
+    s = scheduler(model)
+    waited = s.acquire(priority.get())
+    t0 = time.monotonic()
+    try:
+        yield round(waited, 1)
+    finally:
+        s.release(time.monotonic() - t0)
+
+
+@asynccontextmanager
+async def aslot(model: str):
+    """Async slot()"""
+    s = scheduler(model)
+    waited = await s.acquire_async(priority.get())
+    t0 = time.monotonic()
+    try:
+        yield round(waited, 1)
+    finally:
+        s.release(time.monotonic() - t0)
+
+
+def status() -> dict:
+    with _lock:
+        models = list(_schedulers.items())
+    return {"queue_max": LLM_QUEUE_MAX, "queue_timeout_s": LLM_QUEUE_TIMEOUT, "models": {m: s.snapshot() for m, s in models}}
@@ -0,0 +1,146 @@
+import asyncio
+import threading
+from ..metrics import COALESCED
+from .budget import Abandoned, Expired
+
+_lock = threading.Lock()
+_stats = {}
+_groups = []
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class Group:
+    """
+    Concurrent do(key, fn) calls with the same key share one execution: the
+    first caller runs fn, the others wait for its result (or exception).
+    Nothing is kept once the call finishes; shared results must be treated as read-only.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = threading.Lock()
+        self.calls = {}
+        _register(self)
+
+    def _join(self, key):
+        with self.lock:
+            call = self.calls.get(key)
+            if call is None:
+                call = self.calls[key] = _Call()
+                return call, True
+            call.followers += 1
+            return call, False
+
+    def do(self, key, fn):
+        """Returns (result, shared); shared is True when this caller attached to another's call"""
+        while True:
+            call, leader = self._join(key)
+            if leader:
+                break
+            call.done.wait()
+            # The leader's client went away or its budget ran out mid-call; this caller still wants the result, so run it again.
+            if isinstance(call.error, (Abandoned, Expired)):
+                continue
+            with _lock:
+                _stats[self.name]["coalesced"] += 1
+            COALESCED.labels(self.name).inc()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+            _finished(self.name, call.error, call.followers)
+        return call.result, False
+
+
+def _register(group):
+    with _lock:
+        _groups.append(group)
+        _stats.setdefault(group.name, {"executed": 0, "coalesced": 0, "errors": 0, "max_followers": 0})
+
+
+def _finished(name: str, error, followers: int):
+    with _lock:
+        s = _stats[name]
+        s["executed"] += 1
+        s["errors"] += error is not None
+        s["max_followers"] = max(s["max_followers"], followers)
+
+
+class AsyncGroup:
+    """Group for coroutines on one event loop; counted under the same name as its sync counterpart"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = {}
+        _register(self)
+
+    async def do(self, key, fn):
+        """Returns (result, shared); `fn` is a coroutine function"""
+        while True:
+            fut = self.calls.get(key)
+            if fut is None:
+                break
+            fut.followers += 1
+            try:
+                # shield: a follower giving up must not cancel the leader's work
+                result = await asyncio.shield(fut)
+            except (Abandoned, Expired):
+                # Gave up for the leader's own reasons; rerun under this caller's budget.
+                continue
+            with _lock:
+                _stats[self.name]["coalesced"] += 1
+            COALESCED.labels(self.name).inc()
+            return result, True
+        fut = asyncio.get_running_loop().create_future()
+        fut.followers = 0
+        self.calls[key] = fut
+        error = None
+        try:
+            result = await fn()
+            fut.set_result(result)
+            return result, False
+        except BaseException as e:
+            error = e
+            if isinstance(e, asyncio.CancelledError):
+                # The leader's request was cancelled; followers rerun the call themselves.
+                fut.set_exception(Abandoned("leader cancelled"))
+            else:
+                fut.set_exception(e)
+            raise
+        finally:
+            del self.calls[key]
+            if fut.done():
+                fut.exception()  # mark the exception retrieved so asyncio does not log it when nobody waited
+            _finished(self.name, error, fut.followers)
+
+
+def stats() -> dict:
+    with _lock:
+        out = {}
+        for name, s in _stats.items():
+            total = s["executed"] + s["coalesced"]
+            out[name] = {**s, "coalesced_share": round(s["coalesced"] / total, 3) if total else None}
+        return out
+
+
+def inflight() -> dict:
+    """Calls running right now per group name (sync and async groups of one name are summed)"""
+    out = {}
+    for g in _groups:
+        out[g.name] = out.get(g.name, 0) + len(g.calls)
+    return out
@@ -1,14 +1,34 @@
 from typing import List, Dict
 import json
-from ..db import get_all_schemas, get_sample_data, execute_sql_query
+import logging
+import time
+from ..db import list_data_tables, get_table_schema, get_sample_data, log_query
+from .. import tracing
+from ..metrics import timed
+from . import analytics, result_cache, sql_guard
+from .catalog import load_profiles, render_table
+from .index_advisor import referenced_tables
 from .llm import chat_once
 
-def build_schema_prompt(question: str, schemas: Dict, include_samples: bool = True) -> str:
-    """Build a prompt with database schema for SQL generation"""
-    
+logger = logging.getLogger(__name__)
+
+QUESTION_MARKER = "USER QUESTION: "
+
+
+def build_schema_prompt(question: str, schemas: Dict, include_samples: bool = True, profiles: Dict = None) -> str:
+    """
+    Build a prompt with database schema for SQL generation
+
+    Tables with a catalog profile are described from it (row counts, ranges,
+    distinct values) without touching the data; others fall back to live samples.
+    """
+    profiles = profiles or {}
     schema_text = "DATABASE SCHEMA:\n\n"
     
     for table_name, schema in schemas.items():
+        if table_name in profiles:
+            schema_text += render_table(profiles[table_name])
+            continue
         cols = []
         for col in schema["columns"]:
             col_def = f"{col['name']} {col['type']}"
@@ -29,13 +49,13 @@ def build_schema_prompt(question: str, schemas: Dict, include_samples: bool = Tr
             except Exception:
                 pass
     
+    # Everything before the question is identical across questions on the same tables, so
+    # Ollama can reuse the KV cache for it; keep the question (and anything per-request) last.
     prompt = f"""You are a SQL expert. Given the database schema below, generate SQL queries to retrieve relevant data that would help answer the user's question.
 
 {schema_text}
 
-USER QUESTION: {question}
-
-Generate 1-3 SQL queries that would retrieve the most relevant data to answer this question. 
+Generate 1-3 SQL queries that would retrieve the most relevant data to answer the question at the end.
 For each query, explain what data it retrieves and why it's relevant.
 
 Return your response in this JSON format:
@@ -56,11 +76,19 @@ IMPORTANT:
 - Limit results appropriately (e.g., LIMIT 100)
 - Use JOINs when relationships between tables are clear
 - Return ONLY valid JSON, no additional text
+
+{QUESTION_MARKER}{question}
 """
     
     return prompt
 
 
+def prompt_prefix_len(prompt: str) -> int:
+    """Length of the question-independent prefix of a schema prompt"""
+    i = prompt.rfind(QUESTION_MARKER)
+    return i if i >= 0 else 0
+
+
 def extract_json_from_response(response: str) -> dict:
     """Extract JSON from LLM response, handling markdown code blocks"""
     response = response.strip()
@@ -99,14 +127,14 @@ def retrieve_sql_context(question: str, model: str, selected_tables: List[str] =
         }
     """
     
-    # Get schemas
-    all_schemas = get_all_schemas()
-    
     # Filter to selected tables if specified
+    tables = list_data_tables()
     if selected_tables:
-        schemas = {k: v for k, v in all_schemas.items() if k in selected_tables}
-    else:
-        schemas = all_schemas
+        tables = [t for t in tables if t in selected_tables]
+    
+    # Catalogued tables need no schema or sample queries
+    profiles = load_profiles(tables)
+    schemas = {t: profiles[t] if t in profiles else get_table_schema(t) for t in tables}
     
     if not schemas:
         return {
@@ -117,10 +145,13 @@ def retrieve_sql_context(question: str, model: str, selected_tables: List[str] =
         }
     
     # Build prompt and get SQL queries from LLM
-    prompt = build_schema_prompt(question, schemas, include_samples=True)
+    prompt = build_schema_prompt(question, schemas, include_samples=True, profiles=profiles)
     
+    prefix_len = prompt_prefix_len(prompt)
+    llm_calls = []
     try:
-        llm_response = chat_once(model, prompt)
+        llm_calls.append({})
+        llm_response = chat_once(model, prompt, prefix_len=prefix_len, route="sql_plan", timings=llm_calls[-1])
         parsed = extract_json_from_response(llm_response)
     except Exception as e:
         return {
@@ -128,79 +159,154 @@ def retrieve_sql_context(question: str, model: str, selected_tables: List[str] =
             "sources": [],
             "queries_executed": [],
             "reasoning": f"Failed to generate queries: {str(e)}",
-            "error": str(e)
+            "error": str(e),
+            "llm_calls": llm_calls
         }
     
     queries = parsed.get("queries", [])
     reasoning = parsed.get("reasoning", "")
     
     # Execute queries and collect results
+    context_parts, sources, queries_executed, rejected = _run_queries(queries[:3], 1)  # Limit to 3 queries
+    
+    # Rejected queries get one retry with the guard's verdicts
+    if rejected:
+        try:
+            llm_calls.append({})
+            retry = extract_json_from_response(chat_once(model, build_retry_prompt(prompt, rejected), prefix_len=prefix_len, route="sql_retry", timings=llm_calls[-1]))
+            retry_queries = retry.get("queries", [])[:len(rejected)]
+            more = _run_queries(retry_queries, len(queries_executed) + 1, retry=True)
+            context_parts += more[0]
+            sources += more[1]
+            queries_executed += more[2]
+        except Exception as e:
+            queries_executed.append({"sql": "", "explanation": "retry after rejected queries", "error": str(e), "success": False})
+    
+    return {
+        "context": context_parts,
+        "sources": sources,
+        "queries_executed": queries_executed,
+        "reasoning": reasoning,
+        "llm_calls": llm_calls
+    }
+
+
+def build_retry_prompt(prompt: str, rejected: List[Dict]) -> str:
+    """Original prompt plus the guard's verdict on each rejected query"""
+    lines = [f"- {r['sql']}\n  REJECTED: {r['verdict']}" for r in rejected]
+    return (
+        prompt
+        + "\n\nThese queries were rejected before execution:\n"
+        + "\n".join(lines)
+        + f"\n\nReturn at most {len(rejected)} revised read-only queries in the same JSON format."
+    )
+
+
+def execute_guarded(sql: str):
+    """
+    Read-only check and LIMIT injection, then the result cache, then the columnar
+    snapshot when available; MySQL only runs what EXPLAIN says is within budget.
+
+    Returns (guarded_sql, df, engine, cache_hit); raises sql_guard.QueryRejected.
+    """
+    guarded = sql_guard.check_static(sql)
+    df, engine_used, cache_hit = result_cache.cached_execute(guarded, extract_tables_from_sql(guarded), _execute)
+    return guarded, df, engine_used, cache_hit
+
+
+def _execute(sql: str):
+    with timed("sql_execution"):
+        return analytics.execute(sql, mysql_gate=sql_guard.check_cost)
+
+
+def _run_queries(queries: List[Dict], first_index: int, retry: bool = False):
+    """Guard and execute generated queries; returns (context_parts, sources, queries_executed, rejected)"""
     context_parts = []
     sources = []
     queries_executed = []
+    rejected = []
     
-    for idx, query_info in enumerate(queries[:3]):  # Limit to 3 queries
+    for idx, query_info in enumerate(queries, start=first_index):
         sql = query_info.get("sql", "")
         explanation = query_info.get("explanation", "")
         
         if not sql:
             continue
         
+        t0 = time.perf_counter()
         try:
-            # Execute the query
-            df = execute_sql_query(sql)
+            with tracing.span("sql.query", index=idx, retry=retry, sql=sql[:300]):
+                guarded, df, engine_used, cache_hit = execute_guarded(sql)
+                tracing.annotate(rows=len(df), engine=engine_used, cache="hit" if cache_hit else "miss")
             
             queries_executed.append({
-                "sql": sql,
+                "sql": guarded,
                 "explanation": explanation,
                 "row_count": len(df),
+                "engine": engine_used,
+                "cache": "hit" if cache_hit else "miss",
+                "latency_ms": round((time.perf_counter() - t0) * 1000, 1),
+                "retry": retry,
                 "success": True
             })
+            log_executed_query(queries_executed[-1])
             
             if not df.empty:
                 # Format the data as context
-                context_text = f"QUERY {idx + 1}: {explanation}\n"
-                context_text += f"SQL: {sql}\n"
+                context_text = f"QUERY {idx}: {explanation}\n"
+                context_text += f"SQL: {guarded}\n"
                 context_text += f"RESULTS ({len(df)} rows):\n"
                 context_text += df.to_csv(index=False)
                 context_parts.append(context_text)
                 
                 # Track source
                 sources.append({
-                    "query_index": idx + 1,
-                    "tables_used": extract_tables_from_sql(sql),
+                    "query_index": idx,
+                    "tables_used": extract_tables_from_sql(guarded),
                     "row_count": len(df),
                     "explanation": explanation
                 })
         
+        except sql_guard.QueryRejected as e:
+            rejected.append({"sql": sql, "verdict": e.verdict})
+            queries_executed.append({
+                "sql": sql,
+                "explanation": explanation,
+                "rejected": True,
+                "verdict": e.verdict,
+                "estimated_rows": e.estimated_rows,
+                "latency_ms": round((time.perf_counter() - t0) * 1000, 1),
+                "retry": retry,
+                "success": False
+            })
+            log_executed_query(queries_executed[-1])
+        
         except Exception as e:
             queries_executed.append({
                 "sql": sql,
                 "explanation": explanation,
                 "error": str(e),
+                "latency_ms": round((time.perf_counter() - t0) * 1000, 1),
+                "retry": retry,
                 "success": False
             })
+            log_executed_query(queries_executed[-1])
     
-    return {
-        "context": context_parts,
-        "sources": sources,
-        "queries_executed": queries_executed,
-        "reasoning": reasoning
-    }
+    return context_parts, sources, queries_executed, rejected
+
+
+def log_executed_query(entry: Dict):
+    """Persist one executed/rejected query for the index advisor; logging never fails the chat"""
+    try:
+        log_query(
+            entry["sql"], extract_tables_from_sql(entry["sql"]), "cache" if entry.get("cache") == "hit" else entry.get("engine"),
+            entry["success"], entry.get("rejected", False),
+            entry.get("row_count"), entry.get("latency_ms"), entry.get("estimated_rows"), entry.get("error") or entry.get("verdict"),
+        )
+    except Exception as e:
+        logger.warning(f"[SQL] query log write failed: {e}")
 
 
 def extract_tables_from_sql(sql: str) -> List[str]:
-    """Simple extraction of table names from SQL (basic parser)"""
-    import re
-    sql_upper = sql.upper()
-    tables = []
-    
-    # Find FROM clauses
-    from_pattern = r'FROM\s+`?(\w+)`?'
-    tables.extend(re.findall(from_pattern, sql_upper, re.IGNORECASE))
-    
-    # Find JOIN clauses
-    join_pattern = r'JOIN\s+`?(\w+)`?'
-    tables.extend(re.findall(join_pattern, sql_upper, re.IGNORECASE))
-    
-    return list(set(tables))
\ No newline at end of file
+    """Table names after FROM/JOIN, with their original case (literals and comments ignored)"""
+    return referenced_tables(sql)
@@ -0,0 +1,135 @@
+import re
+from ..config import SQL_DEFAULT_LIMIT, SQL_MAX_LIMIT, SQL_MAX_EXAMINED_ROWS
+from ..db import explain_query
+
+_COMMENT = re.compile(r"/\*.*?\*/|(--|#)[^\n]*", re.S)
+_STARTS_READ = re.compile(r"^\s*(\(\s*)*(SELECT|WITH)\b", re.I)
+_WRITE_WORDS = re.compile(
+    r"\b(INSERT|UPDATE|DELETE|MERGE|DROP|ALTER|CREATE|TRUNCATE|RENAME|GRANT|REVOKE|LOAD|CALL|HANDLER|INTO|"
+    r"SLEEP|BENCHMARK|GET_LOCK)\b",
+    re.I,
+)
+_LOCKING_READ = re.compile(r"\bFOR\s+(UPDATE|SHARE)\b|\bLOCK\s+IN\s+SHARE\s+MODE\b", re.I)
+_TRAILING_LIMIT = re.compile(r"\bLIMIT\s+(\d+)(\s*(,|OFFSET)\s*(\d+))?\s*$", re.I)
+_BOUNDED_BY_LIMIT = re.compile(r"\b(GROUP\s+BY|ORDER\s+BY|DISTINCT|UNION|COUNT|SUM|AVG|MIN|MAX|JOIN)\b", re.I)
+
+
+class QueryRejected(Exception):
+    """A generated query failed the read-only or cost check; `verdict` is fed back to the LLM"""
+
+    def __init__(self, verdict: str, estimated_rows: int = None):
+        super().__init__(verdict)
+        self.verdict = verdict
+        self.estimated_rows = estimated_rows
+
+
+def mask_sql(sql: str, identifiers: bool = True) -> str:
+    """Blank out comments, string literals and (unless `identifiers` is False) backtick identifiers"""
+    quotes = "'\"`" if identifiers else "'\""
+    out, quote, i = [], None, 0
+    while i < len(sql):
+        ch = sql[i]
+        if quote:
+            if ch == "\\" and quote != "`" and i + 1 < len(sql):
+                out.append("  ")
+                i += 2
+                continue
+            out.append(ch if ch == quote else " ")
+            if ch == quote:
+                quote = None
+        elif ch in "'\"`":
+            if ch in quotes:
+                quote = ch
+            else:
+                # A backtick identifier left visible still hides its contents from the comment scan.
+                end = sql.find(ch, i + 1)
+                end = len(sql) if end < 0 else end + 1
+                out.append(sql[i:end])
+                i = end
+                continue
+            out.append(ch)
+        else:
+            m = _COMMENT.match(sql, i)
+            if m:
+                out.append(" " * len(m.group(0)))
+                i = m.end()
+                continue
+            out.append(ch)
+        i += 1
+    return "".join(out)
+
+
+def check_static(sql: str) -> str:
+    """
+    Local read-only check; returns the SQL with a LIMIT added (or clamped to
+    SQL_MAX_LIMIT) so a runaway result set cannot come back
+    """
+    masked = mask_sql(sql)
+    # Drop a trailing comment along with the `;`, or a `-- ...` would swallow the LIMIT added below.
+    sql = sql[:len(masked.rstrip().rstrip(";").rstrip())].lstrip()
+    masked = mask_sql(sql)
+    if ";" in masked:
+        raise QueryRejected("Only a single statement is allowed.")
+    if not _STARTS_READ.match(masked):
+        raise QueryRejected("Only SELECT queries are allowed.")
+    bad = _WRITE_WORDS.search(masked) or _LOCKING_READ.search(masked)
+    if bad:
+        raise QueryRejected(f"Read-only queries only; `{bad.group(0).upper()}` is not allowed.")
+    m = _TRAILING_LIMIT.search(masked)
+    if not m:
+        return f"{sql} LIMIT {SQL_DEFAULT_LIMIT}"
+    if m.group(3) == ",":
+        offset, count = m.group(1), int(m.group(4))
+    else:
+        offset, count = m.group(4), int(m.group(1))
+    if count > SQL_MAX_LIMIT:
+        tail = f"LIMIT {offset}, {SQL_MAX_LIMIT}" if offset else f"LIMIT {SQL_MAX_LIMIT}"
+        return sql[:m.start()] + tail
+    return sql
+
+
+def estimate_examined_rows(plan: list) -> int:
+    """Nested-loop estimate from EXPLAIN: each table's rows times the rows surviving the tables before it"""
+    total = 0
+    by_select = {}
+    for row in plan:
+        by_select.setdefault(row.get("id"), []).append(row)
+    for rows in by_select.values():
+        fanout = 1.0
+        for row in rows:
+            n = float(row.get("rows") or 1)
+            total += fanout * n
+            fanout *= n * float(row.get("filtered") or 100) / 100.0
+    return int(total)
+
+
+def _unindexed_joins(plan: list) -> list:
+    joined = {}
+    for row in plan:
+        joined.setdefault(row.get("id"), []).append(row)
+    return [
+        row.get("table") for rows in joined.values() if len(rows) > 1
+        for row in rows[1:] if row.get("type") == "ALL" and not row.get("ref")
+    ]
+
+
+def check_cost(sql: str) -> int:
+    """EXPLAIN the query and reject it if it would examine more than SQL_MAX_EXAMINED_ROWS rows"""
+    plan = explain_query(sql)
+    estimate = estimate_examined_rows(plan)
+    masked = mask_sql(sql)
+    limit = _TRAILING_LIMIT.search(masked)
+    if limit and len(plan) == 1 and not _BOUNDED_BY_LIMIT.search(masked):
+        # A plain single-table scan stops once LIMIT matching rows are found.
+        wanted = int(limit.group(4) if limit.group(3) == "," else limit.group(1))
+        selectivity = max(float(plan[0].get("filtered") or 100), 0.01) / 100.0
+        estimate = min(estimate, int(wanted / selectivity))
+    if estimate > SQL_MAX_EXAMINED_ROWS:
+        joins = _unindexed_joins(plan)
+        hint = f" Tables joined without an index (likely a cartesian product): {', '.join(joins)}." if joins else ""
+        raise QueryRejected(
+            f"Estimated {estimate:,} rows examined, above the {SQL_MAX_EXAMINED_ROWS:,} limit.{hint} "
+            "Filter on indexed columns, join on key columns, or aggregate fewer rows.",
+            estimate,
+        )
+    return estimate
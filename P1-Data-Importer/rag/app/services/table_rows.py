@@ -0,0 +1,99 @@
+import math
+import logging
+import time
+from typing import List, Optional
+from ..config import ROW_INGEST_BATCH, ROW_TEXT_MAX_CHARS
+from ..db import (
+    list_data_tables, table_created_at, table_key_column, iter_table_pages,
+    get_row_watermark, set_row_watermark, clear_row_watermarks,
+)
+from ..metrics import record_ingest
+from ..vector import get_rows_collection, index_changed
+from .embeddings import embed_batch
+
+logger = logging.getLogger(__name__)
+
+_VALUE_MAX_CHARS = 200
+
+
+def _is_empty(v) -> bool:
+    if v is None:
+        return True
+    if isinstance(v, float) and math.isnan(v):
+        return True
+    return isinstance(v, str) and not v.strip()
+
+
+def render_row(table: str, columns: List[str], row) -> str:
+    """Render one row as a compact `table | col=value; ...` document, skipping empty cells"""
+    parts = []
+    for c, v in zip(columns, row):
+        if _is_empty(v):
+            continue
+        s = str(v)
+        if len(s) > _VALUE_MAX_CHARS:
+            s = s[:_VALUE_MAX_CHARS] + "…"
+        parts.append(f"{c}={s}")
+    return f"{table} | " + "; ".join(parts)[:ROW_TEXT_MAX_CHARS]
+
+
+def _table_docs_present(table: str) -> bool:
+    res = get_rows_collection().get(where={"table": table}, limit=1, include=[])
+    return bool(res and res.get("ids"))
+
+
+def ingest_table(table: str, batch_size: int = ROW_INGEST_BATCH, max_rows: Optional[int] = None, reindex: bool = False):
+    """
+    Incrementally vectorize one table's rows into the rows collection
+
+    Rows are read in keyset pages after the stored watermark, so re-running only
+    picks up new rows. A re-created table (new CREATE_TIME) or a watermark whose
+    documents are gone from the collection restarts the table from scratch.
+    """
+    coll = get_rows_collection()
+    created = table_created_at(table)
+    key_column = table_key_column(table)
+    wm = None if reindex else get_row_watermark(table)
+    if wm and (wm.get("table_created_at") != created or wm.get("key_column") != key_column or not _table_docs_present(table)):
+        wm = None
+    if wm is None:
+        coll.delete(where={"table": table})
+        clear_row_watermarks(table)
+        last_key, offset = None, 0
+    else:
+        last_key, offset = wm.get("last_key"), int(wm.get("rows_ingested") or 0)
+
+    t0 = time.time()
+    added = 0
+    for cols, rows, new_last_key, new_offset in iter_table_pages(table, key_column, last_key, offset, batch_size):
+        if max_rows is not None and added >= max_rows:
+            break
+        key_idx = cols.index(key_column) if key_column else None
+        docs, metas, ids = [], [], []
+        for i, row in enumerate(rows):
+            row_key = str(row[key_idx]) if key_idx is not None else f"r{new_offset - len(rows) + i}"
+            docs.append(render_row(table, cols, row))
+            metas.append({"table": table, "row_key": row_key, "key_column": key_column or ""})
+            ids.append(f"t:{table}:{row_key}")
+        coll.upsert(embeddings=embed_batch(docs), documents=docs, metadatas=metas, ids=ids)
+        added += len(docs)
+        last_key, offset = new_last_key, new_offset
+        set_row_watermark(table, key_column, None if last_key is None else str(last_key), offset, created)
+    elapsed = time.time() - t0
+    record_ingest("table_rows", added, elapsed)
+    logger.info(f"[ROWS] {table}: +{added} rows in {round(elapsed, 1)}s (total {offset})")
+    return {
+        "table": table,
+        "rows_added": added,
+        "rows_total": offset,
+        "key_column": key_column,
+        "rows_per_sec": round(added / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def ingest_tables(tables: Optional[List[str]] = None, batch_size: int = ROW_INGEST_BATCH, max_rows: Optional[int] = None, reindex: bool = False):
+    available = list_data_tables()
+    targets = [t for t in (tables or available) if t in available]
+    results = [ingest_table(t, batch_size=batch_size, max_rows=max_rows, reindex=reindex) for t in targets]
+    index_changed()
+    return {"tables": results, "ingested": sum(r["rows_added"] for r in results)}
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from ..blobstore import blob_store
+
+_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+_STALE_SECONDS = 24 * 3600
+
+# Running hashes for sessions appended in this process; a session resumed elsewhere is re-hashed on completion.
+_HASHES = {}
+_LOCKS = {}
+_GUARD = threading.Lock()
+
+
+class UploadError(Exception):
+    def __init__(self, status_code: int, detail: str, offset: int = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.offset = offset
+
+
+def _part(uid: str) -> str:
+    return os.path.join(blob_store.tmp_dir, f"upload-{uid}.part")
+
+
+def _sidecar(uid: str) -> str:
+    return os.path.join(blob_store.tmp_dir, f"upload-{uid}.json")
+
+
+def _load(uid: str) -> dict:
+    if not _ID_RE.match(uid or "") or not os.path.exists(_sidecar(uid)):
+        raise UploadError(404, "upload not found")
+    with open(_sidecar(uid)) as fh:
+        info = json.load(fh)
+    info["offset"] = os.path.getsize(_part(uid))
+    return info
+
+
+def _gc_stale():
+    cutoff = time.time() - _STALE_SECONDS
+    for name in os.listdir(blob_store.tmp_dir):
+        if name.startswith("upload-"):
+            p = os.path.join(blob_store.tmp_dir, name)
+            try:
+                if os.path.getmtime(p) < cutoff:
+                    os.unlink(p)
+            except FileNotFoundError:
+                pass
+
+
+def create_session(filename: str, content_type: str, size: int = None) -> dict:
+    os.makedirs(blob_store.tmp_dir, exist_ok=True)
+    _gc_stale()
+    uid = uuid.uuid4().hex
+    info = {"upload_id": uid, "filename": filename, "content_type": content_type or "", "size": size, "started_at": time.time()}
+    open(_part(uid), "wb").close()
+    with open(_sidecar(uid), "w") as fh:
+        json.dump(info, fh)
+    with _GUARD:
+        _HASHES[uid] = hashlib.sha256()
+    return {**info, "offset": 0}
+
+
+def session_info(uid: str) -> dict:
+    return _load(uid)
+
+
+class _Appender:
+    def __init__(self, uid: str, offset: int):
+        self.uid = uid
+        self.offset = offset
+        self._fh = open(_part(uid), "ab")
+        with _GUARD:
+            self._hash = _HASHES.get(uid)
+            self._lock = _LOCKS.setdefault(uid, threading.Lock())
+        if not self._lock.acquire(blocking=False):
+            self._fh.close()
+            raise UploadError(409, "another chunk for this upload is in flight", offset)
+
+    def write(self, chunk: bytes):
+        if chunk:
+            self._fh.write(chunk)
+            if self._hash is not None:
+                self._hash.update(chunk)
+            self.offset += len(chunk)
+
+    def close(self):
+        self._fh.close()
+        self._lock.release()
+
+
+def open_append(uid: str, offset: int) -> _Appender:
+    """Start appending at `offset`, which must equal the bytes already received (tus-style resume)"""
+    info = _load(uid)
+    if offset != info["offset"]:
+        raise UploadError(409, "offset mismatch", info["offset"])
+    if info.get("size") is not None and offset >= info["size"] > 0:
+        raise UploadError(409, "upload already complete", info["offset"])
+    return _Appender(uid, offset)
+
+
+def finish(uid: str) -> dict:
+    """Move the assembled file into the blob store; returns the session info plus sha256/size/created"""
+    info = _load(uid)
+    if info.get("size") is not None and info["offset"] != info["size"]:
+        raise UploadError(409, f"expected {info['size']} bytes, received {info['offset']}", info["offset"])
+    with _GUARD:
+        h = _HASHES.pop(uid, None)
+        _LOCKS.pop(uid, None)
+    sha = h.hexdigest() if h is not None else blob_store.hash_file(_part(uid))
+    created = blob_store.commit_path(_part(uid), sha)
+    os.unlink(_sidecar(uid))
+    return {**info, "sha256": sha, "size_bytes": info["offset"], "created": created}
+
+
+def abort(uid: str):
+    _load(uid)
+    with _GUARD:
+        _HASHES.pop(uid, None)
+        _LOCKS.pop(uid, None)
+    for p in (_part(uid), _sidecar(uid)):
+        if os.path.exists(p):
+            os.unlink(p)
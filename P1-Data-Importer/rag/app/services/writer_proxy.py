@@ -0,0 +1,34 @@
+import re
+from fastapi import Request
+from fastapi.responses import Response
+from ..config import RAG_WRITER_URL
+from .. import tracing
+from . import aio
+
+# Everything that writes the vector index, the upload sessions or shared snapshots runs on the writer.
+_WRITE_ROUTES = re.compile(
+    r"^(?:/vdb/(?:reset|ingest_files|models/setup)|/ingest/.*|/files/uploads?(?:/.*)?|/files/\d+/index_status"
+    r"|/analytics/refresh|/catalog/refresh|/advisor/apply)$"
+)
+_HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "te", "upgrade", "host", "content-length"}
+
+
+def is_write(path: str) -> bool:
+    return bool(_WRITE_ROUTES.match(path))
+
+
+async def forward(request: Request) -> Response:
+    """Replay the request on the writer with its body streamed through; no timeout, ingestion can run long"""
+    headers = {k: v for k, v in request.headers.items() if k.lower() not in _HOP_HEADERS}
+    # The writer records its half of the request under the same trace id.
+    headers["x-trace-id"] = tracing.trace_id() or headers.get("x-trace-id", "")
+    r = await aio.client().request(
+        request.method,
+        RAG_WRITER_URL + request.url.path,
+        params=request.query_params,
+        headers=headers,
+        content=request.stream(),
+        timeout=None,
+    )
+    return Response(content=r.content, status_code=r.status_code,
+                    headers={k: v for k, v in r.headers.items() if k.lower() not in _HOP_HEADERS | {"content-encoding"}})
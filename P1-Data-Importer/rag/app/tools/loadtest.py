@@ -0,0 +1,114 @@
+"""
+Concurrent /chat load test: throughput, latency and server memory per concurrency level
+
+    python -m app.tools.loadtest --base http://localhost:8001 --levels 1,8,32,128 --duration 20 [--pid <uvicorn pid>]
+
+Each level keeps N chats in flight for --duration seconds. Messages carry a
+sequence number so identical-request coalescing does not flatter the numbers
+(pass --same to measure coalescing instead). With --pid the resident memory of
+that process and its children is sampled, which shows how many concurrent
+chats fit at a fixed memory footprint. Pair it with app.tools.stub_ollama to
+measure the service itself rather than the model.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from collections import Counter
+import httpx
+
+
+def _rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as fh:
+            return next(int(line.split()[1]) for line in fh if line.startswith("VmRSS:"))
+    except (OSError, StopIteration):
+        return 0
+
+
+def _tree_rss_mb(pid: int) -> float:
+    """Resident memory of pid and its descendants (uvicorn --workers forks)"""
+    total, stack = 0, [pid]
+    while stack:
+        p = stack.pop()
+        total += _rss_kb(p)
+        for task in os.listdir(f"/proc/{p}/task") if os.path.isdir(f"/proc/{p}/task") else []:
+            try:
+                with open(f"/proc/{p}/task/{task}/children") as fh:
+                    stack += [int(c) for c in fh.read().split()]
+            except OSError:
+                pass
+    return round(total / 1024, 1)
+
+
+async def _worker(client, args, deadline, results, seq):
+    while time.monotonic() < deadline:
+        n = next(seq)
+        msg = args.message if args.same else f"{args.message} (#{n})"
+        payload = {"message": msg, "use_rag": args.use_rag, "use_sql": args.use_sql, "timeout_s": args.timeout - 5}
+        if args.model:
+            payload["model"] = args.model
+        t0 = time.perf_counter()
+        try:
+            r = await client.post(f"{args.base}/chat", json=payload, timeout=args.timeout)
+            results.append((r.status_code, (time.perf_counter() - t0) * 1000))
+        except httpx.HTTPError as e:
+            results.append((type(e).__name__, (time.perf_counter() - t0) * 1000))
+
+
+async def _sample_memory(pid, stop, samples):
+    while not stop.is_set():
+        samples.append(_tree_rss_mb(pid))
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=0.5)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_level(args, level: int) -> dict:
+    results, samples, stop = [], [], asyncio.Event()
+    seq = iter(range(10 ** 9))
+    limits = httpx.Limits(max_connections=level, max_keepalive_connections=level)
+    async with httpx.AsyncClient(limits=limits) as client:
+        sampler = asyncio.create_task(_sample_memory(args.pid, stop, samples)) if args.pid else None
+        t0 = time.monotonic()
+        await asyncio.gather(*[_worker(client, args, t0 + args.duration, results, seq) for _ in range(level)])
+        elapsed = time.monotonic() - t0
+        stop.set()
+        if sampler:
+            await sampler
+    ok = sorted(ms for status, ms in results if status == 200)
+    return {
+        "concurrency": level,
+        "requests": len(results),
+        "ok": len(ok),
+        "errors": dict(Counter(str(s) for s, _ in results if s != 200)),
+        "rps": round(len(ok) / elapsed, 2),
+        "p50_ms": round(statistics.median(ok), 1) if ok else None,
+        "p95_ms": round(ok[min(len(ok) - 1, int(len(ok) * 0.95))], 1) if ok else None,
+        "peak_rss_mb": max(samples) if samples else None,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--base", default="http://localhost:8001")
+    ap.add_argument("--levels", default="1,8,32,128", help="comma-separated concurrency levels")
+    ap.add_argument("--duration", type=float, default=20.0, help="seconds per level")
+    ap.add_argument("--message", default="Say hello in one short sentence.")
+    ap.add_argument("--model", default=None)
+    ap.add_argument("--use-rag", action="store_true")
+    ap.add_argument("--use-sql", action="store_true")
+    ap.add_argument("--same", action="store_true", help="send identical messages (measures coalescing)")
+    ap.add_argument("--timeout", type=float, default=120.0)
+    ap.add_argument("--pid", type=int, default=None, help="server pid whose memory to sample")
+    args = ap.parse_args()
+    print(f"{'conc':>5} {'reqs':>6} {'ok':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'rss MB':>8}  errors")
+    for level in [int(x) for x in args.levels.split(",") if x.strip()]:
+        r = asyncio.run(run_level(args, level))
+        print(f"{r['concurrency']:>5} {r['requests']:>6} {r['ok']:>6} {r['rps']:>8} {str(r['p50_ms']):>9} {str(r['p95_ms']):>9} {str(r['peak_rss_mb']):>8}  {r['errors'] or ''}")
+
+
+if __name__ == "__main__":
+    main()
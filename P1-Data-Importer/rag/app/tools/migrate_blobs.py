@@ -0,0 +1,96 @@
+"""
+Move file bytes out of MySQL (files.data LONGBLOB) into the content-addressed blob store
+
+    python -m app.tools.migrate_blobs [--batch 50] [--dry-run] [--drop-data-column] [--gc]
+
+Rows are copied in SUBSTRING slices so a large document never has to fit in memory,
+then `sha256` is set and `data` is cleared. Safe to re-run: migrated rows are skipped.
+"""
+import argparse
+from sqlalchemy import text, inspect
+from ..config import FILE_STREAM_CHUNK
+from ..db import engine, ensure_files_table, _iter_legacy_range
+from ..blobstore import blob_store
+
+
+def _file_columns():
+    return {c["name"] for c in inspect(engine).get_columns("files")}
+
+
+def migrate(batch: int = 50, dry_run: bool = False):
+    # A dry run against a never-upgraded table has no sha256 column to filter on yet.
+    pending = "sha256 IS NULL AND " if "sha256" in _file_columns() else ""
+    moved, deduped, last_id = 0, 0, 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(text(
+                f"SELECT id, filename, LENGTH(data) AS n FROM files WHERE {pending}data IS NOT NULL AND id > :last ORDER BY id LIMIT :lim"
+            ), {"last": last_id, "lim": batch}).mappings().all()
+        if not rows:
+            break
+        for r in rows:
+            last_id = r["id"]
+            if dry_run:
+                print(f"would migrate id={r['id']} {r['filename']} ({r['n']} bytes)")
+                continue
+            w = blob_store.writer()
+            try:
+                for chunk in _iter_legacy_range(r["id"], 0, int(r["n"] or 0) - 1, FILE_STREAM_CHUNK):
+                    w.write(chunk)
+            except BaseException:
+                w.abort()
+                raise
+            sha, size, created = w.commit()
+            with engine.begin() as conn:
+                conn.execute(text("UPDATE files SET sha256=:h, size_bytes=:s, data=NULL WHERE id=:i"), {"h": sha, "s": size, "i": r["id"]})
+            moved += 1
+            deduped += 0 if created else 1
+            print(f"migrated id={r['id']} {r['filename']} -> {sha}{'' if created else ' (dedup)'}")
+    return moved, deduped
+
+
+def drop_data_column():
+    with engine.begin() as conn:
+        remaining = conn.execute(text("SELECT COUNT(*) FROM files WHERE sha256 IS NULL AND data IS NOT NULL")).scalar()
+        if remaining:
+            raise SystemExit(f"{remaining} rows still hold bytes in files.data; not dropping the column")
+        conn.execute(text("ALTER TABLE files DROP COLUMN data"))
+
+
+def gc(dry_run: bool = False):
+    """Remove blobs no longer referenced by any files row"""
+    with engine.begin() as conn:
+        live = {r[0] for r in conn.execute(text("SELECT DISTINCT sha256 FROM files WHERE sha256 IS NOT NULL"))}
+    removed = 0
+    for sha in list(blob_store.iter_hashes()):
+        if sha not in live:
+            if not dry_run:
+                blob_store.delete(sha)
+            removed += 1
+    return removed
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--batch", type=int, default=50)
+    ap.add_argument("--dry-run", action="store_true")
+    ap.add_argument("--drop-data-column", action="store_true", help="drop files.data once every row is migrated")
+    ap.add_argument("--gc", action="store_true", help="delete unreferenced blobs")
+    args = ap.parse_args()
+
+    if "data" in _file_columns():
+        if not args.dry_run:
+            ensure_files_table()
+        moved, deduped = migrate(args.batch, args.dry_run)
+        print(f"migrated {moved} file(s), {deduped} deduplicated against existing blobs")
+        if args.drop_data_column and not args.dry_run:
+            drop_data_column()
+            print("dropped files.data")
+    else:
+        print("files.data not present; nothing to migrate")
+    if args.gc:
+        print(f"{'would remove' if args.dry_run else 'removed'} {gc(args.dry_run)} unreferenced blob(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Minimal stand-in for an Ollama server, for exercising the backend pool locally
+
+    python -m app.tools.stub_ollama --port 11501 [--models mistral,mxbai-embed-large] [--delay 0.2] [--fail-rate 0.0]
+
+Then point the rag service at several of them, e.g.
+OLLAMA_BASE_URLS=http://localhost:11501,http://localhost:11502, and watch /llm/backends.
+Answers /api/tags, /api/ps, /api/pull, /api/generate (streamed), /api/chat,
+/api/embed and /api/embeddings; unknown models get Ollama's 404 "model not found".
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(models: set, delay: float, fail_rate: float, dim: int):
+    loaded = set()
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _json(self, status: int, body: dict):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                return self._json(200, {"models": [{"name": m} for m in sorted(models)]})
+            if self.path == "/api/ps":
+                with lock:
+                    return self._json(200, {"models": [{"name": m, "size_vram": 0} for m in sorted(loaded)]})
+            self._json(404, {"error": "404 page not found"})
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            model = body.get("model") or body.get("name")
+            if self.path == "/api/pull":
+                models.add(model)
+                return self._json(200, {"status": "success"})
+            if model not in models:
+                return self._json(404, {"error": f"model '{model}' not found"})
+            if random.random() < fail_rate:
+                return self._json(500, {"error": "stub failure"})
+            time.sleep(delay)
+            with lock:
+                loaded.add(model)
+            if self.path in ("/api/embed", "/api/embeddings"):
+                texts = body.get("input") if self.path == "/api/embed" else body.get("prompt")
+                vec = lambda t: [float((hash(t) >> i) & 0xFF) / 255.0 for i in range(dim)]
+                if isinstance(texts, list):
+                    return self._json(200, {"embeddings": [vec(t) for t in texts]})
+                return self._json(200, {"embedding": vec(texts or ""), "embeddings": [vec(texts or "")]})
+            if self.path == "/api/chat":
+                return self._json(200, {"message": {"role": "assistant", "content": "stub answer"}, "done": True})
+            if self.path == "/api/generate":
+                prompt = body.get("prompt") or ""
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                done = {"response": "", "done": True, "prompt_eval_count": len(prompt) // 4,
+                        "prompt_eval_duration": int(delay * 1e9), "eval_count": 2, "eval_duration": 1000000}
+                try:
+                    for chunk in ({"response": "stub ", "done": False}, {"response": "answer", "done": False}, done):
+                        self.wfile.write((json.dumps(chunk) + "\n").encode())
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client gave up on this generation
+                return
+            self._json(404, {"error": "404 page not found"})
+
+    return Handler
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=11501)
+    ap.add_argument("--models", default="mistral,mxbai-embed-large")
+    ap.add_argument("--delay", type=float, default=0.2, help="seconds added to every model call")
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="share of model calls answered with HTTP 500")
+    ap.add_argument("--dim", type=int, default=8, help="embedding size")
+    args = ap.parse_args()
+    handler = make_handler({m.strip() for m in args.models.split(",") if m.strip()}, args.delay, args.fail_rate, args.dim)
+    server = ThreadingHTTPServer(("0.0.0.0", args.port), handler)
+    print(f"stub ollama on :{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import contextvars
+import logging
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from .config import TRACE_STORE_SIZE, TRACE_MAX_SPANS
+
+# The request being traced and the innermost open span; the threadpool copies both into sync work.
+_trace = contextvars.ContextVar("trace", default=None)
+_span = contextvars.ContextVar("span", default=None)
+
+# What a client-supplied trace id may look like; it ends up in logs, headers and the trace store
+_TRACE_ID = re.compile(r"[A-Za-z0-9._-]{1,64}")
+
+_lock = threading.Lock()
+_store = deque(maxlen=TRACE_STORE_SIZE)
+
+
+class Span:
+    __slots__ = ("id", "parent", "name", "start", "end", "attrs", "error")
+
+    def __init__(self, name: str, parent, attrs: dict):
+        self.id = uuid.uuid4().hex[:8]
+        self.parent = parent
+        self.name = name
+        self.start = time.perf_counter()
+        self.end = None
+        self.attrs = attrs
+        self.error = None
+
+
+class Trace:
+    def __init__(self, trace_id: str, method: str, path: str):
+        self.id = trace_id
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration_ms = None
+        self.status = None
+        self.spans = []
+        self.dropped = 0
+        self.log_records = 0
+        self.log_ms = 0.0
+
+    def add(self, span: Span) -> bool:
+        # list.append is atomic; a span lost to the cap is only counted.
+        if len(self.spans) >= TRACE_MAX_SPANS:
+            self.dropped += 1
+            return False
+        self.spans.append(span)
+        return True
+
+
+def trace_id():
+    t = _trace.get()
+    return t.id if t else None
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """A nested span of the current request's trace; a no-op outside a traced request"""
+    trace = _trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _span.get()
+    s = Span(name, parent.id if parent else None, attrs)
+    token = _span.set(s) if trace.add(s) else None
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"[:300]
+        raise
+    finally:
+        s.end = time.perf_counter()
+        if token is not None:
+            _span.reset(token)
+
+
+def annotate(**attrs):
+    """Add attributes to the innermost open span (row counts, backend, time to first token, ...)"""
+    s = _span.get()
+    if s is not None:
+        s.attrs.update(attrs)
+
+
+def begin(trace_id: str, method: str, path: str):
+    """Start the request's trace under `trace_id` if it is well formed, otherwise under a fresh one"""
+    if not trace_id or not _TRACE_ID.fullmatch(trace_id):
+        trace_id = uuid.uuid4().hex[:16]
+    trace = Trace(trace_id, method, path)
+    return trace, _trace.set(trace)
+
+
+def finish(trace: Trace, token, status: int):
+    trace.duration_ms = round((time.perf_counter() - trace.start) * 1000, 1)
+    trace.status = status
+    _trace.reset(token)
+    with _lock:
+        _store.append(trace)
+
+
+def _tree(trace: Trace) -> list:
+    nodes, roots = {}, []
+    for s in sorted(trace.spans, key=lambda s: s.start):
+        end = s.end if s.end is not None else time.perf_counter()
+        nodes[s.id] = {
+            "name": s.name,
+            "start_ms": round((s.start - trace.start) * 1000, 1),
+            "duration_ms": round((end - s.start) * 1000, 1),
+            **({"attrs": s.attrs} if s.attrs else {}),
+            **({"error": s.error} if s.error else {}),
+            **({"unfinished": True} if s.end is None else {}),
+            "children": [],
+        }
+        parent = nodes.get(s.parent)
+        (parent["children"] if parent else roots).append(nodes[s.id])
+    return roots
+
+
+def render(trace: Trace, spans: bool = True) -> dict:
+    out = {
+        "trace_id": trace.id,
+        "method": trace.method,
+        "path": trace.path,
+        "status": trace.status,
+        "started_at": trace.started_at,
+        "duration_ms": trace.duration_ms,
+        "span_count": len(trace.spans),
+    }
+    if trace.dropped:
+        out["dropped_spans"] = trace.dropped
+    if trace.log_records:
+        out["log_records"] = trace.log_records
+        out["log_ms"] = round(trace.log_ms, 2)
+    if spans:
+        out["spans"] = _tree(trace)
+    return out
+
+
+def slowest(limit: int = 20, path: str = None, min_ms: float = 0.0, spans: bool = True) -> list:
+    """The slowest finished requests still in the store, slowest first"""
+    with _lock:
+        traces = [t for t in _store if (path is None or t.path == path) and t.duration_ms >= min_ms]
+    traces.sort(key=lambda t: t.duration_ms, reverse=True)
+    return [render(t, spans) for t in traces[:limit]]
+
+
+def get(trace_id: str):
+    with _lock:
+        found = next((t for t in reversed(_store) if t.id == trace_id), None)
+    return render(found) if found else None
+
+
+def count_log(ms: float):
+    """Charge one log record, and the time the caller spent handing it off, to the current request"""
+    t = _trace.get()
+    if t is not None:
+        t.log_records += 1
+        t.log_ms += ms
+
+
+def install_log_context():
+    """Every log record carries `trace_id` ("-" outside a request), so lines of one request can be joined"""
+    previous = logging.getLogRecordFactory()
+
+    def factory(*args, **kwargs):
+        record = previous(*args, **kwargs)
+        record.trace_id = trace_id() or "-"
+        return record
+
+    logging.setLogRecordFactory(factory)
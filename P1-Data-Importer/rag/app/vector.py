@@ -1,21 +1,62 @@
 from chromadb import Client, Settings
+from .config import ROWS_COLLECTION_NAME, CHROMA_DIR, RAG_ROLE
+from .vector_snapshot import Publisher, SnapshotReader, read_manifest
 
 _CLIENT = None
 _COLL_NAME = "files"
+_ROWS_COLL_NAME = ROWS_COLLECTION_NAME
+_READER = SnapshotReader() if RAG_ROLE == "reader" else None
 
 def _client():
     global _CLIENT
     if _CLIENT is None:
-        _CLIENT = Client(Settings(persist_directory="/chroma"))
+        _CLIENT = Client(Settings(persist_directory=CHROMA_DIR))
     return _CLIENT
 
-def get_collection():
-    return _client().get_or_create_collection(_COLL_NAME, metadata={"hnsw:space": "cosine"})
+def get_collection(name: str = _COLL_NAME):
+    if _READER is not None:
+        return _READER.collection(name)
+    return _client().get_or_create_collection(name, metadata={"hnsw:space": "cosine"})
 
-def reset_collection():
+def reset_collection(name: str = _COLL_NAME):
+    if _READER is not None:
+        raise RuntimeError("reader processes serve a read-only index; writes go to the writer")
     c = _client()
     try:
-        c.delete_collection(_COLL_NAME)
+        c.delete_collection(name)
     except Exception:
         pass
-    return c.get_or_create_collection(_COLL_NAME, metadata={"hnsw:space": "cosine"})
+    return c.get_or_create_collection(name, metadata={"hnsw:space": "cosine"})
+
+def get_rows_collection():
+    return get_collection(_ROWS_COLL_NAME)
+
+def reset_rows_collection():
+    return reset_collection(_ROWS_COLL_NAME)
+
+_PUBLISHER = Publisher(lambda: {n: get_collection(n) for n in (_COLL_NAME, _ROWS_COLL_NAME)}) if RAG_ROLE == "writer" else None
+
+def index_changed():
+    """Called after ingestion writes; on the writer this schedules a new read-only snapshot"""
+    if _PUBLISHER is not None:
+        _PUBLISHER.mark_dirty()
+
+def index_status():
+    if _READER is not None:
+        return {"role": RAG_ROLE, **_READER.status()}
+    manifest = read_manifest()
+    return {
+        "role": RAG_ROLE,
+        "published_version": manifest.get("version"),
+        "publish_pending": _PUBLISHER.pending() if _PUBLISHER else False,
+        "publish_error": _PUBLISHER.last_error if _PUBLISHER else None,
+        "collections": {n: get_collection(n).count() for n in (_COLL_NAME, _ROWS_COLL_NAME)},
+    }
+
+def memory_status():
+    """What this process holds for the vector store, without opening a client that is not open yet"""
+    if _READER is not None:
+        return {"role": RAG_ROLE, "snapshot_version": _READER.version, "mapped": _READER.mapped()}
+    if _CLIENT is None:
+        return {"role": RAG_ROLE, "chroma_client": False}
+    return {"role": RAG_ROLE, "chroma_client": True, "collections": {c.name: c.count() for c in _CLIENT.list_collections()}}
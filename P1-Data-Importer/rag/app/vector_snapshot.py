@@ -0,0 +1,255 @@
+import json
+import logging
+import mmap
+import os
+import shutil
+import threading
+import time
+import numpy as np
+from .config import INDEX_SNAPSHOT_DIR, INDEX_PUBLISH_DELAY, INDEX_POLL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_MANIFEST = os.path.join(INDEX_SNAPSHOT_DIR, "manifest.json")
+_EXPORT_PAGE = 5000
+_SCAN_BLOCK = 65536
+# Metadata keys a snapshot can filter on (`where` of a query), stored as one int32 code per document.
+_FILTER_KEYS = ("table", "file_id")
+
+
+def read_manifest() -> dict:
+    try:
+        with open(_MANIFEST) as fh:
+            return json.load(fh)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+# ---- writer side ----
+
+def _export(coll, out_dir: str, name: str) -> dict:
+    """Copy one Chroma collection into unit-length float32 vectors, a documents file and filter codes"""
+    n = coll.count()
+    vec_path = os.path.join(out_dir, f"{name}.vectors.npy")
+    docs_path = os.path.join(out_dir, f"{name}.docs.jsonl")
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    codes = {k: np.full(n, -1, dtype=np.int32) for k in _FILTER_KEYS}
+    values = {k: {} for k in _FILTER_KEYS}
+    vectors, dim, pos = None, 0, 0
+    with open(docs_path, "wb") as docs:
+        while pos < n:
+            page = coll.get(limit=_EXPORT_PAGE, offset=pos, include=["embeddings", "documents", "metadatas"])
+            if not page["ids"]:
+                break
+            emb = np.asarray(page["embeddings"], dtype=np.float32)
+            if vectors is None:
+                dim = emb.shape[1]
+                vectors = np.lib.format.open_memmap(vec_path, mode="w+", dtype=np.float32, shape=(n, dim))
+            emb /= np.maximum(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12)
+            vectors[pos:pos + len(emb)] = emb
+            for i, (doc_id, doc, meta) in enumerate(zip(page["ids"], page["documents"], page["metadatas"])):
+                docs.write(json.dumps([doc_id, doc, meta or {}]).encode() + b"\n")
+                offsets[pos + i + 1] = docs.tell()
+                for k in _FILTER_KEYS:
+                    if meta and k in meta:
+                        codes[k][pos + i] = values[k].setdefault(str(meta[k]), len(values[k]))
+            pos += len(emb)
+    if vectors is None:
+        np.save(vec_path, np.zeros((0, 0), dtype=np.float32))
+    else:
+        vectors.flush()
+        del vectors
+    # A collection can shrink between count() and the last page; keep only what was written.
+    count = pos
+    np.save(os.path.join(out_dir, f"{name}.offsets.npy"), offsets[:count + 1])
+    for k in _FILTER_KEYS:
+        np.save(os.path.join(out_dir, f"{name}.{k}.npy"), codes[k][:count])
+    return {"count": count, "dim": dim, "filters": {k: list(values[k]) for k in _FILTER_KEYS}}
+
+
+def publish(collections: dict) -> dict:
+    """
+    Write every collection (name -> Chroma collection) into a new version directory,
+    then swap manifest.json to point at it. Readers pick the new version up on their
+    next poll; the previous version stays on disk for searches still using it.
+    """
+    t0 = time.time()
+    version = int(read_manifest().get("version") or 0) + 1
+    out_dir = os.path.join(INDEX_SNAPSHOT_DIR, f"v{version}")
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+    entries = {name: _export(coll, out_dir, name) for name, coll in collections.items()}
+    manifest = {"version": version, "dir": f"v{version}", "published_at": time.time(), "collections": entries}
+    tmp = _MANIFEST + ".tmp"
+    with open(tmp, "w") as fh:
+        json.dump(manifest, fh)
+    os.replace(tmp, _MANIFEST)
+    for d in os.listdir(INDEX_SNAPSHOT_DIR):
+        if d.startswith("v") and d[1:].isdigit() and int(d[1:]) < version - 1:
+            shutil.rmtree(os.path.join(INDEX_SNAPSHOT_DIR, d), ignore_errors=True)
+    logger.info(f"[INDEX] published v{version}: " + ", ".join(f"{k}={e['count']}" for k, e in entries.items()) + f" in {round(time.time() - t0, 1)}s")
+    return manifest
+
+
+class Publisher:
+    """Debounced publishing: ingest calls mark_dirty(), one thread publishes once writes go quiet"""
+
+    def __init__(self, collections):
+        self._collections = collections
+        self._cond = threading.Condition()
+        self._dirty_at = None
+        self._thread = None
+        self.last_error = None
+
+    def mark_dirty(self):
+        with self._cond:
+            self._dirty_at = time.time()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="index-publisher", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._dirty_at is None:
+                    self._cond.wait()
+                wait = self._dirty_at + INDEX_PUBLISH_DELAY - time.time()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                self._dirty_at = None
+            try:
+                publish(self._collections())
+                self.last_error = None
+            except Exception as e:
+                logger.error(f"[INDEX] publish failed: {e}")
+                self.last_error = str(e)
+
+    def pending(self) -> bool:
+        with self._cond:
+            return self._dirty_at is not None
+
+
+# ---- reader side ----
+
+class SnapshotCollection:
+    """
+    Read-only stand-in for a Chroma collection over a published snapshot
+
+    Vectors, document offsets and filter codes are memory-mapped, so every worker
+    on the host shares one copy through the page cache. query() is an exact
+    cosine scan in blocks and returns Chroma's result shape.
+    """
+
+    def __init__(self, base: str, name: str, entry: dict):
+        self.name = name
+        self.count_ = entry["count"]
+        self.vectors = np.load(os.path.join(base, f"{name}.vectors.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(base, f"{name}.offsets.npy"), mmap_mode="r")
+        self.codes = {k: np.load(os.path.join(base, f"{name}.{k}.npy"), mmap_mode="r") for k in _FILTER_KEYS}
+        self.filters = {k: {v: i for i, v in enumerate(vals)} for k, vals in entry["filters"].items()}
+        with open(os.path.join(base, f"{name}.docs.jsonl"), "rb") as fh:
+            self._docs = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] else b""
+
+    def count(self) -> int:
+        return self.count_
+
+    def _mask(self, where):
+        if not where:
+            return None
+        mask = None
+        for key, cond in where.items():
+            if key not in self.codes:
+                raise ValueError(f"snapshot cannot filter on {key!r}")
+            wanted = cond["$in"] if isinstance(cond, dict) else [cond]
+            ids = [self.filters[key][str(v)] for v in wanted if str(v) in self.filters[key]]
+            m = np.isin(self.codes[key], ids)
+            mask = m if mask is None else mask & m
+        return mask
+
+    def _doc(self, i: int):
+        return json.loads(self._docs[self.offsets[i]:self.offsets[i + 1]])
+
+    def query(self, query_embeddings, n_results: int = 10, where=None, include=None):
+        mask = self._mask(where)
+        out = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for q in query_embeddings:
+            q = np.asarray(q, dtype=np.float32)
+            q /= max(float(np.linalg.norm(q)), 1e-12)
+            if self.count_ and q.shape[0] != self.vectors.shape[1]:
+                raise ValueError(f"query has {q.shape[0]} dimensions, snapshot {self.name!r} has {self.vectors.shape[1]}")
+            best_i, best_s = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            for start in range(0, self.count_, _SCAN_BLOCK):
+                scores = self.vectors[start:start + _SCAN_BLOCK] @ q
+                if mask is not None:
+                    scores = np.where(mask[start:start + _SCAN_BLOCK], scores, -np.inf)
+                idx = np.arange(start, start + len(scores))
+                best_i, best_s = np.concatenate([best_i, idx]), np.concatenate([best_s, scores])
+                if len(best_s) > n_results:
+                    keep = np.argpartition(-best_s, n_results)[:n_results]
+                    best_i, best_s = best_i[keep], best_s[keep]
+            order = np.argsort(-best_s)
+            hits = [(int(best_i[j]), float(best_s[j])) for j in order if np.isfinite(best_s[j])]
+            docs = [self._doc(i) for i, _ in hits]
+            out["ids"].append([d[0] for d in docs])
+            out["documents"].append([d[1] for d in docs])
+            out["metadatas"].append([d[2] for d in docs])
+            # Same convention as Chroma's cosine space: distance = 1 - similarity.
+            out["distances"].append([1.0 - s for _, s in hits])
+        return out
+
+
+class SnapshotReader:
+    """The current snapshot version, re-checked at most every INDEX_POLL_SECONDS"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked = 0.0
+        self._mtime = None
+        self.version = None
+        self.collections = {}
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(_MANIFEST).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        manifest = read_manifest()
+        if manifest.get("version") != self.version:
+            base = os.path.join(INDEX_SNAPSHOT_DIR, manifest["dir"])
+            loaded = {name: SnapshotCollection(base, name, e) for name, e in manifest["collections"].items()}
+            # Searches already holding the old collections finish on them; the maps close when they are dropped.
+            self.collections, self.version = loaded, manifest["version"]
+            logger.info(f"[INDEX] loaded snapshot v{self.version}")
+        self._mtime = mtime
+
+    def collection(self, name: str):
+        now = time.time()
+        if now - self._checked >= INDEX_POLL_SECONDS:
+            with self._lock:
+                if now - self._checked >= INDEX_POLL_SECONDS:
+                    try:
+                        self._refresh()
+                    except Exception as e:
+                        logger.error(f"[INDEX] snapshot reload failed, keeping v{self.version}: {e}")
+                    self._checked = now
+        coll = self.collections.get(name)
+        if coll is None:
+            raise RuntimeError(f"no published index snapshot for collection {name!r} yet")
+        return coll
+
+    def mapped(self) -> dict:
+        """Bytes each collection maps; shared with other workers through the page cache"""
+        return {
+            n: {"vectors_mb": round(c.vectors.nbytes / 2**20, 1), "docs_mb": round(len(c._docs) / 2**20, 1)}
+            for n, c in self.collections.items()
+        }
+
+    def status(self) -> dict:
+        return {
+            "version": self.version,
+            "collections": {n: {"count": c.count(), "dim": int(c.vectors.shape[1]) if c.vectors.ndim == 2 else 0} for n, c in self.collections.items()},
+        }
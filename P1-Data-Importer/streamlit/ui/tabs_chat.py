@@ -3,6 +3,8 @@ import time
 import requests
 import streamlit as st
 
+CHAT_TIMEOUT_S = 180
+
 def render_tab_chat(rag_base_default):
     st.subheader("Chat")
     c1, c2, c3 = st.columns([2,2,1])
@@ -32,9 +34,10 @@ def render_tab_chat(rag_base_default):
                     "message": msg,
                     "model": st.session_state.chat_model,
                     "use_rag": False,
-                    "use_sql": False
+                    "use_sql": False,
+                    "timeout_s": CHAT_TIMEOUT_S - 10
                 }
-                r = requests.post(f"{st.session_state.chat_base}/chat", json=payload, timeout=180)
+                r = requests.post(f"{st.session_state.chat_base}/chat", json=payload, timeout=CHAT_TIMEOUT_S)
                 dt = (time.time() - t0) * 1000.0
                 
                 if r.status_code >= 400:
@@ -4,9 +4,10 @@ import streamlit as st
 import pandas as pd
 from docx import Document
 import streamlit.components.v1 as components
-from utils.db import list_files, get_file_blob
+from utils.db import list_files
+from utils.rag_api import rag_file_content
 
-def render_tab_files(engine):
+def render_tab_files(engine, rag_base):
     rows = list_files()
     if not rows:
         st.info("No files stored")
@@ -15,9 +16,12 @@ def render_tab_files(engine):
         st.dataframe(df, use_container_width=True, height=300)
         sel = st.selectbox("Select file id", options=df["id"].tolist(), key="sel_files_id")
         if st.button("Open", key="btn_files_open"):
-            row = get_file_blob(sel)
-            if row:
-                fid, fname, ctype, sizeb, data = row
+            meta = df[df["id"] == sel].iloc[0]
+            fname, ctype, sizeb = meta["filename"], meta["content_type"], meta["size_bytes"]
+            ok, data = rag_file_content(rag_base, int(sel))
+            if not ok:
+                st.error(data)
+            else:
                 st.write(f"{fname} • {ctype} • {sizeb} bytes")
                 if ctype.startswith("application/pdf") or fname.lower().endswith(".pdf"):
                     b64 = base64.b64encode(data).decode("utf-8")
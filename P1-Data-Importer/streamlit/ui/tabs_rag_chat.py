@@ -4,6 +4,9 @@ import requests
 import streamlit as st
 import streamlit.components.v1 as components
 from sqlalchemy import text, inspect
+
+# The backend gets a slightly smaller budget so it gives up (and stops generating) before we do
+CHAT_TIMEOUT_S = 240
 def render_tab_rag_chat(engine, rag_base):
     st.subheader("RAG Chat")
     col_a, col_b, col_c = st.columns([1.2,1,1])
@@ -50,9 +53,10 @@ def render_tab_rag_chat(engine, rag_base):
                     "use_rag": use_files,
                     "topk": int(topk),
                     "use_sql": use_tables,
-                    "selected_tables": sel_tables
+                    "selected_tables": sel_tables,
+                    "timeout_s": CHAT_TIMEOUT_S - 10
                 }
-                rc = requests.post(f"{rag_base}/chat", json=payload, timeout=240)
+                rc = requests.post(f"{rag_base}/chat", json=payload, timeout=CHAT_TIMEOUT_S)
                 dt = round((time.time()-t0)*1000.0, 1)
                 
                 if rc.status_code >= 400:
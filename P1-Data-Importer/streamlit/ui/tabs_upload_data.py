@@ -1,13 +1,13 @@
 import os
 import streamlit as st
-from utils.db import read_tabular_file, write_df, unique_table_name, normalize_table_name, list_tables
-from utils.rag_api import rag_ingest_tables
-import pandas as pd
+from utils.db import unique_table_name, normalize_table_name
+from utils.bulk_import import preview_tabular_file, bulk_import
+from utils.rag_api import rag_ingest_tables, rag_refresh_catalog, rag_refresh_analytics
 
 def render_tab_upload_data(engine, rag_base):
     uploaded = st.file_uploader("Upload CSV/XLS/XLSX", type=["csv", "xls", "xlsx"], key="up_tab_upload")
     if uploaded:
-        df = read_tabular_file(uploaded)
+        df = preview_tabular_file(uploaded)
         if df is None:
             st.error("Unsupported file")
         else:
@@ -20,11 +20,16 @@ def render_tab_upload_data(engine, rag_base):
                 do_import = st.button("Import to MySQL", type="primary", key="btn_tab_import_mysql")
             with c2:
                 replace_existing = st.checkbox("Replace if table exists", value=False, key="chk_tab_replace")
+            with st.expander("Schema options"):
+                idx_raw = st.text_input("Index columns (comma-separated; blank = automatic, '-' = none)", value="", key="in_tab_index_cols")
+                types_raw = st.text_area("Column type overrides (one 'column: SQL TYPE' per line)", value="", height=80, key="in_tab_type_overrides")
             if do_import:
                 tn = normalize_table_name(table_input) if replace_existing else unique_table_name(table_input)
                 try:
-                    write_df(df, tn, replace=replace_existing)
-                    st.success(f"Imported to table {tn}")
+                    index_columns, type_overrides = parse_schema_options(idx_raw, types_raw)
+                    stats = import_with_progress(uploaded, tn, replace=replace_existing, rag_base=rag_base, index_columns=index_columns, type_overrides=type_overrides)
+                    st.success(f"Imported {stats['rows']:,} rows to table {tn} in {stats['seconds']}s ({stats['rows_per_sec'] or 0:,.0f} rows/s)")
+                    st.caption(f"Indexes: {', '.join(stats['indexes']) or 'none'} • primary key {stats['primary_key']}")
                     if st.session_state.auto_sync:
                         ok, res = rag_ingest_tables(rag_base, tn)
                         if ok:
@@ -33,3 +38,40 @@ def render_tab_upload_data(engine, rag_base):
                             st.warning(f"RAG sync failed: {res}")
                 except Exception as e:
                     st.error(str(e))
+
+def parse_schema_options(idx_raw, types_raw):
+    idx_raw = (idx_raw or "").strip()
+    if idx_raw == "-":
+        index_columns = []
+    elif idx_raw:
+        index_columns = [c.strip() for c in idx_raw.split(",") if c.strip()]
+    else:
+        index_columns = None
+    type_overrides = {}
+    for line in (types_raw or "").splitlines():
+        if ":" in line:
+            col, typ = line.split(":", 1)
+            if col.strip() and typ.strip():
+                type_overrides[col.strip()] = typ.strip()
+    return index_columns, type_overrides or None
+
+def import_with_progress(uploaded, table_name, replace=False, rag_base=None, **schema_options):
+    """Run bulk_import with a Streamlit progress bar showing rows and rows/sec, then refresh the rag catalog and snapshot"""
+    bar = st.progress(0.0, text="Importing…")
+
+    def on_progress(fraction, rows, rate):
+        bar.progress(fraction if fraction is not None else 0.0, text=f"{rows:,} rows • {rate:,.0f} rows/s")
+
+    stats = bulk_import(uploaded, table_name, replace=replace, progress=on_progress, **schema_options)
+    bar.progress(1.0, text=f"{stats['rows']:,} rows • {stats['rows_per_sec'] or 0:,.0f} rows/s ({stats['method']})")
+    if rag_base:
+        # The chat's schema prompt reads column statistics from the catalog instead of sampling the table,
+        # and its generated SQL runs on the columnar snapshot (built in the background) when one is current.
+        for label, refresh in (("Catalog", rag_refresh_catalog), ("Analytic snapshot", rag_refresh_analytics)):
+            try:
+                ok, res = refresh(rag_base, table_name)
+            except Exception as e:
+                ok, res = False, str(e)
+            if not ok:
+                st.warning(f"{label} refresh failed: {res}")
+    return stats
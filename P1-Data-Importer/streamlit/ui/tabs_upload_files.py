@@ -1,10 +1,10 @@
-import io
 import base64
 import streamlit as st
 from docx import Document
 import streamlit.components.v1 as components
-from utils.db import save_file_to_db
-from utils.rag_api import rag_ingest_files
+from utils.rag_api import rag_upload_file
+
+PREVIEW_MAX_BYTES = 10 * 1024 * 1024
 
 def render_tab_upload_files(engine, rag_base):
     up = st.file_uploader("Upload PDF or DOCX", type=["pdf", "docx"], key="up_files_pdfdocx")
@@ -14,26 +14,23 @@ def render_tab_upload_files(engine, rag_base):
         with col1:
             if st.button("Save File", type="primary", key="btn_files_save"):
                 try:
-                    up.seek(0)
-                    save_file_to_db(up)
-                    st.success("Saved")
-                    if st.session_state.auto_sync:
-                        ok, res = rag_ingest_files(rag_base)
-                        if ok:
-                            st.success("RAG synced files")
-                        else:
-                            st.warning(f"RAG sync failed: {res}")
+                    ok, res = rag_upload_file(rag_base, up, index=st.session_state.auto_sync)
+                    if ok:
+                        st.success(f"Saved as file {res.get('id')}" + (" (RAG indexing queued)" if res.get("indexing") == "queued" else ""))
+                    else:
+                        st.error(f"Upload failed: {res}")
                 except Exception as e:
                     st.error(str(e))
         with col2:
-            if name.endswith(".pdf"):
+            if (up.size or 0) > PREVIEW_MAX_BYTES:
+                st.info("File too large to preview here; open it from Vector Search after saving.")
+            elif name.endswith(".pdf"):
                 up.seek(0)
                 b = up.read()
                 b64 = base64.b64encode(b).decode("utf-8")
                 components.html(f'<iframe src="data:application/pdf;base64,{b64}" width="100%" height="700px"></iframe>', height=720)
             elif name.endswith(".docx"):
                 up.seek(0)
-                b = up.read()
-                doc = Document(io.BytesIO(b))
+                doc = Document(up)
                 text_content = "\n".join(p.text for p in doc.paragraphs)
                 st.text_area("Preview", value=text_content, height=500, key="txt_files_preview")
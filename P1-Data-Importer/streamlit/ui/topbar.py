@@ -1,7 +1,9 @@
 import os
 import streamlit as st
 import requests
-from utils.db import ensure_files_table, read_tabular_file, write_df, save_file_to_db, unique_table_name
+from utils.db import unique_table_name
+from ui.tabs_upload_data import import_with_progress
+from utils.rag_api import rag_upload_file
 
 def render_topbar(engine, rag_base):
     st.divider()
@@ -14,15 +16,10 @@ def render_topbar(engine, rag_base):
                 if not up_tab:
                     st.warning("Select a CSV/XLS/XLSX file")
                 else:
-                    up_tab.seek(0)
-                    df = read_tabular_file(up_tab)
-                    if df is None:
-                        st.error("Unsupported file")
-                    else:
-                        base = os.path.splitext(os.path.basename(up_tab.name))[0]
-                        tn = unique_table_name(base)
-                        write_df(df, tn, replace=False)
-                        st.success(f"Imported to table {tn}")
+                    base = os.path.splitext(os.path.basename(up_tab.name))[0]
+                    tn = unique_table_name(base)
+                    stats = import_with_progress(up_tab, tn, replace=False, rag_base=rag_base)
+                    st.success(f"Imported {stats['rows']:,} rows to table {tn} ({stats['rows_per_sec'] or 0:,.0f} rows/s)")
             except Exception as e:
                 st.error(str(e))
 
@@ -33,10 +30,11 @@ def render_topbar(engine, rag_base):
                 if not up_file:
                     st.warning("Select a PDF or DOCX file")
                 else:
-                    ensure_files_table()
-                    up_file.seek(0)
-                    save_file_to_db(up_file)
-                    st.success("File saved")
+                    ok, res = rag_upload_file(rag_base, up_file, index=st.session_state.get("auto_sync", False))
+                    if ok:
+                        st.success("File saved")
+                    else:
+                        st.error(f"Upload failed: {res}")
             except Exception as e:
                 st.error(str(e))
 
@@ -0,0 +1,224 @@
+import csv
+import os
+import tempfile
+import time
+import pandas as pd
+from sqlalchemy import create_engine, text
+from utils.db import engine, list_tables, record_import_schema, db_host, db_port, db_name, db_user, db_password
+from utils.schema_infer import (
+    q, infer_schema, widen, coerce_for_insert, surrogate_key_name, create_table_sql,
+    choose_indexes, index_name, render_type, schema_summary,
+)
+
+IMPORT_CHUNK_ROWS = int(os.environ.get("IMPORT_CHUNK_ROWS", "50000"))
+IMPORT_METHOD = os.environ.get("IMPORT_METHOD", "multirow")
+
+# LOAD DATA LOCAL INFILE needs the client flag as well as local_infile=ON on the server.
+_infile_engine = None
+
+
+def _get_infile_engine():
+    global _infile_engine
+    if _infile_engine is None:
+        _infile_engine = create_engine(
+            f"mysql+pymysql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}?charset=utf8mb4",
+            pool_pre_ping=True, connect_args={"local_infile": True},
+        )
+    return _infile_engine
+
+
+def _unique_headers(header):
+    out, seen = [], {}
+    for i, h in enumerate(header):
+        name = str(h).strip() if h is not None and str(h).strip() else f"column_{i + 1}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        out.append(name)
+    return out
+
+
+def _iter_xlsx(uploaded, chunksize, nrows=None):
+    from openpyxl import load_workbook
+    wb = load_workbook(uploaded, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        cols = _unique_headers(header)
+        batch, seen = [], 0
+        for r in rows:
+            if nrows is not None and seen >= nrows:
+                break
+            batch.append(r[:len(cols)])
+            seen += 1
+            if len(batch) >= chunksize:
+                yield pd.DataFrame(batch, columns=cols)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=cols)
+    finally:
+        wb.close()
+
+
+def iter_tabular_chunks(uploaded, chunksize: int = IMPORT_CHUNK_ROWS):
+    """Yield DataFrames of at most `chunksize` rows without materialising the whole file"""
+    name = uploaded.name.lower()
+    uploaded.seek(0)
+    if name.endswith(".csv"):
+        yield from pd.read_csv(uploaded, chunksize=chunksize)
+    elif name.endswith(".xlsx"):
+        yield from _iter_xlsx(uploaded, chunksize)
+    elif name.endswith(".xls"):
+        # xlrd has no streaming reader; legacy .xls is loaded once and sliced.
+        df = pd.read_excel(uploaded)
+        for i in range(0, len(df), chunksize):
+            yield df.iloc[i:i + chunksize]
+    else:
+        raise ValueError("Unsupported file")
+
+
+def preview_tabular_file(uploaded, nrows: int = 100):
+    name = uploaded.name.lower()
+    uploaded.seek(0)
+    try:
+        if name.endswith(".csv"):
+            return pd.read_csv(uploaded, nrows=nrows)
+        if name.endswith(".xlsx"):
+            return next(_iter_xlsx(uploaded, nrows, nrows=nrows), pd.DataFrame())
+        if name.endswith(".xls"):
+            return pd.read_excel(uploaded, nrows=nrows)
+        return None
+    finally:
+        uploaded.seek(0)
+
+
+def _records(df):
+    """Python-native tuples with NaN/NaT as None, so the driver never sees numpy scalars"""
+    return list(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+
+
+def _insert_multirow(table, df):
+    cols = ", ".join(q(c) for c in df.columns)
+    marks = ", ".join(["%s"] * len(df.columns))
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cur:
+            # pymysql rewrites executemany on INSERT ... VALUES into multi-row statements.
+            cur.executemany(f"INSERT INTO {q(table)} ({cols}) VALUES ({marks})", _records(df))
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def _insert_load_data(table, df):
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    try:
+        with os.fdopen(fd, "w", newline="", encoding="utf-8") as fh:
+            df.to_csv(fh, index=False, header=False, na_rep="", quoting=csv.QUOTE_MINIMAL, lineterminator="\n")
+        variables = ", ".join(f"@v{i}" for i in range(len(df.columns)))
+        assigns = ", ".join(f"{q(c)} = NULLIF(@v{i}, '')" for i, c in enumerate(df.columns))
+        with _get_infile_engine().begin() as conn:
+            conn.exec_driver_sql(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE {q(table)} CHARACTER SET utf8mb4 "
+                "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' LINES TERMINATED BY '\\n' "
+                f"({variables}) SET {assigns}",
+                (path,),
+            )
+    finally:
+        os.unlink(path)
+
+
+def _create_table(table, schema, key, replace):
+    with engine.begin() as conn:
+        if replace and table in list_tables():
+            conn.execute(text(f"DROP TABLE IF EXISTS {q(table)}"))
+        conn.execute(text(create_table_sql(table, schema, key)))
+
+
+def _alter_columns(table, columns):
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {q(table)} " + ", ".join(f"MODIFY {q(c['name'])} {render_type(c['spec'])} NULL" for c in columns)))
+
+
+def _create_indexes(table, columns):
+    # Built after the load: one sorted build per index is far cheaper than maintaining it per insert.
+    if columns:
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {q(table)} " + ", ".join(f"ADD INDEX {q(index_name(table, c))} ({q(c)})" for c in columns)))
+
+
+def _progress_fraction(uploaded):
+    """Approximate fraction of the upload consumed so far, from the reader's position"""
+    size = getattr(uploaded, "size", None)
+    try:
+        return min(1.0, uploaded.tell() / size) if size else None
+    except Exception:
+        return None
+
+
+def bulk_import(uploaded, table_name, replace=False, chunksize: int = IMPORT_CHUNK_ROWS, method: str = IMPORT_METHOD,
+                progress=None, type_overrides: dict = None, index_columns: list = None):
+    """
+    Chunked import of a CSV/XLS/XLSX upload into a new, typed MySQL table
+
+    Memory stays bounded by `chunksize` rows. Column types are inferred from the
+    first chunk and widened in place if later chunks need it; `type_overrides`
+    maps column -> SQL type. A surrogate `_row_id` primary key is always added and
+    secondary indexes go on likely key/filter columns unless `index_columns` is
+    given (an empty list means none). The chosen schema is recorded in import_schemas.
+
+    `method` is "multirow" (batched multi-row INSERTs) or "load_data" (LOAD DATA
+    LOCAL INFILE per chunk, falling back to multirow if the server refuses it).
+    `progress(fraction, rows, rows_per_sec)` is called after every chunk; fraction
+    is None when the total is unknown.
+    """
+    t0 = time.time()
+    rows = chunks = 0
+    used = method
+    schema = key = indexes = None
+    for chunk in iter_tabular_chunks(uploaded, chunksize):
+        chunk.columns = [str(c) for c in chunk.columns]
+        if chunks == 0:
+            schema = infer_schema(chunk, type_overrides)
+            key = surrogate_key_name(chunk.columns)
+            indexes = choose_indexes(schema, chunk, index_columns)
+            _create_table(table_name, schema, key, replace)
+        else:
+            changed = widen(schema, chunk)
+            if changed:
+                _alter_columns(table_name, changed)
+        chunk = coerce_for_insert(chunk, schema)
+        if len(chunk):
+            if used == "load_data":
+                try:
+                    _insert_load_data(table_name, chunk)
+                except Exception:
+                    used = "multirow"
+                    _insert_multirow(table_name, chunk)
+            else:
+                _insert_multirow(table_name, chunk)
+        rows += len(chunk)
+        chunks += 1
+        if progress:
+            elapsed = time.time() - t0
+            progress(_progress_fraction(uploaded), rows, rows / elapsed if elapsed > 0 else 0.0)
+    if chunks == 0:
+        raise ValueError("File contains no rows")
+    _create_indexes(table_name, indexes)
+    record_import_schema(table_name, getattr(uploaded, "name", None), key, schema_summary(schema), indexes, rows)
+    elapsed = time.time() - t0
+    return {
+        "table": table_name,
+        "rows": rows,
+        "chunks": chunks,
+        "seconds": round(elapsed, 2),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 else None,
+        "method": used,
+        "primary_key": key,
+        "columns": schema_summary(schema),
+        "indexes": indexes,
+    }
@@ -1,7 +1,6 @@
 import os
-import io
+import json
 import base64
-import pandas as pd
 from sqlalchemy import create_engine, text, inspect
 
 db_host = os.environ.get("DB_HOST", "localhost")
@@ -13,8 +12,15 @@ db_password = os.environ.get("DB_PASSWORD", "apppassword")
 engine = create_engine(f"mysql+pymysql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}?charset=utf8mb4", pool_pre_ping=True)
 
 def ensure_files_table():
+    # File bytes live in the blob store under their SHA-256; MySQL keeps metadata only.
     with engine.begin() as conn:
-        conn.execute(text("CREATE TABLE IF NOT EXISTS files (id INT AUTO_INCREMENT PRIMARY KEY,filename VARCHAR(255) NOT NULL,content_type VARCHAR(128) NOT NULL,size_bytes BIGINT NOT NULL,data LONGBLOB NOT NULL,created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"))
+        conn.execute(text("CREATE TABLE IF NOT EXISTS files (id INT AUTO_INCREMENT PRIMARY KEY,filename VARCHAR(255) NOT NULL,content_type VARCHAR(128) NOT NULL,size_bytes BIGINT NOT NULL,sha256 CHAR(64) NULL,created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,INDEX ix_files_sha256 (sha256))"))
+        cols = {c["name"]: c for c in inspect(conn).get_columns("files")}
+        # Tables created before the blob store still have data LONGBLOB NOT NULL; see app.tools.migrate_blobs in rag.
+        if "sha256" not in cols:
+            conn.execute(text("ALTER TABLE files ADD COLUMN sha256 CHAR(64) NULL AFTER size_bytes, ADD INDEX ix_files_sha256 (sha256)"))
+        if "data" in cols and not cols["data"].get("nullable", True):
+            conn.execute(text("ALTER TABLE files MODIFY data LONGBLOB NULL"))
 
 def list_tables():
     insp = inspect(engine)
@@ -37,34 +43,21 @@ def unique_table_name(base):
         i += 1
     return f"{base}_{i}"
 
-def read_tabular_file(uploaded):
-    name = uploaded.name.lower()
-    data = uploaded.read()
-    if name.endswith(".csv"):
-        return pd.read_csv(io.BytesIO(data))
-    if name.endswith(".xlsx") or name.endswith(".xls"):
-        return pd.read_excel(io.BytesIO(data))
-    return None
-
-def write_df(df, table_name, replace=False):
-    if replace and table_name in list_tables():
-        with engine.begin() as conn:
-            conn.execute(text(f"DROP TABLE IF EXISTS `{table_name}`"))
-    df.to_sql(table_name, engine, index=False, if_exists="fail")
-
-def save_file_to_db(uploaded):
-    ensure_files_table()
-    b = uploaded.read()
-    with engine.begin() as conn:
-        conn.execute(text("INSERT INTO files (filename, content_type, size_bytes, data) VALUES (:f,:c,:s,:d)"), {"f": uploaded.name, "c": uploaded.type or "", "s": len(b), "d": b})
-
 def list_files():
     ensure_files_table()
     with engine.begin() as conn:
         rows = conn.execute(text("SELECT id, filename, content_type, size_bytes, created_at FROM files ORDER BY id DESC")).fetchall()
     return rows
 
-def get_file_blob(file_id):
+def ensure_import_schemas_table():
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS import_schemas (table_name VARCHAR(255) PRIMARY KEY,source_name VARCHAR(255) NULL,primary_key VARCHAR(64) NOT NULL,columns_json LONGTEXT NOT NULL,indexes_json LONGTEXT NOT NULL,row_count BIGINT NOT NULL DEFAULT 0,imported_at DATETIME(6) NOT NULL)"))
+
+def record_import_schema(table_name, source_name, primary_key, columns, indexes, row_count):
+    """Remember the schema chosen at import; imported_at doubles as the table's data version"""
+    ensure_import_schemas_table()
     with engine.begin() as conn:
-        row = conn.execute(text("SELECT id, filename, content_type, size_bytes, data FROM files WHERE id=:i"), {"i": file_id}).fetchone()
-    return row
+        conn.execute(text(
+            "REPLACE INTO import_schemas (table_name, source_name, primary_key, columns_json, indexes_json, row_count, imported_at) "
+            "VALUES (:t,:s,:pk,:c,:i,:n,NOW(6))"
+        ), {"t": table_name, "s": source_name, "pk": primary_key, "c": json.dumps(columns), "i": json.dumps(indexes), "n": row_count})
@@ -19,6 +19,65 @@ def rag_ingest_tables(rag_base: str, tables_csv: str | None = None, timeout: int
     r = requests.post(f"{rag_base}/ingest/db", json=payload, timeout=timeout)
     return _json_or_text(r)
 
+def rag_refresh_catalog(rag_base: str, tables_csv: str | None = None, full: bool = False, timeout: int = 600):
+    payload = {"tables": tables_csv, "full": full} if tables_csv else {"full": full}
+    r = requests.post(f"{rag_base}/catalog/refresh", json=payload, timeout=timeout)
+    return _json_or_text(r)
+
+def rag_refresh_analytics(rag_base: str, tables_csv: str | None = None, background: bool = True, timeout: int = 600):
+    payload = {"tables": tables_csv, "background": background} if tables_csv else {"background": background}
+    r = requests.post(f"{rag_base}/analytics/refresh", json=payload, timeout=timeout)
+    return _json_or_text(r)
+
 def rag_reset_vdb(rag_base: str, timeout: int = 60):
     r = requests.post(f"{rag_base}/vdb/reset", timeout=timeout)
     return _json_or_text(r)
+
+def rag_file_content(rag_base: str, file_id: int, timeout: int = 300):
+    """A stored file's bytes; the rag backend owns the blob store (and still reads legacy LONGBLOB rows)"""
+    r = requests.get(f"{rag_base}/files/{file_id}/inline", timeout=timeout)
+    if r.status_code >= 400:
+        return False, r.text
+    return True, r.content
+
+UPLOAD_CHUNK = 8 * 1024 * 1024
+
+def rag_upload_file(rag_base: str, uploaded, index: bool = True, chunk_size: int = UPLOAD_CHUNK, timeout: int = 600):
+    """Resumable chunked upload to the rag backend; a failed chunk is retried once from the server's offset"""
+    size = getattr(uploaded, "size", None)
+    r = requests.post(f"{rag_base}/files/uploads", json={"filename": uploaded.name, "content_type": uploaded.type or "", "size": size}, timeout=60)
+    if r.status_code >= 400:
+        return False, r.text
+    uid = r.json()["upload_id"]
+    offset = 0
+    uploaded.seek(0)
+    while True:
+        chunk = uploaded.read(chunk_size)
+        if not chunk:
+            break
+        for attempt in range(2):
+            try:
+                r = requests.put(f"{rag_base}/files/uploads/{uid}", data=chunk, headers={"Upload-Offset": str(offset), "Content-Type": "application/octet-stream"}, timeout=timeout)
+            except requests.RequestException:
+                if attempt:
+                    raise
+                r = None
+            if r is not None and r.status_code < 400:
+                offset = r.json()["offset"]
+                break
+            if attempt:
+                requests.delete(f"{rag_base}/files/uploads/{uid}", timeout=30)
+                return _json_or_text(r)
+            # Resume from whatever the server actually persisted before the failure.
+            s = requests.get(f"{rag_base}/files/uploads/{uid}", timeout=30)
+            if s.status_code >= 400:
+                return _json_or_text(s)
+            server_offset = s.json()["offset"]
+            chunk = chunk[server_offset - offset:]
+            offset = server_offset
+            if not chunk:
+                break
+    r = requests.post(f"{rag_base}/files/uploads/{uid}/complete", params={"index": str(bool(index)).lower()}, timeout=timeout)
+    if r.status_code >= 400:
+        return False, r.text
+    return _json_or_text(r)
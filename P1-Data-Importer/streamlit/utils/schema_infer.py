@@ -0,0 +1,273 @@
+import hashlib
+import math
+import re
+import pandas as pd
+
+SURROGATE_KEY = "_row_id"
+MAX_AUTO_INDEXES = 5
+# Below this many sampled rows cardinality says little, and indexes on tiny tables buy nothing.
+_MIN_CATEGORICAL_SAMPLE = 200
+
+_VARCHAR_STEPS = [16, 32, 64, 128, 255, 512, 1024, 2048, 4096]
+# InnoDB caps a row's inline VARCHAR bytes at 65535; utf8mb4 reserves 4 bytes per character.
+_ROW_VARCHAR_BYTES = 60000
+_INDEXABLE_VARCHAR = 768
+_DATE_LIKE = re.compile(r"^\s*(\d{4}[-/]\d{1,2}[-/]\d{1,2}|\d{1,2}[-/]\d{1,2}[-/]\d{2,4})([ T]\d{1,2}:\d{2}(:\d{2}(\.\d+)?)?)?\s*$")
+_KEY_NAME = re.compile(r"(^id$|_id$|^id_|_key$|^key$|code$|_no$|_num$|number$|sku$)", re.I)
+
+_OVERRIDE_TYPE = re.compile(r"^[A-Za-z]+( ?\(\d+( ?, ?\d+)?\))?( UNSIGNED)?$", re.I)
+
+_NUMERIC_RANK = {"bool": 0, "int": 1, "bigint": 2, "decimal": 3, "double": 4}
+_INT32 = 2 ** 31 - 1
+_INT64 = 2 ** 63 - 1
+
+
+def q(name: str) -> str:
+    return "`" + str(name).replace("`", "``") + "`"
+
+
+def _varchar(n: int) -> dict:
+    for step in _VARCHAR_STEPS:
+        if n <= step:
+            return {"kind": "varchar", "length": step}
+    return {"kind": "text"}
+
+
+def _decimal_places(x: float, limit: int = 6):
+    """Smallest number of decimal places that represents x exactly, or None beyond `limit`"""
+    for s in range(limit + 1):
+        scaled = x * (10 ** s)
+        if abs(scaled - round(scaled)) < 1e-9 * max(1.0, abs(scaled)):
+            return s
+    return None
+
+
+def _infer_numeric(s: pd.Series) -> dict:
+    vals = s.astype(float)
+    if not all(map(math.isfinite, vals)):
+        return {"kind": "double"}
+    if (vals == vals.round()).all():
+        m = max(abs(vals.min()), abs(vals.max()))
+        return {"kind": "int" if m <= _INT32 else "bigint" if m <= _INT64 else "double"}
+    scale = 0
+    for x in vals.drop_duplicates().head(5000):
+        places = _decimal_places(float(x))
+        if places is None:
+            return {"kind": "double"}
+        scale = max(scale, places)
+    int_digits = len(str(int(max(abs(vals.min()), abs(vals.max())))))
+    if int_digits + scale > 18:
+        return {"kind": "double"}
+    return {"kind": "decimal", "int_digits": int_digits, "scale": scale}
+
+
+def _infer_dates(s: pd.Series):
+    sample = s.astype(str).head(200)
+    if not sample.map(lambda v: bool(_DATE_LIKE.match(v))).all():
+        return None
+    parsed = pd.to_datetime(s, errors="coerce")
+    if parsed.isna().any():
+        return None
+    has_time = (parsed != parsed.dt.normalize()).any()
+    return {"kind": "datetime" if has_time else "date"}
+
+
+def infer_column(s: pd.Series) -> dict:
+    """Most compact MySQL type that holds every non-null value in `s`"""
+    s = s.dropna()
+    if s.empty:
+        return {"kind": "varchar", "length": 64, "empty": True}
+    if pd.api.types.is_bool_dtype(s):
+        return {"kind": "bool"}
+    if pd.api.types.is_datetime64_any_dtype(s):
+        has_time = (s != s.dt.normalize()).any()
+        return {"kind": "datetime" if has_time else "date"}
+    if pd.api.types.is_numeric_dtype(s):
+        return _infer_numeric(s)
+    as_num = pd.to_numeric(s, errors="coerce")
+    if as_num.notna().all() and not s.astype(str).str.match(r"^\s*[+-]?0\d").any():
+        # Numbers that arrived as text (e.g. mixed-type spreadsheet cells); leading zeros stay text.
+        return _infer_numeric(as_num)
+    dates = _infer_dates(s)
+    if dates:
+        return dates
+    return _varchar(int(s.astype(str).str.len().max()))
+
+
+def _as_varchar_length(spec: dict) -> int:
+    kind = spec["kind"]
+    if kind == "varchar":
+        return spec["length"]
+    if kind in ("date", "datetime"):
+        return 26
+    return 32
+
+
+def merge(a: dict, b: dict) -> dict:
+    """Narrowest type that holds values of both `a` and `b`"""
+    if a.get("override"):
+        return a
+    if b.get("empty"):
+        return a
+    if a.get("empty"):
+        return b
+    ka, kb = a["kind"], b["kind"]
+    if "text" in (ka, kb):
+        return {"kind": "text"}
+    if ka in _NUMERIC_RANK and kb in _NUMERIC_RANK:
+        if ka == "decimal" and kb == "decimal":
+            return {"kind": "decimal", "int_digits": max(a["int_digits"], b["int_digits"]), "scale": max(a["scale"], b["scale"])}
+        hi, lo = (a, b) if _NUMERIC_RANK[ka] >= _NUMERIC_RANK[kb] else (b, a)
+        if hi["kind"] == "decimal":
+            int_digits = max(hi["int_digits"], 10 if lo["kind"] == "int" else 19 if lo["kind"] == "bigint" else 1)
+            if int_digits + hi["scale"] > 38:
+                return {"kind": "double"}
+            return {"kind": "decimal", "int_digits": int_digits, "scale": hi["scale"]}
+        return hi
+    if ka in ("date", "datetime") and kb in ("date", "datetime"):
+        return {"kind": "datetime" if "datetime" in (ka, kb) else "date"}
+    return _varchar(max(_as_varchar_length(a), _as_varchar_length(b)))
+
+
+def render_type(spec: dict) -> str:
+    if spec.get("override"):
+        return spec["override"]
+    kind = spec["kind"]
+    if kind == "bool":
+        return "TINYINT(1)"
+    if kind == "int":
+        return "INT"
+    if kind == "bigint":
+        return "BIGINT"
+    if kind == "decimal":
+        scale = spec["scale"]
+        return f"DECIMAL({min(38, spec['int_digits'] + scale + 2)},{scale})"
+    if kind == "double":
+        return "DOUBLE"
+    if kind == "date":
+        return "DATE"
+    if kind == "datetime":
+        return "DATETIME(6)"
+    if kind == "varchar":
+        return f"VARCHAR({spec['length']})"
+    return "MEDIUMTEXT"
+
+
+def _fit_row_size(schema: list):
+    """Demote the widest VARCHARs to TEXT until the row fits InnoDB's inline limit"""
+    while sum(c["spec"]["length"] * 4 for c in schema if c["spec"]["kind"] == "varchar") > _ROW_VARCHAR_BYTES:
+        widest = max((c for c in schema if c["spec"]["kind"] == "varchar"), key=lambda c: c["spec"]["length"])
+        widest["spec"] = {"kind": "text"}
+
+
+def infer_schema(df: pd.DataFrame, overrides: dict = None) -> list:
+    """[{"name", "spec"}] for each column of df; `overrides` maps column -> literal SQL type"""
+    overrides = overrides or {}
+    schema = []
+    for col in df.columns:
+        if col in overrides:
+            if not _OVERRIDE_TYPE.match(overrides[col].strip()):
+                raise ValueError(f"Unsupported type override for {col}: {overrides[col]}")
+            spec = {"kind": "override", "override": overrides[col].strip()}
+        else:
+            spec = infer_column(df[col])
+        schema.append({"name": str(col), "spec": spec})
+    _fit_row_size(schema)
+    return schema
+
+
+def widen(schema: list, df: pd.DataFrame) -> list:
+    """Grow column types so `df` fits; returns the columns whose type changed"""
+    changed = []
+    for col in schema:
+        if col["spec"].get("override") or col["name"] not in df.columns:
+            continue
+        values = df[col["name"]]
+        if col["spec"]["kind"] in ("varchar", "text") and not col["spec"].get("empty"):
+            # Already text: only the length can grow, whatever the new values look like.
+            values = values.dropna()
+            incoming = _varchar(int(values.astype(str).str.len().max())) if len(values) else {"kind": "varchar", "length": 16, "empty": True}
+        else:
+            incoming = infer_column(values)
+        merged = merge(col["spec"], incoming)
+        if render_type(merged) != render_type(col["spec"]):
+            col["spec"] = merged
+            changed.append(col)
+    if changed:
+        before = {c["name"]: render_type(c["spec"]) for c in schema}
+        _fit_row_size(schema)
+        changed += [c for c in schema if c not in changed and render_type(c["spec"]) != before[c["name"]]]
+    return changed
+
+
+def coerce_for_insert(df: pd.DataFrame, schema: list) -> pd.DataFrame:
+    """Parse date-typed text columns so the driver sends real datetimes"""
+    out = df
+    for col in schema:
+        if col["spec"]["kind"] in ("date", "datetime") and col["name"] in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col["name"]]):
+            if out is df:
+                out = df.copy()
+            out[col["name"]] = pd.to_datetime(df[col["name"]], errors="coerce")
+    return out
+
+
+def surrogate_key_name(columns) -> str:
+    name, i = SURROGATE_KEY, 2
+    while name in columns:
+        name = f"{SURROGATE_KEY}_{i}"
+        i += 1
+    return name
+
+
+def create_table_sql(table: str, schema: list, key: str) -> str:
+    cols = [f"{q(key)} BIGINT UNSIGNED NOT NULL AUTO_INCREMENT"]
+    cols += [f"{q(c['name'])} {render_type(c['spec'])} NULL" for c in schema]
+    cols.append(f"PRIMARY KEY ({q(key)})")
+    return f"CREATE TABLE {q(table)} (" + ", ".join(cols) + ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+
+
+def _indexable(spec: dict) -> bool:
+    if spec.get("override"):
+        return "TEXT" not in spec["override"].upper() and "BLOB" not in spec["override"].upper()
+    return spec["kind"] != "text" and (spec["kind"] != "varchar" or spec["length"] <= _INDEXABLE_VARCHAR)
+
+
+def choose_indexes(schema: list, sample: pd.DataFrame, override: list = None) -> list:
+    """
+    Secondary index columns: key-like names, then date columns, then low-cardinality
+    categoricals, capped at MAX_AUTO_INDEXES. `override` (a list, possibly empty) wins.
+    """
+    names = [c["name"] for c in schema]
+    if override is not None:
+        missing = [c for c in override if c not in names]
+        if missing:
+            raise ValueError(f"Unknown index column(s): {', '.join(missing)}")
+        return list(dict.fromkeys(override))
+    n = max(1, len(sample))
+    scored = []
+    for c in schema:
+        spec, name = c["spec"], c["name"]
+        if not _indexable(spec) or spec.get("empty"):
+            continue
+        kind = spec["kind"]
+        if _KEY_NAME.search(name):
+            scored.append((0, name))
+        elif kind in ("date", "datetime"):
+            scored.append((1, name))
+        elif kind == "varchar" and name in sample.columns and n >= _MIN_CATEGORICAL_SAMPLE:
+            distinct = sample[name].nunique(dropna=True)
+            if 1 < distinct <= min(1000, int(n * 0.05)):
+                scored.append((2, name))
+    scored.sort(key=lambda x: x[0])
+    return [name for _, name in scored[:MAX_AUTO_INDEXES]]
+
+
+def index_name(table: str, col: str) -> str:
+    name = f"ix_{table}_{col}"
+    if len(name) <= 64:
+        return name
+    return name[:55] + "_" + hashlib.sha1(name.encode()).hexdigest()[:8]
+
+
+def schema_summary(schema: list) -> list:
+    return [{"name": c["name"], "type": render_type(c["spec"])} for c in schema]